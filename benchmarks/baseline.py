@@ -0,0 +1,135 @@
+"""
+Saves benchmark results as named baselines and compares later runs against
+them. Results are flat metrics per scenario. Metrics ending with
+"_per_second" are better when higher, all others when lower.
+"""
+
+import json
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser, Namespace
+from datetime import UTC, datetime
+from pathlib import Path
+
+
+type Results = dict[str, dict[str, float]]
+"""Metric values by scenario and metric name"""
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+
+def add_baseline_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save the results")
+    parser.add_argument(
+        "--compare", metavar="NAME", help="Compare the results with a baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change reported as regression (default: 0.1)",
+    )
+
+
+def report(args: Namespace, results: Results) -> int:
+    """
+    Prints the results, saves and compares them as requested by the arguments.
+    Returns 1 if a regression was found, 0 otherwise.
+    """
+
+    print_results(results)
+    exit_code = 0
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        lines, n_regressions = compare(baseline, results, args.threshold)
+        print(f"\nCompared with baseline '{args.compare}':")
+        print("\n".join(lines))
+        exit_code = int(n_regressions > 0)
+    if args.save_baseline:
+        path = save_baseline(args.save_baseline, results)
+        print(f"\nSaved baseline to {path}")
+
+    return exit_code
+
+
+def print_results(results: Results) -> None:
+    for scenario, metrics in results.items():
+        print(f"\n{scenario}")
+        for name, value in metrics.items():
+            print(f"  {name:<40} {_format(value)}")
+
+
+def save_baseline(name: str, results: Results) -> Path:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    data = {"metadata": _get_metadata(), "results": results}
+    path.write_text(json.dumps(data, indent=2))
+
+    return path
+
+
+def load_baseline(name: str) -> Results:
+    path = Path(name) if name.endswith(".json") else BASELINE_DIR / f"{name}.json"
+
+    return json.loads(path.read_text())["results"]
+
+
+def compare(
+    baseline: Results,
+    results: Results,
+    threshold: float = 0.1,
+) -> tuple[list[str], int]:
+    """Returns the report lines and the number of regressions."""
+
+    lines: list[str] = []
+    n_regressions = 0
+    for scenario, metrics in results.items():
+        baseline_metrics = baseline.get(scenario)
+        if baseline_metrics is None:
+            lines.append(f"{scenario}: not in baseline")
+            continue
+
+        lines.append(scenario)
+        for name, value in metrics.items():
+            baseline_value = baseline_metrics.get(name)
+            if not baseline_value:
+                continue
+            change = (value - baseline_value) / baseline_value
+            is_worse = -change if name.endswith("_per_second") else change
+            marker = ""
+            if is_worse > threshold:
+                marker = "  REGRESSION"
+                n_regressions += 1
+            elif is_worse < -threshold:
+                marker = "  improved"
+            lines.append(
+                f"  {name:<40} {_format(baseline_value):>12} -> "
+                f"{_format(value):>12} ({change:+.1%}){marker}"
+            )
+
+    return lines, n_regressions
+
+
+def _format(value: float) -> str:
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def _get_metadata() -> dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+
+    return {
+        "commit": commit,
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
@@ -0,0 +1,363 @@
+"""
+Benchmarks the parts of DirectoryParser which do not depend on the LLM on a
+synthetic directory tree.
+
+Measures the throughput of discovery (DirectoryScanner), hashing with a cold
+and a warm hash index, page counting, deduplication of the scanned files and
+the output I/O of every output format separately. Trees are generated once per
+shape and reused, so the files are usually in the OS page cache and hashing
+is measured without disk reads.
+
+    python -m benchmarks.directory_benchmark --quick --save-baseline main
+    python -m benchmarks.directory_benchmark --files 100000 --file-size 8
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple, get_args
+
+from tqdm import tqdm
+
+from benchmarks.baseline import Results, add_baseline_arguments, report
+from benchmarks.stub_llm import STUB_SETTINGS
+from benchmarks.synthetic_pdf import PADDING_BYTE, build_synthetic_pdf
+from theia_parse.const import DUPLICATE_SUFFIXES
+from theia_parse.model import (
+    ContentElement,
+    ContentType,
+    DocumentPage,
+    HeadingElement,
+    LlmUsage,
+    ParsedDocument,
+)
+from theia_parse.output import find_parsed_path, read_parsed, write_parsed
+from theia_parse.parser.__spi__ import DirectoryParserConfig, ScanConfig
+from theia_parse.parser.directory_parser import DirectoryParser
+from theia_parse.parser.directory_scanner import DirectoryScanner
+from theia_parse.parser.file_parser import count_pages
+from theia_parse.types import OutputFormat
+from theia_parse.util.files import with_suffix
+from theia_parse.util.hash_index import FileHashIndex
+
+
+_KB = 1024
+_MB = 1024 * 1024
+
+
+class TreeSpec(NamedTuple):
+    name: str
+    n_files: int
+    file_size: int
+    """Approximate size of every PDF in bytes"""
+
+    duplicate_ratio: float = 0.2
+    """Share of the PDFs which are copies of other PDFs of the tree"""
+
+    files_per_directory: int = 100
+    other_ratio: float = 0.1
+    """Additional unsupported files relative to the PDFs, skipped by the scanner"""
+
+    n_pages: int = 1
+
+
+class RunOptions(NamedTuple):
+    scan_workers: int = 8
+    hashing_workers: int = 8
+    page_counting_workers: int | None = None
+    output_documents: int = 1000
+    output_formats: tuple[OutputFormat, ...] = get_args(OutputFormat.__value__)
+
+
+SCENARIOS = [
+    TreeSpec("small-files-50k", 50_000, 16 * _KB),
+    TreeSpec("large-files-500", 500, 4 * _MB, n_pages=20),
+    TreeSpec("duplicates-20k", 20_000, 64 * _KB, duplicate_ratio=0.8),
+    TreeSpec("flat-20k", 20_000, 16 * _KB, files_per_directory=20_000),
+]
+
+QUICK_SCENARIOS = [
+    TreeSpec("small-files-2k", 2000, 16 * _KB),
+    TreeSpec("large-files-50", 50, 2 * _MB, n_pages=20),
+    TreeSpec("duplicates-1k", 1000, 64 * _KB, duplicate_ratio=0.8),
+]
+
+DEFAULT_WORK_DIR = Path(tempfile.gettempdir()) / "theia-parse-benchmarks"
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--quick", action="store_true", help="Run small scenarios")
+    parser.add_argument("--scenario", action="append", help="Run only these")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR)
+    parser.add_argument(
+        "--files", type=int, help="Run a custom tree with this many PDFs instead"
+    )
+    parser.add_argument("--file-size", type=int, default=16, metavar="KB")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--files-per-directory", type=int, default=100)
+    parser.add_argument("--other-ratio", type=float, default=0.1)
+    parser.add_argument("--pages", type=int, default=1, help="Pages per PDF")
+    parser.add_argument("--scan-workers", type=int, default=8)
+    parser.add_argument("--hashing-workers", type=int, default=8)
+    parser.add_argument("--page-counting-workers", type=int, default=None)
+    parser.add_argument(
+        "--output-documents",
+        type=int,
+        default=1000,
+        help="Number of parsed documents written and read per output format",
+    )
+    parser.add_argument(
+        "--output-format",
+        action="append",
+        choices=get_args(OutputFormat.__value__),
+        help="Measure only these output formats",
+    )
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    scenarios = QUICK_SCENARIOS if args.quick else SCENARIOS
+    if args.scenario:
+        scenarios = [s for s in SCENARIOS + QUICK_SCENARIOS if s.name in args.scenario]
+    if args.files is not None:
+        scenarios = [
+            TreeSpec(
+                f"custom-{args.files}",
+                args.files,
+                args.file_size * _KB,
+                args.duplicate_ratio,
+                args.files_per_directory,
+                args.other_ratio,
+                args.pages,
+            )
+        ]
+    options = RunOptions(
+        scan_workers=args.scan_workers,
+        hashing_workers=args.hashing_workers,
+        page_counting_workers=args.page_counting_workers,
+        output_documents=args.output_documents,
+        output_formats=tuple(args.output_format or RunOptions().output_formats),
+    )
+
+    results: Results = {}
+    for spec in scenarios:
+        print(f"Generating {spec.name} ...", file=sys.stderr)
+        directory = generate_tree(spec, args.work_dir)
+        print(f"Running {spec.name} ...", file=sys.stderr)
+        try:
+            results[spec.name] = run_scenario(spec, directory, args.work_dir, options)
+        except Exception as e:
+            print(f"Scenario {spec.name} failed: {e!r}", file=sys.stderr)
+
+    return report(args, results)
+
+
+def generate_tree(spec: TreeSpec, work_dir: Path) -> Path:
+    """
+    Generates the tree of the spec once and reuses it later. Unique PDFs only
+    differ in their padding, duplicates are byte-identical copies of them
+    spread randomly over the tree.
+    """
+
+    trees_dir = work_dir / "trees"
+    name = (
+        f"{spec.n_files}x{spec.file_size}-d{spec.duplicate_ratio}"
+        f"-f{spec.files_per_directory}-o{spec.other_ratio}-p{spec.n_pages}"
+    )
+    directory = trees_dir / name
+    complete_marker = trees_dir / f"{name}.complete"
+    if complete_marker.is_file():
+        return directory
+    if directory.exists():
+        shutil.rmtree(directory)
+
+    padding = max(64, spec.file_size - len(build_synthetic_pdf(spec.n_pages)))
+    template = build_synthetic_pdf(spec.n_pages, padding=padding)
+    padding_offset = template.index(PADDING_BYTE * padding)
+
+    rng = random.Random(0)  # noqa: S311
+    n_unique = max(1, spec.n_files - round(spec.n_files * spec.duplicate_ratio))
+    content_ids = list(range(n_unique))
+    content_ids += [rng.randrange(n_unique) for _ in range(spec.n_files - n_unique)]
+    rng.shuffle(content_ids)
+
+    content = bytearray(template)
+    for i, content_id in enumerate(content_ids):
+        content[padding_offset : padding_offset + 16] = b"%016d" % content_id
+        _get_tree_path(directory, spec, i, ".pdf").write_bytes(content)
+
+    for i in range(round(spec.n_files * spec.other_ratio)):
+        _get_tree_path(directory, spec, i, ".txt").write_bytes(b"x" * _KB)
+
+    complete_marker.touch()
+
+    return directory
+
+
+def run_scenario(
+    spec: TreeSpec,
+    directory: Path,
+    work_dir: Path,
+    options: RunOptions,
+) -> dict[str, float]:
+    result: dict[str, float] = {}
+
+    scanner = DirectoryScanner()
+    files, seconds = _timed(lambda: list(scanner.scan(directory)))
+    paths = [f.path for f in files]
+    stats = {f.path: f.stat for f in files}
+    n_bytes = sum(s.st_size for s in stats.values())
+    result["files"] = len(files)
+    result["discovery.seconds"] = seconds
+    result["discovery.files_per_second"] = len(files) / seconds
+
+    scanner = DirectoryScanner(ScanConfig(workers=options.scan_workers))
+    _, seconds = _timed(lambda: list(scanner.scan(directory)))
+    result["discovery_parallel.files_per_second"] = len(files) / seconds
+
+    with FileHashIndex(max_workers=options.hashing_workers) as hash_index:
+        md5_sums, seconds = _timed(lambda: hash_index.get_md5_sums(paths, stats))
+        result["hashing.seconds"] = seconds
+        result["hashing.files_per_second"] = len(paths) / seconds
+        result["hashing.mb_per_second"] = n_bytes / _MB / seconds
+
+        _, seconds = _timed(lambda: hash_index.get_md5_sums(paths, stats))
+        result["hashing_cached.files_per_second"] = len(paths) / seconds
+
+        n_pages, seconds = _timed(
+            lambda: count_pages(paths, options.page_counting_workers)
+        )
+        result["page_counting.seconds"] = seconds
+        result["page_counting.files_per_second"] = len(paths) / seconds
+        assert all(n_pages.values()), "Pages of some files could not be counted"
+
+        # scanning, looking up the cached md5 sums, deduplication, writing the
+        # duplicate markers and checking for parsed files as in parse
+        directory_parser = DirectoryParser(
+            STUB_SETTINGS,
+            DirectoryParserConfig(
+                verbose=False,
+                hashing_workers=options.hashing_workers,
+                scan_config=ScanConfig(workers=options.scan_workers),
+            ),
+        )
+        scheduled, seconds = _timed(
+            lambda: list(
+                directory_parser._get_documents_to_parse(
+                    directory, {}, hash_index, tqdm(total=0, disable=True)
+                )
+            )
+        )
+        result["dedup.seconds"] = seconds
+        result["dedup.files_per_second"] = len(paths) / seconds
+        result["dedup.duplicates"] = len(paths) - len(scheduled)
+        assert len(scheduled) == len(set(md5_sums.values()))
+        _remove_duplicate_markers(paths)
+
+    output_dir = work_dir / "outputs" / spec.name
+    n_documents = min(options.output_documents, len(scheduled))
+    parsed = _get_parsed_document(spec.n_pages)
+    for output_format in options.output_formats:
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(parents=True)
+        result.update(_run_output_io(output_dir, output_format, parsed, n_documents))
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return result
+
+
+def _run_output_io(
+    output_dir: Path,
+    output_format: OutputFormat,
+    parsed: ParsedDocument,
+    n_documents: int,
+) -> dict[str, float]:
+    paths = [output_dir / f"doc-{i:07d}.pdf" for i in range(n_documents)]
+    prefix = f"output.{output_format}"
+
+    parsed_paths, seconds = _timed(
+        lambda: [write_parsed(p, parsed, output_format) for p in paths]
+    )
+    n_bytes = sum(p.stat().st_size for p in parsed_paths)
+    result = {
+        f"{prefix}.bytes_per_document": n_bytes / n_documents,
+        f"{prefix}.write.documents_per_second": n_documents / seconds,
+        f"{prefix}.write.mb_per_second": n_bytes / _MB / seconds,
+    }
+
+    _, seconds = _timed(lambda: [read_parsed(p) for p in parsed_paths])
+    result[f"{prefix}.read.documents_per_second"] = n_documents / seconds
+    result[f"{prefix}.read.mb_per_second"] = n_bytes / _MB / seconds
+
+    found, seconds = _timed(lambda: [find_parsed_path(p) for p in paths])
+    assert all(found), "Written parsed files not found"
+    result[f"{prefix}.find.documents_per_second"] = n_documents / seconds
+
+    return result
+
+
+def _get_tree_path(directory: Path, spec: TreeSpec, i: int, suffix: str) -> Path:
+    directory_number = i // spec.files_per_directory
+    path = (
+        directory
+        / f"{directory_number // 100:03d}"
+        / f"{directory_number % 100:03d}"
+        / f"doc-{i:07d}{suffix}"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    return path
+
+
+def _get_parsed_document(n_pages: int) -> ParsedDocument:
+    rng = random.Random(0)  # noqa: S311
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing"]
+    pages: list[DocumentPage] = []
+    for page_number in range(1, n_pages + 1):
+        text = " ".join(rng.choices(words, k=400))
+        pages.append(
+            DocumentPage(
+                page_number=page_number,
+                content=[
+                    HeadingElement(content=f"Section {page_number}", heading_level=1),
+                    ContentElement(type=ContentType.TEXT, content=text),
+                ],
+                raw_extracted_text=text,
+                raw_llm_response=text,
+                token_usage=LlmUsage(request_tokens=1000, response_tokens=700),
+            )
+        )
+    parsed = ParsedDocument(
+        path="doc.pdf",
+        md5_sum="0" * 32,
+        metadata={"Title": "Synthetic"},
+        content=pages,
+    )
+    parsed.update_usage()
+
+    return parsed
+
+
+def _remove_duplicate_markers(paths: list[Path]) -> None:
+    for path in paths:
+        with_suffix(path, DUPLICATE_SUFFIXES).unlink(missing_ok=True)
+
+
+def _timed[T](func: Callable[[], T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    value = func()
+
+    return value, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Benchmarks the import time of theia_parse entry points, which bounds the start
+of short jobs and of process pool workers.
+
+Reports the time to import, the time to start a process and import, the number
+of imported modules and of heavy dependencies among them for each scenario.
+Every run imports in a fresh interpreter, the fastest of --repeat runs is kept.
+
+    python -m benchmarks.import_benchmark --save-baseline main
+    python -m benchmarks.import_benchmark --compare main --top 20
+"""
+
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from typing import NamedTuple
+
+from benchmarks.baseline import Results, add_baseline_arguments, report
+
+
+class Scenario(NamedTuple):
+    name: str
+    statement: str
+
+
+SCENARIOS = [
+    Scenario("package", "import theia_parse"),
+    Scenario("directory-parser", "from theia_parse import DirectoryParser"),
+    Scenario(
+        "page-counting-worker",
+        "from theia_parse.parser.file_parser import count_pages",
+    ),
+    Scenario(
+        "planner-worker", "from theia_parse.parser.planner import DocumentPlanner"
+    ),
+    Scenario(
+        "pdf-parser",
+        "from theia_parse.parser.file_parser.pdf.pdf_parser import PdfParser",
+    ),
+    Scenario(
+        "llm", "from theia_parse.llm.openai.azure_openai_llm import AzureOpenAiLLM"
+    ),
+]
+
+HEAVY_MODULES = [
+    "jinja2",
+    "openai",
+    "pdf2image",
+    "pdfplumber",
+    "PIL",
+    "pydantic_settings",
+    "pymupdf4llm",
+    "tqdm",
+    "yodocus",
+]
+"""Dependencies which should only be imported when used"""
+
+_CHILD_CODE = """
+import json, sys, time
+n_modules = len(sys.modules)
+start = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "modules": len(sys.modules) - n_modules,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenario", action="append", help="Run only these")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Keep the fastest of N runs"
+    )
+    parser.add_argument(
+        "--top", type=int, default=0, metavar="N", help="Print the N slowest modules"
+    )
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        scenarios = [s for s in SCENARIOS if s.name in args.scenario]
+
+    results: Results = {}
+    for scenario in scenarios:
+        print(f"Running {scenario.name} ...", file=sys.stderr)
+        try:
+            runs = [run_scenario(scenario) for _ in range(max(1, args.repeat))]
+        except Exception as e:
+            print(f"Scenario {scenario.name} failed: {e!r}", file=sys.stderr)
+            continue
+        result, heavy = min(runs, key=lambda r: r[0]["seconds"])
+        results[scenario.name] = result
+        if heavy:
+            print(f"  heavy modules: {', '.join(heavy)}", file=sys.stderr)
+        if args.top:
+            print_slowest_modules(scenario, args.top)
+
+    return report(args, results)
+
+
+def run_scenario(scenario: Scenario) -> tuple[dict[str, float], list[str]]:
+    code = _CHILD_CODE.format(statement=scenario.statement, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    process_seconds = time.perf_counter() - start
+    child = json.loads(output.strip().splitlines()[-1])
+
+    result = {
+        "seconds": child["seconds"],
+        "process_seconds": process_seconds,
+        "modules": child["modules"],
+        "heavy_modules": len(child["heavy"]),
+    }
+
+    return result, child["heavy"]
+
+
+def print_slowest_modules(scenario: Scenario, n: int) -> None:
+    """Prints the modules with the highest self time from -X importtime."""
+
+    stderr = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", scenario.statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    modules: list[tuple[int, int, str]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+
+    print(f"\nSlowest modules of {scenario.name} (self, cumulative in ms)")
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[:n]:
+        print(f"  {name:<60} {self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Benchmarks PdfParser and DirectoryParser on synthetic PDFs with a stub LLM.
+
+Reports pages per second, the time per pipeline stage, the peak RSS and the
+bytes which would have been sent to the LLM API for each scenario. Every
+scenario runs in a fresh process, so peak RSS values are comparable.
+
+    python -m benchmarks.parser_benchmark --quick --save-baseline main
+    python -m benchmarks.parser_benchmark --quick --compare main
+
+With --profile-memory the memory of every stage and page is recorded and a
+summary per document is written to <work-dir>/memory, see MemoryProfiler.
+Rendering page images (--vision) requires poppler for pdf2image.
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+from benchmarks.baseline import Results, add_baseline_arguments, report
+from benchmarks.stub_llm import STUB_SETTINGS, StubLLM, use_stub_llm
+from benchmarks.synthetic_pdf import PdfKind, write_synthetic_pdf
+from theia_parse.parser.__spi__ import (
+    DirectoryParserConfig,
+    DocumentParserConfig,
+    ImageExtractionConfig,
+)
+from theia_parse.parser.directory_parser import DirectoryParser
+from theia_parse.parser.file_parser.pdf.pdf_parser import PdfParser
+from theia_parse.types import ImageExtractionMethod
+from theia_parse.util.instrumentation import (
+    enable_memory_profiling,
+    enable_metrics,
+    finish_document,
+)
+
+
+type Target = Literal["pdf-parser", "directory-parser"]
+
+
+class Scenario(NamedTuple):
+    name: str
+    kind: PdfKind
+    n_pages: int
+    n_documents: int = 1
+    target: Target = "pdf-parser"
+
+
+class RunOptions(NamedTuple):
+    vision: bool = False
+    image_extraction: ImageExtractionMethod | None = None
+    llm_latency: float = 0.0
+    page_workers: int = 1
+    memory_threshold_mb: float | None = None
+
+
+SCENARIOS = [
+    Scenario("text-1", "text", 1),
+    Scenario("text-100", "text", 100),
+    Scenario("text-1000", "text", 1000),
+    Scenario("image-50", "image", 50),
+    Scenario("scanned-50", "scanned", 50),
+    Scenario("directory-20x10", "text", 10, 20, "directory-parser"),
+]
+
+QUICK_SCENARIOS = [
+    Scenario("text-1", "text", 1),
+    Scenario("text-20", "text", 20),
+    Scenario("image-10", "image", 10),
+    Scenario("scanned-10", "scanned", 10),
+    Scenario("directory-5x5", "text", 5, 5, "directory-parser"),
+]
+
+DEFAULT_WORK_DIR = Path(tempfile.gettempdir()) / "theia-parse-benchmarks"
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--quick", action="store_true", help="Run small scenarios")
+    parser.add_argument("--scenario", action="append", help="Run only these")
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR)
+    parser.add_argument("--vision", action="store_true", help="Render page images")
+    parser.add_argument(
+        "--image-extraction", choices=["yodocus", "pymupdf"], default=None
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument("--page-workers", type=int, default=1)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Keep the fastest of N runs"
+    )
+    parser.add_argument(
+        "--profile-memory",
+        type=float,
+        metavar="THRESHOLD_MB",
+        help="Record the memory per stage and flag pages above the threshold",
+    )
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    # keep the benchmark output readable, spawned processes inherit the level
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    scenarios = QUICK_SCENARIOS if args.quick else SCENARIOS
+    if args.scenario:
+        scenarios = [s for s in SCENARIOS + QUICK_SCENARIOS if s.name in args.scenario]
+    options = RunOptions(
+        vision=args.vision,
+        image_extraction=args.image_extraction,
+        llm_latency=args.llm_latency,
+        page_workers=args.page_workers,
+        memory_threshold_mb=args.profile_memory,
+    )
+
+    results: Results = {}
+    for scenario in scenarios:
+        paths = generate_documents(scenario, args.work_dir)
+        print(f"Running {scenario.name} ...", file=sys.stderr)
+        try:
+            runs = [
+                _run_in_fresh_process(scenario, paths, options)
+                for _ in range(max(1, args.repeat))
+            ]
+        except Exception as e:
+            print(f"Scenario {scenario.name} failed: {e!r}", file=sys.stderr)
+            continue
+        results[scenario.name] = min(runs, key=lambda r: r["seconds"])
+
+    return report(args, results)
+
+
+def generate_documents(scenario: Scenario, work_dir: Path) -> list[Path]:
+    """Generates the documents of the scenario once and reuses them later."""
+
+    directory = work_dir / (
+        scenario.name if scenario.target == "directory-parser" else "documents"
+    )
+    directory.mkdir(parents=True, exist_ok=True)
+
+    paths: list[Path] = []
+    for seed in range(scenario.n_documents):
+        path = directory / f"{scenario.kind}-{scenario.n_pages}-{seed}.pdf"
+        if not path.is_file():
+            write_synthetic_pdf(path, scenario.n_pages, scenario.kind, seed)
+        paths.append(path)
+
+    return paths
+
+
+def run_scenario(
+    scenario: Scenario,
+    paths: list[Path],
+    options: RunOptions,
+) -> dict[str, float]:
+    metrics = enable_metrics()
+    memory_profiler = None
+    if options.memory_threshold_mb is not None:
+        memory_profiler = enable_memory_profiling(
+            options.memory_threshold_mb,
+            output_dir=paths[0].parent.parent / "memory" / scenario.name,
+        )
+    llm = StubLLM(options.llm_latency)
+    config = DocumentParserConfig(
+        verbose=False,
+        use_vision=options.vision,
+        save_file=scenario.target == "directory-parser",
+        image_extraction_config=ImageExtractionConfig(
+            extract_images=options.image_extraction is not None,
+            method=options.image_extraction or "yodocus",
+        ),
+    )
+
+    with use_stub_llm(llm):
+        start = time.perf_counter()
+        if scenario.target == "pdf-parser":
+            parser = PdfParser(STUB_SETTINGS, config)
+            n_pages = sum(len(parser.parse(path).content) for path in paths)
+        else:
+            directory_parser = DirectoryParser(
+                STUB_SETTINGS,
+                DirectoryParserConfig(
+                    verbose=False,
+                    skip_parsed=False,
+                    page_workers=options.page_workers,
+                    document_parser_config=config,
+                ),
+            )
+            parsed = list(directory_parser.parse(paths[0].parent))
+            n_pages = sum(len(d.content) for d in parsed)
+        seconds = time.perf_counter() - start
+
+    result = {
+        "pages": n_pages,
+        "seconds": seconds,
+        "pages_per_second": n_pages / seconds,
+        "peak_rss_mb": _get_peak_rss_mb(),
+        "bytes_sent": llm.bytes_sent,
+        "llm_calls": llm.n_calls,
+    }
+    for stage, snapshot in metrics.snapshot().items():
+        result[f"stage.{stage}.seconds"] = snapshot.sum
+    if memory_profiler is not None:
+        # documents of the directory parser are already finished
+        for path in paths:
+            finish_document(path)
+        result["memory.flagged_pages"] = memory_profiler.n_flagged_pages
+
+    return result
+
+
+def _run_in_fresh_process(
+    scenario: Scenario,
+    paths: list[Path],
+    options: RunOptions,
+) -> dict[str, float]:
+    # a fresh process per run, so the peak RSS is not inherited
+    with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(run_scenario, scenario, paths, options).result()
+
+
+def _get_peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from threading import Lock
+from unittest import mock
+
+from pydantic import BaseModel
+
+from theia_parse.llm.__spi__ import LLM, LlmApiSettings, LlmMedium, LlmResponse
+from theia_parse.model import LlmUsage
+from theia_parse.parser.__spi__ import LlmGenerationConfig
+
+
+STUB_SETTINGS = LlmApiSettings(api_version="", model="stub", endpoint="", key="")
+
+_BYTES_PER_TOKEN = 4
+_MAX_RESPONSE_CHARS = 4000
+
+
+class StubLLM(LLM):
+    """
+    Answers every request with a valid page content response without any
+    network calls, optionally after a fixed latency. Counts the bytes which
+    would have been sent to the LLM API.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0) -> None:
+        self._latency_seconds = latency_seconds
+        self._lock = Lock()
+        self.n_calls = 0
+        self.bytes_sent = 0
+
+    def generate(
+        self,
+        system_prompt: str | None,
+        user_prompt: str,
+        page_image: LlmMedium | None,
+        embedded_images: list[LlmMedium],
+        config: LlmGenerationConfig,
+        response_schema: type[BaseModel] | None = None,
+    ) -> LlmResponse:
+        images = [page_image, *embedded_images] if page_image else embedded_images
+        n_bytes = len((system_prompt or "").encode()) + len(user_prompt.encode())
+        n_bytes += sum(len(img.image.content_b64 or "") for img in images)
+        with self._lock:
+            self.n_calls += 1
+            self.bytes_sent += n_bytes
+
+        if self._latency_seconds:
+            time.sleep(self._latency_seconds)
+
+        text = user_prompt[-_MAX_RESPONSE_CHARS:]
+        if config.json_mode:
+            raw = json.dumps(
+                {
+                    "improvement_analysis": "",
+                    "page_content_blocks": [
+                        {"type": "heading", "content": "Section", "heading_level": 1},
+                        {"type": "text", "content": text},
+                    ],
+                }
+            )
+        else:
+            raw = text
+
+        return LlmResponse(
+            raw=raw,
+            usage=LlmUsage(
+                request_tokens=n_bytes // _BYTES_PER_TOKEN,
+                response_tokens=len(raw) // _BYTES_PER_TOKEN,
+                n_calls=1,
+                latency_seconds=self._latency_seconds,
+                model=STUB_SETTINGS.model,
+            ),
+        )
+
+
+@contextmanager
+def use_stub_llm(llm: StubLLM) -> Iterator[StubLLM]:
+    """Makes all file parsers created in this context use the stub LLM."""
+
+    with mock.patch("theia_parse.parser.file_parser.__spi__.get_llm", return_value=llm):
+        yield llm
@@ -0,0 +1,246 @@
+"""
+Generates synthetic PDFs for benchmarks with a minimal PDF writer, so no PDF
+library is needed besides Pillow.
+
+Kinds of documents:
+- text: pages with headings and paragraphs as text layer
+- image: text plus several embedded photos per page
+- scanned: one full page image per page without a text layer
+"""
+
+import io
+import random
+from pathlib import Path
+from typing import Literal
+
+from PIL import Image, ImageDraw
+
+
+type PdfKind = Literal["text", "image", "scanned"]
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+"""A4 in points"""
+
+_SCAN_DPI = 100
+_LINE_HEIGHT = 14
+_WORDS = [
+    "lorem",
+    "ipsum",
+    "dolor",
+    "sit",
+    "amet",
+    "consectetur",
+    "adipiscing",
+    "elit",
+    "sed",
+    "do",
+    "eiusmod",
+    "tempor",
+    "incididunt",
+    "ut",
+    "labore",
+    "et",
+    "dolore",
+    "magna",
+    "aliqua",
+    "enim",
+    "ad",
+    "minim",
+    "veniam",
+    "quis",
+    "nostrud",
+    "exercitation",
+    "ullamco",
+    "laboris",
+    "nisi",
+    "aliquip",
+    "ex",
+    "ea",
+    "commodo",
+    "consequat",
+    "duis",
+    "aute",
+    "irure",
+    "in",
+    "reprehenderit",
+    "voluptate",
+    "velit",
+    "esse",
+    "cillum",
+    "fugiat",
+    "nulla",
+    "pariatur",
+]
+
+
+PADDING_BYTE = b"~"
+"""Fills the padding stream, which can be overwritten to make files unique"""
+
+
+def write_synthetic_pdf(
+    path: Path,
+    n_pages: int,
+    kind: PdfKind = "text",
+    seed: int = 0,
+) -> Path:
+    """Writes a reproducible synthetic PDF, the same seed yields the same file."""
+
+    path.write_bytes(build_synthetic_pdf(n_pages, kind, seed))
+
+    return path
+
+
+def build_synthetic_pdf(
+    n_pages: int,
+    kind: PdfKind = "text",
+    seed: int = 0,
+    padding: int = 0,
+) -> bytes:
+    """
+    Returns a reproducible synthetic PDF. With padding the PDF contains an
+    unreferenced stream of that many `PADDING_BYTE`s to reach a file size.
+    """
+
+    rng = random.Random(seed)  # noqa: S311
+    writer = _PdfWriter()
+    catalog_id = writer.reserve()
+    pages_id = writer.reserve()
+    font_id = writer.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids: list[int] = []
+    for page_number in range(1, n_pages + 1):
+        images: list[tuple[bytes, int, int, tuple[float, float, float, float]]] = []
+        if kind == "scanned":
+            lines = _get_lines(rng, page_number, 48)
+            images.append((*_render_scan(lines), (0, 0, PAGE_WIDTH, PAGE_HEIGHT)))
+            content = b""
+        elif kind == "image":
+            lines = _get_lines(rng, page_number, 12)
+            content = _text_content(lines)
+            for i in range(3):
+                top = PAGE_HEIGHT - 260 - i * 190
+                images.append((*_render_photo(rng), (60, top - 170, 475, 170)))
+        else:
+            content = _text_content(_get_lines(rng, page_number, 50))
+
+        xobjects = []
+        for i, (data, width, height, (x, y, w, h)) in enumerate(images, start=1):
+            image_id = writer.add_stream(
+                b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+                b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode"
+                % (width, height),
+                data,
+            )
+            xobjects.append(b"/Im%d %d 0 R" % (i, image_id))
+            content += b"q %d 0 0 %d %d %d cm /Im%d Do Q\n" % (w, h, x, y, i)
+
+        content_id = writer.add_stream(b"", content)
+        resources = b"/Font << /F1 %d 0 R >>" % font_id
+        if xobjects:
+            resources += b" /XObject << %s >>" % b" ".join(xobjects)
+        page_ids.append(
+            writer.add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << %s >> /Contents %d 0 R >>"
+                % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, resources, content_id)
+            )
+        )
+
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    writer.set(pages_id, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n_pages))
+    writer.set(catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    if padding > 0:
+        writer.add_stream(b"", PADDING_BYTE * padding)
+
+    return writer.to_bytes(catalog_id)
+
+
+class _PdfWriter:
+    def __init__(self) -> None:
+        self._objects: list[bytes | None] = []
+
+    def reserve(self) -> int:
+        self._objects.append(None)
+        return len(self._objects)
+
+    def add(self, body: bytes) -> int:
+        self._objects.append(body)
+        return len(self._objects)
+
+    def add_stream(self, dictionary: bytes, data: bytes) -> int:
+        return self.add(
+            b"<< %s /Length %d >>\nstream\n%s\nendstream"
+            % (dictionary, len(data), data)
+        )
+
+    def set(self, object_id: int, body: bytes) -> None:
+        self._objects[object_id - 1] = body
+
+    def to_bytes(self, root_id: int) -> bytes:
+        out = io.BytesIO()
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets: list[int] = []
+        for object_id, body in enumerate(self._objects, start=1):
+            assert body is not None, f"Object {object_id} not set"
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+
+        xref_offset = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        for offset in offsets:
+            out.write(b"%010d 00000 n \n" % offset)
+        out.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(offsets) + 1, root_id, xref_offset)
+        )
+
+        return out.getvalue()
+
+
+def _get_lines(rng: random.Random, page_number: int, n_lines: int) -> list[str]:
+    lines = [f"Section {page_number}"]
+    for _ in range(n_lines - 1):
+        lines.append(" ".join(rng.choices(_WORDS, k=rng.randint(8, 13))))
+
+    return lines
+
+
+def _text_content(lines: list[str]) -> bytes:
+    content = [b"BT", b"/F1 16 Tf", b"%d TL" % _LINE_HEIGHT, b"50 790 Td"]
+    content.append(b"(%s) Tj /F1 10 Tf T* T*" % lines[0].encode("ascii"))
+    content.extend(b"(%s) ' " % line.encode("ascii") for line in lines[1:])
+    content.append(b"ET\n")
+
+    return b"\n".join(content)
+
+
+def _render_scan(lines: list[str]) -> tuple[bytes, int, int]:
+    width, height = PAGE_WIDTH * _SCAN_DPI // 72, PAGE_HEIGHT * _SCAN_DPI // 72
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((60, 60 + i * 22), line, fill="black")
+
+    return _to_jpeg(image), width, height
+
+
+def _render_photo(rng: random.Random) -> tuple[bytes, int, int]:
+    width, height = 800, 330
+    image = Image.new("RGB", (width, height), tuple(rng.choices(range(256), k=3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.ellipse(
+            (x, y, x + rng.randint(10, 200), y + rng.randint(10, 120)),
+            fill=tuple(rng.choices(range(256), k=3)),
+        )
+
+    return _to_jpeg(image), width, height
+
+
+def _to_jpeg(image: Image.Image) -> bytes:
+    data = io.BytesIO()
+    image.save(data, format="JPEG", quality=80)
+
+    return data.getvalue()
@@ -7,6 +7,8 @@ from theia_parse import (
     DirectoryParser,
     DirectoryParserConfig,
     DocumentParserConfig,
+    ModelPrice,
+    PriceTable,
     PromptConfig,
 )
 
@@ -15,8 +17,10 @@ ENV_PATH = Path(__file__).parent / ".env"
 DATA_PATH = (Path(__file__).parent.parent / "data/sample/").resolve()
 
 # GPT-4o-mini price
-EURO_PER_REQUEST_TOKENS = 2.6867 / 1_000_000
-EURO_PER_RESPONSE_TOKENS = 10.746430 / 1_000_000
+PRICE_TABLE = PriceTable(
+    currency="EUR",
+    model_prices={"gpt-4o-mini": ModelPrice(request=2.6867, response=10.746430)},
+)
 
 
 def main():
@@ -32,26 +36,25 @@ def main():
         verbose=True,
         save_file=True,
         prompt_config=PromptConfig(custom_instructions=[]),
+        price_table=PRICE_TABLE,
     )
     parser = DirectoryParser(
         config=DirectoryParserConfig(document_parser_config=config),
     )
 
-    request_tokens = 0
-    response_tokens = 0
-    for doc in parser.parse(DATA_PATH):
-        if doc is not None:
-            request_tokens += doc.token_usage.request_tokens or 0
-            response_tokens += doc.token_usage.response_tokens or 0
-
-    total_price = (
-        request_tokens * EURO_PER_REQUEST_TOKENS
-        + response_tokens * EURO_PER_RESPONSE_TOKENS
+    for _ in parser.parse(DATA_PATH):
+        pass
+
+    usage = parser.usage
+    for stage, stage_usage in usage.stage_usage.items():
+        tqdm.write(
+            f"{stage}: {stage_usage.total_tokens} tokens, "
+            f"{stage_usage.n_calls} calls, {stage_usage.n_retries or 0} retries."
+        )
+    tqdm.write(f"Total tokens used: {usage.token_usage.total_tokens}.")
+    tqdm.write(
+        f"Total price: {usage.token_usage.cost or 0:.2f} {PRICE_TABLE.currency}."
     )
-    total_tokens = request_tokens + response_tokens
-
-    tqdm.write(f"Total tokens used: {total_tokens}.")
-    tqdm.write(f"Total price: {total_price:.2f}.")
 
 
 if __name__ == "__main__":
@@ -7,7 +7,7 @@ PATH = (Path(__file__).parent.parent / "data/sample").resolve()
 
 
 def main():
-    restore_duplicates(PATH)
+    restore_duplicates(PATH, mode="reference")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,26 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
+from unittest import mock
 
+import pypdfium2
 import pytest
 from dotenv import load_dotenv
 
+from theia_parse.llm.__spi__ import LLM
+from theia_parse.model import (
+    ContentElement,
+    ContentType,
+    DocumentPage,
+    ErrorType,
+    HeadingElement,
+    ImageElement,
+    LlmUsage,
+    Medium,
+    ParsedDocument,
+)
+from theia_parse.parser.file_parser import DEFAULT_PARSER_POOL
+
 
 PROJECT_ROOT = Path(__file__).parent.parent
 TESTS_ROOT = PROJECT_ROOT / "tests"
@@ -14,3 +32,103 @@ DOTENV_PATH = PROJECT_ROOT / ".env"
 @pytest.fixture(scope="session", autouse=True)
 def load_env():
     load_dotenv(DOTENV_PATH)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+):
+    """Keeps the default hash indexes of tests out of the user cache directory"""
+
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+
+    return path
+
+
+@pytest.fixture
+def parsed_document() -> ParsedDocument:
+    document = ParsedDocument(
+        path="doc.pdf",
+        md5_sum="abc",
+        metadata={"Title": "Doc"},
+        content=[
+            DocumentPage(
+                page_number=1,
+                content=[
+                    HeadingElement(content="Title", heading_level=1),
+                    ContentElement(type=ContentType.TEXT, content="Text"),
+                    ImageElement(content="Logo", medium_id="logo"),
+                ],
+                media=[Medium(id="logo", mime_type="image/png", content_b64="eA==")],
+                raw_extracted_text="Title Text",
+                raw_llm_response="{}",
+                token_usage=LlmUsage(request_tokens=10, response_tokens=5),
+            ),
+            DocumentPage(
+                page_number=2,
+                content=[],
+                raw_extracted_text="",
+                raw_llm_response="",
+                token_usage=LlmUsage(),
+                error=True,
+                error_type=ErrorType.TRANSIENT,
+            ),
+        ],
+    )
+    document.update_usage()
+
+    return document
+
+
+@pytest.fixture
+def two_page_pdf(tmp_path: Path) -> Path:
+    """Two copies of the first page of the sample document"""
+
+    path = tmp_path / "doc.pdf"
+    with pypdfium2.PdfDocument(RESOURCE_PATH / "sample_1.pdf") as source:
+        document = pypdfium2.PdfDocument.new()
+        document.import_pages(source, [0, 0])
+        document.save(path)
+        document.close()
+
+    return path
+
+
+def parsed_with_error_page(path: Path) -> ParsedDocument:
+    return ParsedDocument(
+        path=str(path),
+        md5_sum="abc",
+        content=[
+            DocumentPage(
+                page_number=1,
+                content=[],
+                raw_extracted_text="",
+                raw_llm_response="{}",
+                token_usage=LlmUsage(),
+            ),
+            DocumentPage(
+                page_number=2,
+                content=[],
+                raw_extracted_text="",
+                raw_llm_response="",
+                token_usage=LlmUsage(),
+                error=True,
+                error_type=ErrorType.TRANSIENT,
+            ),
+        ],
+    )
+
+
+@contextmanager
+def use_fake_llm(llm: LLM) -> Iterator[None]:
+    """Lets the file parsers created within the context use the given LLM."""
+
+    DEFAULT_PARSER_POOL.clear()
+    try:
+        with mock.patch(
+            "theia_parse.parser.file_parser.__spi__.get_llm", return_value=llm
+        ):
+            yield
+    finally:
+        DEFAULT_PARSER_POOL.clear()
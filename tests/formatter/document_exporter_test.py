@@ -0,0 +1,34 @@
+import os
+from pathlib import Path
+
+from theia_parse.formatter.document_exporter import DocumentExporter
+from theia_parse.model import ParsedDocument
+from theia_parse.output import write_parsed, write_reference
+
+
+class TestDocumentExporter:
+    def test_export(self, tmp_path: Path, parsed_document: ParsedDocument):
+        parsed_path = write_parsed(tmp_path / "doc.pdf", parsed_document, "jsonl")
+        class_under_test = DocumentExporter()
+
+        output_path = class_under_test.export(parsed_path)
+
+        assert output_path == tmp_path / "doc.pdf.parsed.md"
+        assert output_path.read_text() == (
+            "PATH: doc.pdf\n\n{'Title': 'Doc'}"
+            "\n\n\n\nPAGE: 1\n\n\n# Title\n\nText\n\n![Image](/logo)\n\nCaption: Logo"
+            "\n\n\n\nPAGE: 2\n\n\n"
+        )
+
+    def test_export_directory(self, tmp_path: Path, parsed_document: ParsedDocument):
+        source_path = write_parsed(tmp_path / "a.pdf", parsed_document)
+        write_reference(tmp_path / "b.pdf", tmp_path / "a.pdf")
+        class_under_test = DocumentExporter()
+
+        assert class_under_test.export_directory(tmp_path) == 2
+        output = (tmp_path / "b.pdf.parsed.md").read_text()
+        assert output.startswith(f"PATH: {tmp_path / 'b.pdf'}")
+        assert class_under_test.export_directory(tmp_path) == 0
+
+        os.utime(source_path, ns=(0, 2 * source_path.stat().st_mtime_ns))
+        assert class_under_test.export_directory(tmp_path) == 1
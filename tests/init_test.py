@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import theia_parse
+
+
+class TestInit:
+    def test_exports(self):
+        for name in theia_parse.__all__:
+            assert getattr(theia_parse, name) is not None
+
+        assert set(theia_parse.__all__) <= set(dir(theia_parse))
+
+    def test_import_defers_heavy_dependencies(self):
+        code = (
+            "import sys, theia_parse; "
+            "from theia_parse.parser.file_parser import count_pages; "
+            "print(','.join(m for m in "
+            "('jinja2', 'openai', 'pdf2image', 'pdfplumber', 'pydantic_settings') "
+            "if m in sys.modules))"
+        )
+
+        output = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+        assert output.strip() == ""
@@ -0,0 +1,41 @@
+from theia_parse.llm.response_parser.json_parser import JsonParser
+
+
+class TestJsonParser:
+    def test_parse_valid(self):
+        class_under_test = JsonParser()
+
+        result = class_under_test.parse('```json\n{"a": [1, 2], "b": "}"}\n```')
+
+        assert result == {"a": [1, 2], "b": "}"}
+
+    def test_parse_repairs_trailing_commas_and_control_chars(self):
+        class_under_test = JsonParser()
+
+        result = class_under_test.parse('{"a": [1, 2,], "b": "line\none",}')
+
+        assert result == {"a": [1, 2], "b": "line\none"}
+
+    def test_parse_repairs_truncated_output(self):
+        class_under_test = JsonParser()
+
+        result = class_under_test.parse(
+            '{"page_content_blocks": [{"type": "text", "content": "Trunc'
+        )
+        assert result == {"page_content_blocks": [{"type": "text", "content": "Trunc"}]}
+
+        result = class_under_test.parse('{"page_content_blocks": [{"type":')
+        assert result == {"page_content_blocks": [{"type": None}]}
+
+    def test_parse_ignores_trailing_text(self):
+        class_under_test = JsonParser()
+
+        result = class_under_test.parse('{"a": 1} and some {note}')
+
+        assert result == {"a": 1}
+
+    def test_parse_invalid(self):
+        class_under_test = JsonParser()
+
+        assert class_under_test.parse("no json here") is None
+        assert class_under_test.parse("[1, 2]") is None
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from theia_parse.model import ParsedDocument
+from theia_parse.output import convert_parsed, read_parsed, write_parsed
+from theia_parse.output.binary import BinaryDocumentReader, write_binary
+
+
+class TestBinaryFormat:
+    def test_roundtrip(self, tmp_path: Path, parsed_document: ParsedDocument):
+        path = tmp_path / "doc.pdf.parsed.tpb"
+
+        write_binary(path, parsed_document, compression="lzma")
+
+        class_under_test = BinaryDocumentReader(path)
+        start, end = class_under_test.read_page_index().get_span(2) or (0, 0)
+
+        assert class_under_test.read() == parsed_document
+        assert class_under_test.read_summary().error_page_numbers == [2]
+        assert class_under_test.read_page_at(start, end) == parsed_document.content[1]
+
+    def test_drop_raw_fields(self, tmp_path: Path, parsed_document: ParsedDocument):
+        path = tmp_path / "doc.pdf.parsed.tpb"
+
+        write_binary(path, parsed_document, drop_raw_fields=True)
+        parsed = BinaryDocumentReader(path).read()
+
+        assert parsed.content[0].raw_extracted_text == ""
+        assert parsed.content[0].content == parsed_document.content[0].content
+
+    def test_convert(self, tmp_path: Path, parsed_document: ParsedDocument):
+        json_path = write_parsed(tmp_path / "doc.pdf", parsed_document, "json")
+
+        binary_path = convert_parsed(json_path, "binary")
+
+        assert binary_path == tmp_path / "doc.pdf.parsed.tpb"
+        assert read_parsed(binary_path) == read_parsed(json_path)
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from theia_parse.model import DocumentPage, LlmUsage, ParsedDocument
+from theia_parse.output.jsonl import JsonlDocumentReader, JsonlDocumentWriter
+
+
+def _page(page_number: int, error: bool = False) -> DocumentPage:
+    return DocumentPage(
+        page_number=page_number,
+        content=[],
+        raw_extracted_text=f"page {page_number}",
+        raw_llm_response="",
+        token_usage=LlmUsage(request_tokens=10, response_tokens=5),
+        error=error,
+    )
+
+
+class TestJsonlDocument:
+    def test_roundtrip(self, tmp_path: Path):
+        path = tmp_path / "doc.pdf.parsed.jsonl"
+        hull = ParsedDocument(
+            path="doc.pdf", md5_sum="abc", content=[], metadata={"a": 1}
+        )
+
+        with JsonlDocumentWriter(path, hull) as writer:
+            writer.write_page(_page(1))
+            writer.write_page(_page(2, error=True))
+
+        class_under_test = JsonlDocumentReader(path)
+        summary = class_under_test.read_summary()
+        header = class_under_test.read_header()
+
+        assert header.model_copy(update={"token_usage": LlmUsage()}) == hull
+        assert header.token_usage.request_tokens == 20
+        assert [p.page_number for p in class_under_test.iter_pages()] == [1, 2]
+        assert class_under_test.read().content == [_page(1), _page(2, error=True)]
+        assert summary is not None
+        assert summary.n_pages == 2
+        assert summary.token_usage.request_tokens == 20
+        assert summary.error_page_numbers == [2]
+
+    def test_incomplete_file(self, tmp_path: Path):
+        path = tmp_path / "doc.pdf.parsed.jsonl"
+        hull = ParsedDocument(path="doc.pdf", content=[])
+
+        try:
+            with JsonlDocumentWriter(path, hull) as writer:
+                writer.write_page(_page(1))
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+
+        assert not path.exists()
+        assert not list(tmp_path.iterdir())
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from theia_parse.model import ParsedDocument
+from theia_parse.output import write_parsed
+from theia_parse.output.lazy import LazyParsedDocument
+from theia_parse.types import OutputFormat
+
+
+class TestLazyParsedDocument:
+    @pytest.mark.parametrize("output_format", ["json", "jsonl", "binary"])
+    def test_random_access(
+        self,
+        tmp_path: Path,
+        output_format: OutputFormat,
+        parsed_document: ParsedDocument,
+    ):
+        parsed_path = write_parsed(tmp_path / "doc.pdf", parsed_document, output_format)
+
+        class_under_test = LazyParsedDocument(parsed_path)
+
+        assert class_under_test.header.md5_sum == "abc"
+        assert class_under_test.header.content == []
+        assert class_under_test.page_numbers == [1, 2]
+        assert class_under_test.get_page(2) == parsed_document.content[1]
+        assert class_under_test.get_page(3) is None
+        assert (
+            class_under_test.get_medium("logo") == parsed_document.content[0].media[0]
+        )
+        assert class_under_test.load() == parsed_document
+
+        page = class_under_test.get_page(1, include_media=False)
+        assert page is not None
+        assert page.media[0].content_b64 is None
+
+    def test_json_index_is_persisted(
+        self,
+        tmp_path: Path,
+        parsed_document: ParsedDocument,
+    ):
+        parsed_path = tmp_path / "doc.pdf.parsed.json"
+        parsed_path.write_text(
+            json.dumps(parsed_document.model_dump(mode="json"), indent=2)
+        )
+
+        assert len(LazyParsedDocument(parsed_path)) == 2
+        assert (tmp_path / "doc.pdf.parsed.json.index.json").is_file()
+        assert LazyParsedDocument(parsed_path).get_page(1) == parsed_document.content[0]
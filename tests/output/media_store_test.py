@@ -0,0 +1,45 @@
+from base64 import b64encode
+from pathlib import Path
+
+from theia_parse.model import DocumentPage, LlmUsage, Medium, ParsedDocument
+from theia_parse.output.media_store import MediaStore
+
+
+LOGO = Medium(id="logo", mime_type="image/png", content_b64=b64encode(b"x").decode())
+
+
+def _document(path: str, media: list[Medium]) -> ParsedDocument:
+    page = DocumentPage(
+        page_number=1,
+        content=[],
+        media=media,
+        raw_extracted_text="",
+        raw_llm_response="",
+        token_usage=LlmUsage(),
+    )
+
+    return ParsedDocument(path=path, content=[page, page])
+
+
+class TestMediaStore:
+    def test_deduplicate_and_load(self, tmp_path: Path):
+        with MediaStore(tmp_path / "media") as class_under_test:
+            stored_a = class_under_test.add_document(_document("a.pdf", [LOGO]))
+            stored_b = class_under_test.add_document(_document("b.pdf", [LOGO]))
+
+            assert stored_a.content[0].media[0].content_b64 is None
+            assert class_under_test.get_reference_count("logo") == 2
+            assert len(list((tmp_path / "media").rglob("*.png"))) == 1
+            assert class_under_test.load_document(stored_b).content[0].media == [LOGO]
+
+    def test_collect_garbage(self, tmp_path: Path):
+        with MediaStore(tmp_path / "media") as class_under_test:
+            class_under_test.add_document(_document("a.pdf", [LOGO]))
+            class_under_test.add_document(_document("b.pdf", [LOGO]))
+
+            class_under_test.remove_references("a.pdf")
+            assert class_under_test.collect_garbage() == 0
+
+            class_under_test.remove_references("b.pdf")
+            assert class_under_test.collect_garbage() == 1
+            assert class_under_test.get_bytes("logo") is None
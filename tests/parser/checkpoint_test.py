@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from theia_parse.model import DocumentPage, LlmUsage, ParsedDocument
+from theia_parse.parser.checkpoint import PageCheckpoint
+
+
+def _page(page_number: int) -> DocumentPage:
+    return DocumentPage(
+        page_number=page_number,
+        content=[],
+        raw_extracted_text=f"page {page_number}",
+        raw_llm_response="",
+        token_usage=LlmUsage(),
+    )
+
+
+class TestPageCheckpoint:
+    def test_resume(self, tmp_path: Path):
+        doc_path = tmp_path / "doc.pdf"
+        hull = ParsedDocument(path=str(doc_path), md5_sum="abc", content=[])
+        checkpoint = PageCheckpoint(doc_path)
+
+        assert checkpoint.open(hull) == []
+        checkpoint.append(_page(1))
+        checkpoint.append(_page(2))
+        with open(checkpoint.path, "a") as f:
+            f.write('{"page_number": 3, "conte')
+
+        class_under_test = PageCheckpoint(doc_path)
+        pages = class_under_test.open(hull)
+
+        assert [p.page_number for p in pages] == [1, 2]
+        assert class_under_test.path == tmp_path / "doc.pdf.parsed.checkpoint.jsonl"
+
+    def test_resume_after_repeated_crashes(self, tmp_path: Path):
+        doc_path = tmp_path / "doc.pdf"
+        hull = ParsedDocument(path=str(doc_path), md5_sum="abc", content=[])
+        checkpoint = PageCheckpoint(doc_path)
+        checkpoint.open(hull)
+        checkpoint.append(_page(1))
+        with open(checkpoint.path, "a") as f:
+            f.write('{"page_number": 2, "conte')
+
+        first_resume = PageCheckpoint(doc_path)
+        first_pages = first_resume.open(hull)
+        first_resume.append(_page(2))
+        with open(first_resume.path, "a") as f:
+            f.write('{"page_number": 3, "conte')
+
+        class_under_test = PageCheckpoint(doc_path)
+        pages = class_under_test.open(hull)
+
+        assert [p.page_number for p in first_pages] == [1]
+        assert [p.page_number for p in pages] == [1, 2]
+
+    def test_discard_outdated(self, tmp_path: Path):
+        doc_path = tmp_path / "doc.pdf"
+        checkpoint = PageCheckpoint(doc_path)
+        checkpoint.open(ParsedDocument(path=str(doc_path), md5_sum="a", content=[]))
+        checkpoint.append(_page(1))
+
+        class_under_test = PageCheckpoint(doc_path)
+        pages = class_under_test.open(
+            ParsedDocument(path=str(doc_path), md5_sum="b", content=[])
+        )
+
+        assert pages == []
+        class_under_test.remove()
+        assert not class_under_test.path.exists()
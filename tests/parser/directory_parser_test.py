@@ -0,0 +1,64 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import parsed_with_error_page, use_fake_llm
+from tests.parser.file_parser.pdf.pdf_parser_test import (
+    FAKE_SETTINGS,
+    VALID_RESPONSE,
+    FakeLLM,
+)
+from theia_parse.output import write_parsed, write_reference
+from theia_parse.parser.__spi__ import (
+    DirectoryParserConfig,
+    DocumentParserConfig,
+    ImageExtractionConfig,
+)
+from theia_parse.parser.directory_parser import DirectoryParser
+
+
+class TestDirectoryParser:
+    def test_retry_failed_pages_skips_duplicates(self, two_page_pdf: Path):
+        duplicate = two_page_pdf.with_name("duplicate.pdf")
+        shutil.copy(two_page_pdf, duplicate)
+        write_parsed(two_page_pdf, parsed_with_error_page(two_page_pdf), "jsonl")
+        write_reference(duplicate, two_page_pdf)
+        llm = FakeLLM([VALID_RESPONSE])
+        config = DirectoryParserConfig(
+            verbose=False,
+            document_parser_config=DocumentParserConfig(
+                use_vision=False,
+                image_extraction_config=ImageExtractionConfig(extract_images=False),
+            ),
+        )
+
+        with use_fake_llm(llm):
+            class_under_test = DirectoryParser(FAKE_SETTINGS, config)
+            result = list(class_under_test.retry_failed_pages(two_page_pdf.parent))
+
+        assert llm.n_calls == 1
+        assert [d.path for d in result] == [str(two_page_pdf)]
+        assert not result[0].get_error_page_numbers()
+        assert sorted(p.name for p in two_page_pdf.parent.glob("*.parsed.*")) == [
+            "doc.pdf.parsed.jsonl",
+            "duplicate.pdf.parsed.ref",
+        ]
+
+    def test_get_number_of_pages_keeps_index_out_of_directory(
+        self, two_page_pdf: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        shutil.copy(two_page_pdf, corpus / "a.pdf")
+        shutil.copy(two_page_pdf, corpus / "b.pdf")
+        class_under_test = DirectoryParser(
+            FAKE_SETTINGS, DirectoryParserConfig(verbose=False)
+        )
+
+        result = class_under_test.get_number_of_pages(corpus)
+
+        assert result == (4, 2)
+        assert sorted(p.name for p in corpus.iterdir()) == ["a.pdf", "b.pdf"]
+        assert list((tmp_path / "cache" / "theia-parse").glob("*.sqlite"))
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+from theia_parse.parser.__spi__ import ScanConfig
+from theia_parse.parser.directory_scanner import DirectoryScanner
+
+
+def _create_tree(root: Path) -> None:
+    for rel_path, size in [
+        ("a.pdf", 10),
+        ("b.txt", 10),
+        ("sub/c.pdf", 100),
+        ("sub/deeper/d.PDF", 10),
+        ("skip/e.pdf", 10),
+        ("empty.pdf", 0),
+    ]:
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+
+
+class TestDirectoryScanner:
+    def test_scan_serial(self, tmp_path: Path):
+        _create_tree(tmp_path)
+        class_under_test = DirectoryScanner(ScanConfig(exclude=["skip"], min_size=1))
+        discovered = []
+
+        files = list(class_under_test.scan(tmp_path, discovered.append))
+
+        assert [f.path.relative_to(tmp_path).as_posix() for f in files] == [
+            "a.pdf",
+            "sub/c.pdf",
+            "sub/deeper/d.PDF",
+        ]
+        assert discovered == files
+        assert files[1].stat.st_size == 100
+
+    def test_scan_parallel(self, tmp_path: Path):
+        _create_tree(tmp_path)
+        class_under_test = DirectoryScanner(
+            ScanConfig(include=["sub/*"], max_size=50, workers=4)
+        )
+
+        files = list(class_under_test.scan(tmp_path))
+
+        assert [f.path.relative_to(tmp_path).as_posix() for f in files] == [
+            "sub/deeper/d.PDF"
+        ]
+
+    def test_scan_parallel_stops_early(self, tmp_path: Path):
+        for i in range(50):
+            (tmp_path / f"dir_{i}").mkdir()
+            (tmp_path / f"dir_{i}" / "a.pdf").write_bytes(b"x")
+        class_under_test = DirectoryScanner(ScanConfig(workers=4, queue_size=2))
+
+        files = class_under_test.scan(tmp_path)
+        first = next(files)
+        files.close()
+
+        assert first.path.name == "a.pdf"
+
+    def test_scan_symlinks(self, tmp_path: Path):
+        _create_tree(tmp_path / "data")
+        root = tmp_path / "root"
+        root.mkdir()
+        (root / "a.pdf").symlink_to(tmp_path / "data" / "a.pdf")
+        (root / "sub").symlink_to(tmp_path / "data" / "sub")
+
+        files = list(DirectoryScanner().scan(root))
+        followed = list(DirectoryScanner(ScanConfig(follow_symlinks=True)).scan(root))
+
+        assert [f.path.relative_to(root).as_posix() for f in files] == ["a.pdf"]
+        assert files[0].stat.st_size == 10
+        assert [f.path.relative_to(root).as_posix() for f in followed] == [
+            "a.pdf",
+            "sub/c.pdf",
+            "sub/deeper/d.PDF",
+        ]
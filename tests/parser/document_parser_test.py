@@ -0,0 +1,91 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import parsed_with_error_page, use_fake_llm
+from tests.parser.file_parser.pdf.pdf_parser_test import (
+    FAKE_SETTINGS,
+    VALID_RESPONSE,
+    FakeLLM,
+)
+from theia_parse.output import read_parsed, write_parsed
+from theia_parse.parser import document_parser
+from theia_parse.parser.__spi__ import (
+    DocumentParserConfig,
+    ImageExtractionConfig,
+    MediaStoreConfig,
+)
+from theia_parse.parser.document_parser import DocumentParser
+from theia_parse.util.instrumentation import (
+    disable_memory_profiling,
+    enable_memory_profiling,
+)
+
+
+CONFIG = DocumentParserConfig(
+    verbose=False,
+    use_vision=False,
+    image_extraction_config=ImageExtractionConfig(extract_images=False),
+)
+
+
+class TestDocumentParser:
+    def test_retry_failed_pages(self, two_page_pdf: Path):
+        parsed = parsed_with_error_page(two_page_pdf)
+        parsed.content[0].raw_llm_response = "kept"
+        parsed_path = write_parsed(two_page_pdf, parsed, "jsonl")
+        llm = FakeLLM([VALID_RESPONSE])
+
+        with use_fake_llm(llm):
+            class_under_test = DocumentParser(FAKE_SETTINGS, CONFIG)
+            result = class_under_test.retry_failed_pages(two_page_pdf)
+
+        written = read_parsed(parsed_path)
+        assert llm.n_calls == 1
+        assert result is not None
+        assert not result.get_error_page_numbers()
+        assert [p.page_number for p in written.content] == [1, 2]
+        assert written.content[0].raw_llm_response == "kept"
+        assert written.content[1].content[0].content == "Text"
+        assert [p.name for p in two_page_pdf.parent.glob("*.parsed.*")] == [
+            "doc.pdf.parsed.jsonl"
+        ]
+
+    def test_retry_failed_pages_finishes_memory_profile(
+        self, two_page_pdf: Path, tmp_path: Path
+    ):
+        write_parsed(two_page_pdf, parsed_with_error_page(two_page_pdf))
+        memory_profiler = enable_memory_profiling(
+            trace_allocations=False, output_dir=tmp_path / "memory"
+        )
+        try:
+            with use_fake_llm(FakeLLM([VALID_RESPONSE])):
+                DocumentParser(FAKE_SETTINGS, CONFIG).retry_failed_pages(two_page_pdf)
+        finally:
+            disable_memory_profiling()
+
+        assert memory_profiler.finish_document(two_page_pdf) is None
+        assert (tmp_path / "memory" / "doc.pdf.memory.json").is_file()
+
+    def test_close_unused_media_stores(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setattr(document_parser, "MAX_OPEN_MEDIA_STORES", 1)
+        config = CONFIG.model_copy(
+            update={"media_store_config": MediaStoreConfig(enabled=True)}
+        )
+        class_under_test = DocumentParser(FAKE_SETTINGS, config)
+
+        with class_under_test._use_media_store(tmp_path / "a" / "1.pdf") as store_a:
+            with class_under_test._use_media_store(tmp_path / "b" / "1.pdf") as store_b:
+                pass
+            # still in use by the first document
+            assert store_a.get_reference_count("logo") == 0
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            store_b.get_reference_count("logo")
+
+        class_under_test.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            store_a.get_reference_count("logo")
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.parser.__spi__ import DocumentParserConfig
+from theia_parse.parser.file_parser import ParserPool
+
+
+SETTINGS = LlmApiSettings(api_version="", model="gpt-test", endpoint="", key="")
+
+
+class TestParserPool:
+    def test_get_reuses_parsers(self):
+        class_under_test = ParserPool()
+
+        first = class_under_test.get(Path("a.pdf"), SETTINGS, DocumentParserConfig())
+        same = class_under_test.get(Path("b.PDF"), SETTINGS, DocumentParserConfig())
+        other = class_under_test.get(
+            Path("a.pdf"), SETTINGS, DocumentParserConfig(use_vision=False)
+        )
+        unsupported = class_under_test.get(Path("a.txt"), SETTINGS)
+
+        assert first is not None
+        assert same is first
+        assert other is not None and other is not first
+        assert unsupported is None
+
+    def test_get_drops_least_recently_used(self):
+        class_under_test = ParserPool(max_size=1)
+        config = DocumentParserConfig()
+
+        first = class_under_test.get(Path("a.pdf"), SETTINGS, config)
+        class_under_test.get(
+            Path("a.pdf"), SETTINGS, DocumentParserConfig(verbose=False)
+        )
+        again = class_under_test.get(Path("a.pdf"), SETTINGS, config)
+
+        assert again is not first
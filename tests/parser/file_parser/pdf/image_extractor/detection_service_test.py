@@ -0,0 +1,193 @@
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from PIL import Image as PilImage
+from PIL.Image import Image
+
+from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import (
+    DetectionParameters,
+    PageDetector,
+)
+from theia_parse.parser.file_parser.pdf.image_extractor.detection_service import (
+    DetectionClient,
+    DetectionServer,
+    DetectionServiceError,
+)
+from theia_parse.types import BBox
+
+
+PARAMETERS = DetectionParameters(
+    confidence_threshold=0.25, iou_threshold=0.45, containment_threshold=0.9
+)
+
+
+class FakeDetector(PageDetector):
+    """
+    Detects one box of the image size, slowly, to let batches fill. Images of
+    width 1 fail, batches with images of width 2 return no results, images of
+    width 3 block until released.
+    """
+
+    def __init__(self) -> None:
+        self.batch_sizes: list[int] = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    @property
+    def input_width(self) -> int:
+        return 640
+
+    @property
+    def input_height(self) -> int:
+        return 480
+
+    def detect(self, image: Image, parameters: DetectionParameters) -> list[BBox]:
+        if image.width == 1:
+            raise ValueError("Image too small")
+
+        return [(0.0, 0.0, float(image.width), parameters.confidence_threshold)]
+
+    def detect_batch(
+        self,
+        requests: Sequence[tuple[Image, DetectionParameters]],
+    ) -> list[list[BBox]]:
+        self.batch_sizes.append(len(requests))
+        self.started.set()
+        if any(image.width == 3 for image, _ in requests):
+            self.released.wait(timeout=5)
+        time.sleep(0.02)
+        if any(image.width == 2 for image, _ in requests):
+            return []
+
+        return super().detect_batch(requests)
+
+
+def _start(server: DetectionServer, socket_path: Path) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    while not socket_path.exists():
+        time.sleep(0.01)
+
+    return thread
+
+
+@pytest.fixture
+def server(tmp_path: Path):
+    detector = FakeDetector()
+    socket_path = tmp_path / "detection.sock"
+    server = DetectionServer(
+        socket_path, detector, max_batch_size=8, max_wait_seconds=0.05
+    )
+    thread = _start(server, socket_path)
+
+    yield server, detector, socket_path
+
+    detector.released.set()
+    server.shutdown()
+    thread.join()
+
+
+class TestDetectionService:
+    def test_detect_batches_requests(self, server):
+        class_under_test, detector, socket_path = server
+        client = DetectionClient(socket_path)
+        images = [PilImage.new("RGB", (10 + i, 20)) for i in range(16)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(lambda image: client.detect(image, PARAMETERS), images)
+            )
+
+        assert (client.input_width, client.input_height) == (640, 480)
+        assert results == [[(0.0, 0.0, 10.0 + i, 0.25)] for i in range(16)]
+        assert class_under_test.n_requests == 16
+        assert class_under_test.n_batches < 16
+        assert max(detector.batch_sizes) > 1
+
+    def test_detect_raises_errors(self, server):
+        _, _, socket_path = server
+        client = DetectionClient(socket_path)
+
+        with pytest.raises(DetectionServiceError, match="too small"):
+            client.detect(PilImage.new("RGB", (1, 1)), PARAMETERS)
+
+        assert client.detect(PilImage.new("L", (5, 5)), PARAMETERS) == [
+            (0.0, 0.0, 5.0, 0.25)
+        ]
+
+    def test_detect_mixed_batch(self, server):
+        class_under_test, detector, socket_path = server
+        client = DetectionClient(socket_path)
+        images = [PilImage.new("RGB", (1 if i == 3 else 10, 20)) for i in range(8)]
+
+        def detect(image: Image) -> list[BBox] | str:
+            try:
+                return client.detect(image, PARAMETERS)
+            except DetectionServiceError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(detect, images))
+
+        assert results[3] == "Image too small"
+        assert results[:3] + results[4:] == [[(0.0, 0.0, 10.0, 0.25)]] * 7
+        assert class_under_test.n_requests == 8
+        assert max(detector.batch_sizes) > 1
+
+    def test_detect_without_service(self, tmp_path: Path):
+        client = DetectionClient(tmp_path / "missing.sock")
+
+        with pytest.raises(DetectionServiceError, match="not available"):
+            client.detect(PilImage.new("RGB", (5, 5)), PARAMETERS)
+
+    def test_detect_survives_wrong_number_of_results(self, server):
+        _, _, socket_path = server
+        client = DetectionClient(socket_path)
+
+        with pytest.raises(DetectionServiceError, match="zip"):
+            client.detect(PilImage.new("RGB", (2, 5)), PARAMETERS)
+
+        assert client.detect(PilImage.new("RGB", (5, 5)), PARAMETERS) == [
+            (0.0, 0.0, 5.0, 0.25)
+        ]
+
+    def test_detect_times_out(self, tmp_path: Path):
+        detector = FakeDetector()
+        socket_path = tmp_path / "detection.sock"
+        class_under_test = DetectionServer(
+            socket_path, detector, request_timeout_seconds=0.05
+        )
+        thread = _start(class_under_test, socket_path)
+        client = DetectionClient(socket_path)
+
+        with pytest.raises(DetectionServiceError, match="timed out"):
+            client.detect(PilImage.new("RGB", (3, 5)), PARAMETERS)
+
+        detector.released.set()
+        class_under_test.shutdown()
+        thread.join()
+
+    def test_shutdown_fails_pending_requests(self, tmp_path: Path):
+        detector = FakeDetector()
+        socket_path = tmp_path / "detection.sock"
+        class_under_test = DetectionServer(socket_path, detector, max_batch_size=1)
+        thread = _start(class_under_test, socket_path)
+
+        running = class_under_test.submit(PilImage.new("RGB", (3, 5)), PARAMETERS)
+        detector.started.wait(timeout=5)
+        pending = class_under_test.submit(PilImage.new("RGB", (5, 5)), PARAMETERS)
+        class_under_test.shutdown()
+        while not class_under_test._stopped.is_set():
+            time.sleep(0.01)
+        detector.released.set()
+        thread.join()
+
+        assert running.result(timeout=5) == [(0.0, 0.0, 3.0, 0.25)]
+        with pytest.raises(DetectionServiceError, match="stopped"):
+            pending.result(timeout=5)
+        with pytest.raises(DetectionServiceError, match="stopped"):
+            class_under_test.submit(PilImage.new("RGB", (5, 5)), PARAMETERS)
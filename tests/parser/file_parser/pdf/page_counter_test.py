@@ -0,0 +1,136 @@
+import zlib
+from pathlib import Path
+
+import pdfplumber
+
+from tests.conftest import RESOURCE_PATH
+from theia_parse.parser.file_parser.pdf.page_counter import (
+    count_pdf_pages,
+    count_pdf_pages_with_fallback,
+)
+
+
+def _page_objects(n_pages: int, first_obj: int) -> list[bytes]:
+    return [
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"
+        for _ in range(first_obj, first_obj + n_pages)
+    ]
+
+
+def _classic_pdf(n_pages: int, indirect_count: bool = False) -> bytes:
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(n_pages))
+    count = b"%d 0 R" % (3 + n_pages) if indirect_count else b"%d" % n_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %s >>" % (kids, count),
+        *_page_objects(n_pages, 3),
+    ]
+    if indirect_count:
+        objects.append(b"%d" % n_pages)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_num, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+
+    return bytes(out)
+
+
+def _compressed_pdf(n_pages: int) -> bytes:
+    """Catalog and page tree root in an object stream, xref stream with predictor"""
+
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(n_pages))
+    compressed = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n_pages),
+    ]
+    objstm_num = 3 + n_pages
+    xref_num = objstm_num + 1
+
+    out = bytearray(b"%PDF-1.5\n")
+    entries: dict[int, tuple[int, int, int]] = {0: (0, 0, 255)}
+    for i, body in enumerate(_page_objects(n_pages, 3)):
+        entries[3 + i] = (1, len(out), 0)
+        out += b"%d 0 obj\n%s\nendobj\n" % (3 + i, body)
+
+    header = bytearray()
+    objects = bytearray()
+    for i, body in enumerate(compressed):
+        header += b"%d %d " % (i + 1, len(objects))
+        objects += body + b"\n"
+        entries[i + 1] = (2, objstm_num, i)
+    stream = zlib.compress(bytes(header) + bytes(objects))
+    entries[objstm_num] = (1, len(out), 0)
+    out += b"%d 0 obj\n<< /Type /ObjStm /N 2 /First %d /Filter /FlateDecode " % (
+        objstm_num,
+        len(header),
+    )
+    out += b"/Length %d >>\nstream\n%s\nendstream\nendobj\n" % (len(stream), stream)
+
+    entries[xref_num] = (1, len(out), 0)
+    rows = bytearray()
+    previous = bytes(4)
+    for obj_num in range(xref_num + 1):
+        t, f2, f3 = entries[obj_num]
+        row = bytes([t]) + f2.to_bytes(2, "big") + bytes([f3])
+        rows += b"\x02" + bytes(
+            (a - b) & 0xFF for a, b in zip(row, previous, strict=True)
+        )
+        previous = row
+    stream = zlib.compress(bytes(rows))
+    xref_offset = len(out)
+    out += (
+        b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 2 1] /Root 1 0 R "
+        b"/Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 4 >> "
+        b"/Length %d >>\nstream\n%s\nendstream\nendobj\n"
+        % (xref_num, xref_num + 1, len(stream), stream)
+    )
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+
+    return bytes(out)
+
+
+class TestPageCounter:
+    def test_count_sample(self):
+        path = RESOURCE_PATH / "sample_1.pdf"
+        with pdfplumber.open(path) as pdf:
+            expected = len(pdf.pages)
+
+        assert count_pdf_pages(path) == expected
+
+    def test_count_classic_xref(self, tmp_path: Path):
+        path = tmp_path / "classic.pdf"
+        path.write_bytes(_classic_pdf(5))
+
+        assert count_pdf_pages(path) == 5
+        with pdfplumber.open(path) as pdf:
+            assert len(pdf.pages) == 5
+
+    def test_count_indirect(self, tmp_path: Path):
+        path = tmp_path / "indirect.pdf"
+        path.write_bytes(_classic_pdf(12, indirect_count=True))
+
+        assert count_pdf_pages(path) == 12
+        with pdfplumber.open(path) as pdf:
+            assert len(pdf.pages) == 12
+
+    def test_count_xref_and_object_streams(self, tmp_path: Path):
+        path = tmp_path / "compressed.pdf"
+        path.write_bytes(_compressed_pdf(3))
+
+        assert count_pdf_pages(path) == 3
+        with pdfplumber.open(path) as pdf:
+            assert len(pdf.pages) == 3
+
+    def test_count_broken_file(self, tmp_path: Path):
+        path = tmp_path / "broken.pdf"
+        path.write_bytes(b"%PDF-1.4\nnot a pdf")
+
+        assert count_pdf_pages(path) is None
+        assert count_pdf_pages_with_fallback(path) is None
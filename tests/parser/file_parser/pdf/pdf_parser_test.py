@@ -1,13 +1,64 @@
+import pytest
+
 from tests.conftest import LOCAL_RESOURCE_PATH, RESOURCE_PATH
-from theia_parse.llm.__spi__ import LlmApiEnvSettings
+from theia_parse.llm.__spi__ import (
+    LLM,
+    LlmApiEnvSettings,
+    LlmApiSettings,
+    LlmError,
+    LlmResponse,
+    SpendLimitExceededError,
+)
+from theia_parse.llm.spend_limit import SpendLimit, SpendLimitedLLM
+from theia_parse.llm.usage_estimator import UsageEstimator
+from theia_parse.model import ErrorType, LlmUsage
 from theia_parse.parser.__spi__ import (
     DocumentParserConfig,
+    ImageExtractionConfig,
+    ModelPrice,
+    PostImproveConfig,
+    PriceTable,
     PromptConfig,
     RawParserConfig,
+    RetryConfig,
 )
 from theia_parse.parser.file_parser.pdf.pdf_parser import PdfParser
 
 
+class FakeLLM(LLM):
+    def __init__(self, responses: list[str | LlmError]) -> None:
+        self.responses = responses
+        self.n_calls = 0
+
+    def generate(self, *args, **kwargs) -> LlmResponse:
+        response = self.responses[self.n_calls]
+        self.n_calls += 1
+        if isinstance(response, LlmError):
+            raise response
+
+        return LlmResponse(
+            raw=response,
+            usage=LlmUsage(request_tokens=10, n_calls=1, model="gpt-test-0101"),
+        )
+
+
+FAKE_SETTINGS = LlmApiSettings(api_version="", model="", endpoint="", key="")
+VALID_RESPONSE = '{"page_content_blocks": [{"type": "text", "content": "Text"}]}'
+
+
+def _offline_parser(llm: LLM, **kwargs) -> PdfParser:
+    config = DocumentParserConfig(
+        use_vision=False,
+        image_extraction_config=ImageExtractionConfig(extract_images=False),
+        retry_config=RetryConfig(backoff_base_seconds=0),
+        **kwargs,
+    )
+    parser = PdfParser(FAKE_SETTINGS, config)
+    parser._llm = llm
+
+    return parser
+
+
 class TestPdfParser:
     def test_parse(self):
         class_under_test = PdfParser(LlmApiEnvSettings().to_settings())
@@ -21,3 +72,81 @@ class TestPdfParser:
         result = class_under_test.parse(sample, config)
 
         assert result is not None
+
+    def test_parse_retries_page(self):
+        llm = FakeLLM(
+            [LlmError(ErrorType.TRANSIENT, "timeout"), "no json", VALID_RESPONSE]
+        )
+        class_under_test = _offline_parser(llm)
+
+        result = class_under_test.parse(RESOURCE_PATH / "sample_1.pdf")
+
+        assert llm.n_calls == 3
+        assert not result.content[0].error
+        assert result.content[0].content[0].content == "Text"
+        assert result.content[0].token_usage.request_tokens == 20
+        assert result.content[0].stage_usage["extraction"].n_retries == 2
+
+    def test_parse_reports_stage_usage(self):
+        llm = FakeLLM(["raw text", VALID_RESPONSE])
+        class_under_test = _offline_parser(
+            llm,
+            raw_parser_config=RawParserConfig(parser_type="llm"),
+            price_table=PriceTable(
+                model_prices={"gpt-test": ModelPrice(request=1000, response=0)}
+            ),
+        )
+
+        result = class_under_test.parse(RESOURCE_PATH / "sample_1.pdf")
+
+        assert result.content[0].raw_extracted_text == "raw text"
+        assert set(result.stage_usage) == {"raw-parse", "extraction"}
+        assert result.stage_usage["raw-parse"].n_calls == 1
+        assert result.token_usage.n_calls == 2
+        assert result.token_usage.cost == 0.02
+
+    def test_parse_returns_classified_error_page(self):
+        llm = FakeLLM([LlmError(ErrorType.CONTENT_FILTER, "filtered")])
+        class_under_test = _offline_parser(llm)
+
+        result = class_under_test.parse(RESOURCE_PATH / "sample_1.pdf")
+
+        assert llm.n_calls == 1
+        assert result.content[0].error
+        assert result.content[0].error_type == ErrorType.CONTENT_FILTER
+        assert result.get_error_page_numbers() == [1]
+
+    def test_plan_estimates_usage_without_llm_calls(self):
+        llm = FakeLLM([])
+        class_under_test = _offline_parser(
+            llm,
+            post_improve=True,
+            post_improve_config=PostImproveConfig(quality_threshold=None),
+            raw_parser_config=RawParserConfig(parser_type="llm"),
+        )
+
+        result = class_under_test.plan(RESOURCE_PATH / "sample_1.pdf")
+
+        assert llm.n_calls == 0
+        assert len(result.content) == 1
+        assert set(result.stage_usage) == {"raw-parse", "extraction", "improve"}
+        assert result.token_usage.n_calls == 3
+        # the rendered prompts contain the extracted text of about 2300 chars
+        assert result.stage_usage["extraction"].request_tokens > 2300 / 4
+
+    def test_parse_aborts_before_exceeding_spend_limit(self):
+        llm = FakeLLM([VALID_RESPONSE])
+        price_table = PriceTable(
+            model_prices={"gpt-test": ModelPrice(request=1000, response=1000)}
+        )
+        class_under_test = _offline_parser(llm, price_table=price_table)
+        spend_limit = SpendLimit(max_cost=0.5)
+        class_under_test._llm = SpendLimitedLLM(
+            llm, spend_limit, UsageEstimator("gpt-test", price_table=price_table)
+        )
+
+        with pytest.raises(SpendLimitExceededError):
+            class_under_test.parse(RESOURCE_PATH / "sample_1.pdf")
+
+        assert llm.n_calls == 0
+        assert spend_limit.spent == 0
@@ -0,0 +1,200 @@
+from collections.abc import Collection, Iterable
+from pathlib import Path
+from threading import Lock
+
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.model import (
+    DocumentPage,
+    ErrorType,
+    HeadingElement,
+    LlmUsage,
+    ParsedDocument,
+)
+from theia_parse.parser.__spi__ import DocumentParserConfig, PromptConfig
+from theia_parse.parser.checkpoint import PageCheckpoint
+from theia_parse.parser.document_parser import DocumentParser
+from theia_parse.parser.file_parser.__spi__ import FileParser
+from theia_parse.parser.page_scheduler import PageScheduler, ScheduledDocument
+
+
+class FakeFileParser(FileParser):
+    def __init__(
+        self,
+        path_to_n_pages: dict[Path, int],
+        heading_page_numbers: Collection[int] = (),
+    ) -> None:
+        self._path_to_n_pages = path_to_n_pages
+        self._heading_page_numbers = heading_page_numbers
+        self._lock = Lock()
+        self.calls: list[tuple[str, int, list[int]]] = []
+
+    def parse(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        raise NotImplementedError
+
+    def parse_paged(
+        self,
+        path: Path,
+        page_numbers: Collection[int] | None = None,
+        context_pages: Iterable[DocumentPage] | None = None,
+    ) -> Iterable[DocumentPage]:
+        context_page_numbers = [p.page_number for p in context_pages or []]
+        for page_number in page_numbers or []:
+            if page_number > self._path_to_n_pages[path]:
+                # counted more pages than the file has
+                continue
+            with self._lock:
+                self.calls.append((path.name, page_number, context_page_numbers))
+            heading = HeadingElement(content=f"{page_number}", heading_level=1)
+            yield DocumentPage(
+                page_number=page_number,
+                content=[heading] if page_number in self._heading_page_numbers else [],
+                raw_extracted_text="",
+                raw_llm_response="",
+                token_usage=LlmUsage(),
+            )
+
+    def parse_hull(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        return ParsedDocument(path=str(path), md5_sum=md5_sum, content=[])
+
+    def plan(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        raise NotImplementedError
+
+    def get_number_of_pages(self, path: Path) -> int | None:
+        if path.name.startswith("unreadable"):
+            raise OSError(f"Could not open {path}")
+
+        return self._path_to_n_pages.get(path)
+
+
+def _scheduler(
+    file_parser: FileParser,
+    config: DocumentParserConfig,
+    **kwargs,
+) -> PageScheduler:
+    settings = LlmApiSettings(api_version="", model="", endpoint="", key="")
+    document_parser = DocumentParser(settings, config)
+    document_parser.get_file_parser = lambda _: file_parser
+
+    return PageScheduler(document_parser, **kwargs)
+
+
+class TestPageScheduler:
+    def test_shortest_document_first(self, tmp_path: Path):
+        long_doc, short_doc = tmp_path / "long.pdf", tmp_path / "short.pdf"
+        file_parser = FakeFileParser({long_doc: 4, short_doc: 1})
+        config = DocumentParserConfig(
+            save_file=False,
+            prompt_config=PromptConfig(consider_last_headings_n=0),
+        )
+        class_under_test = _scheduler(
+            file_parser, config, max_workers=1, policy="shortest-document-first"
+        )
+
+        parsed = list(
+            class_under_test.run(
+                [ScheduledDocument(long_doc, "a"), ScheduledDocument(short_doc, "b")]
+            )
+        )
+
+        assert [d.path for d in parsed] == [str(short_doc), str(long_doc)]
+        assert [p.page_number for p in parsed[1].content] == [1, 2, 3, 4]
+        assert file_parser.calls[0] == ("short.pdf", 1, [])
+
+    def test_ordered_pages_with_context(self, tmp_path: Path):
+        doc_a, doc_b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+        file_parser = FakeFileParser({doc_a: 3, doc_b: 2}, heading_page_numbers=[2])
+        config = DocumentParserConfig(save_file=True)
+        checkpoint = PageCheckpoint(doc_a)
+        checkpoint.open(ParsedDocument(path=str(doc_a), md5_sum="a", content=[]))
+        checkpoint.append(
+            DocumentPage(
+                page_number=1,
+                content=[],
+                raw_extracted_text="",
+                raw_llm_response="",
+                token_usage=LlmUsage(),
+            )
+        )
+        class_under_test = _scheduler(file_parser, config, max_workers=4)
+
+        parsed = list(
+            class_under_test.run(
+                [ScheduledDocument(doc_a, "a"), ScheduledDocument(doc_b, "b", 2)]
+            )
+        )
+
+        assert sorted(d.path for d in parsed) == [str(doc_a), str(doc_b)]
+        assert ("a.pdf", 3, [2]) in file_parser.calls
+        assert ("b.pdf", 2, []) in file_parser.calls
+        assert not any(c[:2] == ("a.pdf", 1) for c in file_parser.calls)
+        assert (tmp_path / "a.pdf.parsed.json").is_file()
+        assert not checkpoint.path.exists()
+
+    def test_skip_documents_without_pages(self, tmp_path: Path):
+        doc_a, broken = tmp_path / "a.pdf", tmp_path / "broken.pdf"
+        file_parser = FakeFileParser({doc_a: 1})
+        class_under_test = _scheduler(
+            file_parser, DocumentParserConfig(save_file=True), max_workers=2
+        )
+
+        parsed = list(
+            class_under_test.run(
+                [ScheduledDocument(broken, "b"), ScheduledDocument(doc_a, "a")]
+            )
+        )
+
+        assert [d.path for d in parsed] == [str(doc_a)]
+        assert not (tmp_path / "broken.pdf.parsed.json").exists()
+
+    def test_skip_documents_failing_to_start(self, tmp_path: Path):
+        doc_a, unreadable = tmp_path / "a.pdf", tmp_path / "unreadable.pdf"
+        file_parser = FakeFileParser({doc_a: 2})
+        class_under_test = _scheduler(
+            file_parser, DocumentParserConfig(save_file=False), max_workers=2
+        )
+
+        parsed = list(
+            class_under_test.run(
+                [ScheduledDocument(unreadable, "u"), ScheduledDocument(doc_a, "a")]
+            )
+        )
+
+        assert [d.path for d in parsed] == [str(doc_a)]
+        assert [p.page_number for p in parsed[0].content] == [1, 2]
+
+    def test_missing_pages_are_errors(self, tmp_path: Path):
+        doc_a = tmp_path / "a.pdf"
+        file_parser = FakeFileParser({doc_a: 1})
+        class_under_test = _scheduler(
+            file_parser, DocumentParserConfig(save_file=False), max_workers=2
+        )
+
+        parsed = list(class_under_test.run([ScheduledDocument(doc_a, "a", 2)]))
+
+        assert [p.page_number for p in parsed[0].content] == [1, 2]
+        assert parsed[0].get_error_page_numbers() == [2]
+        assert parsed[0].content[1].error_type == ErrorType.UNKNOWN
+
+    def test_context_pages_are_limited(self, tmp_path: Path):
+        doc_a = tmp_path / "a.pdf"
+        file_parser = FakeFileParser({doc_a: 8}, heading_page_numbers=[1, 2, 3, 5])
+        config = DocumentParserConfig(
+            save_file=False,
+            prompt_config=PromptConfig(
+                consider_last_headings_n=2, consider_last_parsed_pages_n=1
+            ),
+        )
+        class_under_test = _scheduler(file_parser, config, max_workers=4)
+
+        list(class_under_test.run([ScheduledDocument(doc_a, "a")]))
+
+        assert file_parser.calls == [
+            ("a.pdf", 1, []),
+            ("a.pdf", 2, [1]),
+            ("a.pdf", 3, [1, 2]),
+            ("a.pdf", 4, [2, 3]),
+            ("a.pdf", 5, [2, 3, 4]),
+            ("a.pdf", 6, [3, 5]),
+            ("a.pdf", 7, [3, 5, 6]),
+            ("a.pdf", 8, [3, 5, 7]),
+        ]
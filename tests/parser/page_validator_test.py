@@ -0,0 +1,66 @@
+from theia_parse.model import HeadingElement
+from theia_parse.parser.__spi__ import PostImproveConfig
+from theia_parse.parser.page_validator import PageValidator
+
+
+class TestPageValidator:
+    def test_score_valid_page(self):
+        class_under_test = PageValidator(PostImproveConfig())
+        parsed = {
+            "page_content_blocks": [
+                {"type": "heading", "content": "2.1 Results", "heading_level": 2},
+                {"type": "text", "content": "All values were measured twice."},
+                {"type": "image", "content": "A bar chart", "image_number": 1},
+            ]
+        }
+
+        quality = class_under_test.score(
+            parsed,
+            raw_extracted_text="2.1 Results\nAll values were measured twice.",
+            previous_headings=[HeadingElement(content="2 Study", heading_level=1)],
+            image_numbers=[1],
+        )
+
+        assert quality.score == 1.0
+        assert not class_under_test.needs_improvement(quality)
+
+    def test_score_invalid_page(self):
+        class_under_test = PageValidator(PostImproveConfig())
+
+        quality = class_under_test.score(None, raw_extracted_text="Some text")
+
+        assert quality.json_validity == 0
+        assert quality.text_coverage == 0
+        assert class_under_test.needs_improvement(quality)
+
+    def test_score_partial_page(self):
+        class_under_test = PageValidator(PostImproveConfig(quality_threshold=0.9))
+        parsed = {
+            "page_content_blocks": [
+                {"type": "heading", "content": "Results", "heading_level": 3},
+                {"type": "text", "content": "All values"},
+                {"type": "image", "content": "A bar chart", "image_number": 4},
+                {"type": "unknown", "content": "?"},
+            ]
+        }
+
+        quality = class_under_test.score(
+            parsed,
+            raw_extracted_text="Results All values were measured twice",
+            previous_headings=[HeadingElement(content="Study", heading_level=1)],
+            image_numbers=[1],
+        )
+
+        assert quality.json_validity == 0.75
+        assert quality.text_coverage == 0.5
+        assert quality.heading_consistency == 0
+        assert quality.image_references == 0
+        assert class_under_test.needs_improvement(quality)
+
+    def test_threshold_none_always_improves(self):
+        class_under_test = PageValidator(PostImproveConfig(quality_threshold=None))
+
+        quality = class_under_test.score({"page_content_blocks": []}, "")
+
+        assert quality.score == 1.0
+        assert class_under_test.needs_improvement(quality)
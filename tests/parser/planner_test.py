@@ -0,0 +1,58 @@
+import shutil
+
+from tests.conftest import RESOURCE_PATH
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.model import LlmUsage
+from theia_parse.parser.__spi__ import (
+    DirectoryParserConfig,
+    DocumentParserConfig,
+    ImageExtractionConfig,
+    ModelPrice,
+    PlanConfig,
+    PriceTable,
+)
+from theia_parse.parser.directory_parser import DirectoryParser
+from theia_parse.parser.planner import project_wall_seconds
+
+
+SETTINGS = LlmApiSettings(api_version="", model="gpt-test", endpoint="", key="")
+
+
+class TestPlanner:
+    def test_project_wall_seconds(self):
+        usage = LlmUsage(n_calls=120, total_tokens=600_000, latency_seconds=240)
+
+        latency_bound = project_wall_seconds(usage, 4, PlanConfig())
+        rate_limited = project_wall_seconds(
+            usage, 4, PlanConfig(requests_per_minute=60, tokens_per_minute=100_000)
+        )
+
+        assert latency_bound == (60, "latency")
+        assert rate_limited == (360, "tokens")
+
+    def test_directory_parser_plan(self, tmp_path):
+        shutil.copy(RESOURCE_PATH / "sample_1.pdf", tmp_path / "a.pdf")
+        shutil.copy(RESOURCE_PATH / "sample_1.pdf", tmp_path / "b.pdf")
+        config = DirectoryParserConfig(
+            verbose=False,
+            document_parser_config=DocumentParserConfig(
+                use_vision=False,
+                image_extraction_config=ImageExtractionConfig(extract_images=False),
+                price_table=PriceTable(
+                    model_prices={"gpt-test": ModelPrice(request=1, response=1)}
+                ),
+                max_cost=0.0001,
+            ),
+        )
+        class_under_test = DirectoryParser(SETTINGS, config)
+
+        result = class_under_test.plan(tmp_path)
+
+        assert result.usage.n_documents == 1
+        assert result.n_duplicates == 1
+        assert result.n_pages == 1
+        assert result.usage.token_usage.n_calls == 1
+        assert result.cost is not None
+        assert result.exceeds_max_cost
+        assert not list(tmp_path.glob("*.parsed.*"))
+        assert not list(tmp_path.glob("*.duplicate"))
@@ -0,0 +1,28 @@
+from theia_parse.llm.__spi__ import LlmError
+from theia_parse.model import ErrorType
+from theia_parse.parser.__spi__ import RetryConfig
+from theia_parse.parser.retry_policy import RetryPolicy
+
+
+class TestRetryPolicy:
+    def test_get_delay(self):
+        class_under_test = RetryPolicy(
+            RetryConfig(backoff_base_seconds=1, backoff_max_seconds=3, jitter=False)
+        )
+        error = LlmError(ErrorType.TRANSIENT, "timeout")
+
+        delays = [class_under_test.get_delay(error, a) for a in range(1, 5)]
+
+        assert delays == [1, 2, 3, None]
+
+    def test_get_delay_respects_retry_after(self):
+        class_under_test = RetryPolicy(RetryConfig(jitter=False))
+        error = LlmError(ErrorType.RATE_LIMIT, "rate limit", retry_after=30)
+
+        assert class_under_test.get_delay(error, 1) == 30
+
+    def test_get_delay_not_retryable(self):
+        class_under_test = RetryPolicy(RetryConfig())
+        error = LlmError(ErrorType.CONTENT_FILTER, "filtered")
+
+        assert class_under_test.get_delay(error, 1) is None
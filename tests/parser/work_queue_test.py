@@ -0,0 +1,92 @@
+from pathlib import Path
+
+from theia_parse.parser.work_queue import SharedWorkQueue, TaskStatus
+
+
+class TestSharedWorkQueue:
+    def test_claim_and_complete(self, tmp_path: Path):
+        db_path = tmp_path / "queue.sqlite"
+        worker_a = SharedWorkQueue(db_path, worker_id="a")
+        worker_b = SharedWorkQueue(db_path, worker_id="b")
+
+        worker_a.enqueue([Path("1.pdf"), Path("2.pdf")])
+        worker_b.enqueue([Path("2.pdf")])
+
+        assert worker_a.claim() == Path("1.pdf")
+        assert worker_b.claim() == Path("2.pdf")
+        assert worker_a.claim() is None
+
+        worker_a.complete(Path("1.pdf"))
+        worker_b.fail(Path("2.pdf"), "error")
+
+        assert worker_a.get_status_counts() == {
+            TaskStatus.DONE: 1,
+            TaskStatus.PENDING: 1,
+        }
+        assert worker_a.claim() == Path("2.pdf")
+
+        worker_a.close()
+        worker_b.close()
+
+    def test_reclaim_expired_lease(self, tmp_path: Path):
+        db_path = tmp_path / "queue.sqlite"
+        crashed = SharedWorkQueue(db_path, worker_id="a", lease_seconds=-1)
+        worker = SharedWorkQueue(db_path, worker_id="b")
+
+        crashed.enqueue([Path("1.pdf")])
+        assert crashed.claim() == Path("1.pdf")
+        assert worker.claim() == Path("1.pdf")
+
+        crashed.complete(Path("1.pdf"))
+        assert worker.get_status_counts() == {TaskStatus.LEASED: 1}
+
+        worker.close()
+        crashed.close()
+
+    def test_fail_after_max_attempts_of_expired_leases(self, tmp_path: Path):
+        db_path = tmp_path / "queue.sqlite"
+        crashing = [
+            SharedWorkQueue(db_path, worker_id=str(i), lease_seconds=-1, max_attempts=2)
+            for i in range(2)
+        ]
+        worker = SharedWorkQueue(db_path, worker_id="b", max_attempts=2)
+
+        worker.enqueue([Path("1.pdf")])
+        assert [c.claim() for c in crashing] == [Path("1.pdf")] * 2
+        assert worker.claim() is None
+        assert worker.get_status_counts() == {TaskStatus.FAILED: 1}
+
+        worker.close()
+        for c in crashing:
+            c.close()
+
+    def test_share_across_mount_points(self, tmp_path: Path):
+        db_path = tmp_path / "queue.sqlite"
+        mount_a, mount_b = Path("/mnt/a/corpus"), Path("/data/corpus")
+        worker_a = SharedWorkQueue(db_path, root=mount_a, worker_id="a")
+        worker_b = SharedWorkQueue(db_path, root=mount_b, worker_id="b")
+
+        worker_a.enqueue([mount_a / "sub" / "1.pdf"])
+        worker_b.enqueue([mount_b / "sub" / "1.pdf", mount_b / "2.pdf"])
+
+        assert worker_b.claim() == mount_b / "sub" / "1.pdf"
+        assert worker_a.claim() == mount_a / "2.pdf"
+        assert worker_a.claim() is None
+        assert worker_b.register_hash("abc", mount_b / "sub" / "1.pdf") is None
+        assert worker_a.register_hash("abc", mount_a / "2.pdf") == (
+            mount_a / "sub" / "1.pdf"
+        )
+
+        worker_a.complete(mount_a / "2.pdf")
+        worker_b.complete(mount_b / "sub" / "1.pdf")
+        assert worker_a.get_status_counts() == {TaskStatus.DONE: 2}
+
+        worker_a.close()
+        worker_b.close()
+
+    def test_register_hash(self, tmp_path: Path):
+        with SharedWorkQueue(tmp_path / "queue.sqlite") as class_under_test:
+            assert class_under_test.register_hash("abc", Path("1.pdf")) is None
+            assert class_under_test.register_hash("abc", Path("1.pdf")) is None
+            assert class_under_test.register_hash("abc", Path("2.pdf")) == Path("1.pdf")
+            assert class_under_test.get_hash_to_path() == {"abc": Path("1.pdf")}
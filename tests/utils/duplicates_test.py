@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from theia_parse.model import ParsedDocument
+from theia_parse.output import find_parsed_path, read_parsed, write_parsed
+from theia_parse.output.lazy import LazyParsedDocument
+from theia_parse.util.duplicates import restore_duplicates
+
+
+class TestRestoreDuplicates:
+    def test_restore_as_reference(self, tmp_path: Path):
+        source_path = tmp_path / "a.pdf"
+        dest_path = tmp_path / "sub" / "b.pdf"
+        dest_path.parent.mkdir()
+        write_parsed(
+            source_path,
+            ParsedDocument(path=str(source_path), md5_sum="abc", content=[]),
+            "jsonl",
+        )
+        (tmp_path / "sub" / "b.pdf.duplicate").write_text(str(source_path))
+
+        assert restore_duplicates(tmp_path, mode="reference") == 1
+
+        parsed_path = find_parsed_path(dest_path)
+        assert parsed_path == tmp_path / "sub" / "b.pdf.parsed.ref"
+        assert read_parsed(parsed_path).path == str(dest_path)
+        assert read_parsed(parsed_path).md5_sum == "abc"
+        assert LazyParsedDocument(parsed_path).header.path == str(dest_path)
+        assert not (tmp_path / "sub" / "b.pdf.duplicate").exists()
+
+    def test_restore_as_copy(self, tmp_path: Path):
+        source_path = tmp_path / "a.pdf"
+        write_parsed(source_path, ParsedDocument(path=str(source_path), content=[]))
+        (tmp_path / "b.pdf.duplicate").write_text(str(source_path))
+
+        assert restore_duplicates(tmp_path) == 1
+        assert read_parsed(tmp_path / "b.pdf.parsed.json").path == str(
+            tmp_path / "b.pdf"
+        )
@@ -0,0 +1,69 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from theia_parse.util.files import get_md5_sum
+from theia_parse.util.hash_index import FileHashIndex, get_default_index_path
+
+
+class TestFileHashIndex:
+    def test_get_md5_sums(self, tmp_path: Path):
+        paths = [tmp_path / f"{i}.pdf" for i in range(3)]
+        for i, path in enumerate(paths):
+            path.write_bytes(bytes([i]) * 10_000)
+        db_path = tmp_path / "index.sqlite"
+
+        with FileHashIndex(db_path, max_workers=2) as class_under_test:
+            md5_sums = class_under_test.get_md5_sums(paths)
+            class_under_test.set_number_of_pages(paths[0], 7)
+
+        assert md5_sums == {p: get_md5_sum(p) for p in paths}
+
+        with FileHashIndex(db_path) as class_under_test:
+            assert class_under_test.get_number_of_pages(paths[0]) == 7
+            assert class_under_test._get_cached(
+                paths[1], paths[1].stat(), "md5_sum"
+            ) == get_md5_sum(paths[1])
+
+    def test_invalidate_changed_file(self, tmp_path: Path):
+        path = tmp_path / "a.pdf"
+        path.write_bytes(b"first")
+
+        with FileHashIndex(tmp_path / "index.sqlite") as class_under_test:
+            first = class_under_test.get_md5_sum(path)
+            class_under_test.set_number_of_pages(path, 3)
+
+            path.write_bytes(b"second version")
+            os.utime(path, ns=(0, 1))
+            second = class_under_test.get_md5_sum(path)
+
+            assert first != second
+            assert second == get_md5_sum(path)
+            assert class_under_test.get_number_of_pages(path) is None
+
+    def test_without_wal(self, tmp_path: Path):
+        path = tmp_path / "a.pdf"
+        path.write_bytes(b"content")
+
+        with FileHashIndex(tmp_path / "index.sqlite", wal=False) as class_under_test:
+            journal_mode = class_under_test._connection.execute(
+                "PRAGMA journal_mode"
+            ).fetchone()[0]
+            class_under_test.get_md5_sum(path)
+
+        assert journal_mode == "delete"
+        assert not (tmp_path / "index.sqlite-wal").exists()
+
+    def test_get_default_index_path(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+
+        index_path = get_default_index_path(corpus)
+
+        assert index_path.parent == tmp_path / "cache" / "theia-parse"
+        assert index_path == get_default_index_path(tmp_path / "." / "corpus")
+        assert index_path != get_default_index_path(tmp_path)
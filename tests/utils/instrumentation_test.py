@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+
+from theia_parse.util.instrumentation import (
+    Metrics,
+    disable_memory_profiling,
+    disable_metrics,
+    disable_tracing,
+    enable_memory_profiling,
+    enable_metrics,
+    enable_tracing,
+    finish_document,
+    get_metrics,
+    span,
+    stage,
+)
+
+
+class TestInstrumentation:
+    def test_stage_disabled(self):
+        disable_metrics()
+
+        with stage("render"):
+            pass
+
+        assert get_metrics() is None
+
+    def test_stage_enabled(self, tmp_path: Path):
+        metrics = enable_metrics(buckets=(1.0, 10.0))
+        try:
+            with stage("render"):
+                pass
+            with stage("render"):
+                pass
+        finally:
+            disable_metrics()
+        metrics.observe("llm-extraction", 5.0)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["render"].count == 2
+        assert snapshot["render"].buckets[0] == (1.0, 2)
+        assert snapshot["llm-extraction"].buckets == [
+            (1.0, 0),
+            (10.0, 1),
+            (float("inf"), 1),
+        ]
+
+        metrics.write(tmp_path / "metrics.json")
+        assert (
+            json.loads((tmp_path / "metrics.json").read_text())["render"]["count"] == 2
+        )
+
+    def test_to_prometheus(self):
+        class_under_test = Metrics(buckets=(1.0,))
+        class_under_test.observe("llm-extraction", 0.5)
+
+        assert class_under_test.to_prometheus().splitlines()[2:] == [
+            'theia_parse_stage_seconds_bucket{stage="llm-extraction",le="1.0"} 1',
+            'theia_parse_stage_seconds_bucket{stage="llm-extraction",le="+Inf"} 1',
+            'theia_parse_stage_seconds_sum{stage="llm-extraction"} 0.5',
+            'theia_parse_stage_seconds_count{stage="llm-extraction"} 1',
+        ]
+
+    def test_tracing(self, tmp_path: Path):
+        tracer = enable_tracing()
+        try:
+            with (
+                span("document", "document", path="doc.pdf"),
+                stage("page", page_number=1),
+            ):
+                pass
+        finally:
+            disable_tracing()
+        tracer.add_async_span("document", "document", 0, 2000)
+        tracer.write(tmp_path / "trace.json")
+
+        events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+        assert [(e["ph"], e["name"]) for e in events] == [
+            ("M", "thread_name"),
+            ("X", "page"),
+            ("X", "document"),
+            ("b", "document"),
+            ("e", "document"),
+        ]
+        page, document = events[1], events[2]
+        assert page["args"] == {"page_number": 1}
+        assert document["ts"] <= page["ts"]
+        assert page["ts"] + page["dur"] <= document["ts"] + document["dur"]
+        assert events[4]["ts"] == 2.0
+
+    def test_memory_profiling(self, tmp_path: Path):
+        memory_profiler = enable_memory_profiling(threshold_mb=4, output_dir=tmp_path)
+        try:
+            for page_number in (1, 2):
+                with stage("page", path="doc.pdf", page_number=page_number):
+                    with stage("render"):
+                        bitmap = bytearray(page_number * 3 * 1024 * 1024)
+                    del bitmap
+                    with stage("extract-text"):
+                        pass
+            summary = finish_document("doc.pdf")
+        finally:
+            disable_memory_profiling()
+
+        assert memory_profiler.finish_document("doc.pdf") is None
+        assert summary is not None
+        assert summary.flagged_page_numbers == [2]
+        assert summary.stages["render"].count == 2
+        assert summary.stages["render"].traced_peak_mb >= 6
+        page = summary.pages[1]
+        # the bitmap is freed within the page
+        assert page.traced_peak_mb >= 6
+        assert page.traced_delta_mb < 1
+        assert (tmp_path / "doc.pdf.memory.json").is_file()
@@ -1,17 +1,29 @@
-from theia_parse.const import SUPPORTED_EXTENSIONS
-from theia_parse.formatter.__spi__ import Formatter
-from theia_parse.formatter.markdown_formatter import MarkdownFormatter
-from theia_parse.llm.__spi__ import LlmApiSettings
-from theia_parse.parser.__spi__ import (
-    DirectoryParserConfig,
-    DocumentParserConfig,
-    ImageExtractionConfig,
-    LlmGenerationConfig,
-    PromptConfig,
-    RawParserConfig,
-)
-from theia_parse.parser.directory_parser import DirectoryParser
-from theia_parse.parser.document_parser import DocumentParser
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from theia_parse.const import SUPPORTED_EXTENSIONS
+    from theia_parse.formatter.__spi__ import Formatter
+    from theia_parse.formatter.document_exporter import DocumentExporter
+    from theia_parse.formatter.markdown_formatter import MarkdownFormatter
+    from theia_parse.llm.__spi__ import LlmApiSettings, SpendLimitExceededError
+    from theia_parse.parser.__spi__ import (
+        DirectoryParserConfig,
+        DocumentParserConfig,
+        ImageExtractionConfig,
+        LlmGenerationConfig,
+        MediaStoreConfig,
+        ModelPrice,
+        PlanConfig,
+        PostImproveConfig,
+        PriceTable,
+        PromptConfig,
+        RawParserConfig,
+        UsageEstimationConfig,
+    )
+    from theia_parse.parser.directory_parser import DirectoryParser
+    from theia_parse.parser.document_parser import DocumentParser
 
 
 __all__ = [
@@ -19,12 +31,59 @@ __all__ = [
     "DirectoryParserConfig",
     "DocumentParser",
     "DocumentParserConfig",
+    "DocumentExporter",
     "Formatter",
     "ImageExtractionConfig",
     "LlmApiSettings",
     "LlmGenerationConfig",
     "MarkdownFormatter",
+    "MediaStoreConfig",
+    "ModelPrice",
+    "PlanConfig",
+    "PostImproveConfig",
+    "PriceTable",
     "PromptConfig",
     "RawParserConfig",
+    "SpendLimitExceededError",
     "SUPPORTED_EXTENSIONS",
+    "UsageEstimationConfig",
 ]
+
+_NAME_TO_MODULE = {
+    "DirectoryParser": "theia_parse.parser.directory_parser",
+    "DirectoryParserConfig": "theia_parse.parser.__spi__",
+    "DocumentParser": "theia_parse.parser.document_parser",
+    "DocumentParserConfig": "theia_parse.parser.__spi__",
+    "DocumentExporter": "theia_parse.formatter.document_exporter",
+    "Formatter": "theia_parse.formatter.__spi__",
+    "ImageExtractionConfig": "theia_parse.parser.__spi__",
+    "LlmApiSettings": "theia_parse.llm.__spi__",
+    "LlmGenerationConfig": "theia_parse.parser.__spi__",
+    "MarkdownFormatter": "theia_parse.formatter.markdown_formatter",
+    "MediaStoreConfig": "theia_parse.parser.__spi__",
+    "ModelPrice": "theia_parse.parser.__spi__",
+    "PlanConfig": "theia_parse.parser.__spi__",
+    "PostImproveConfig": "theia_parse.parser.__spi__",
+    "PriceTable": "theia_parse.parser.__spi__",
+    "PromptConfig": "theia_parse.parser.__spi__",
+    "RawParserConfig": "theia_parse.parser.__spi__",
+    "SpendLimitExceededError": "theia_parse.llm.__spi__",
+    "SUPPORTED_EXTENSIONS": "theia_parse.const",
+    "UsageEstimationConfig": "theia_parse.parser.__spi__",
+}
+"""Modules of the exports, imported on first access to keep importing fast"""
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _NAME_TO_MODULE.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
@@ -1,5 +1,18 @@
 PARSED_JSON_SUFFIXES = [".parsed", ".json"]
+PARSED_JSONL_SUFFIXES = [".parsed", ".jsonl"]
+PARSED_BINARY_SUFFIXES = [".parsed", ".tpb"]
+PARSED_REFERENCE_SUFFIXES = [".parsed", ".ref"]
+PARSED_INDEX_SUFFIXES = [".index", ".json"]
+CHECKPOINT_SUFFIXES = [".parsed", ".checkpoint", ".jsonl"]
 DUPLICATE_SUFFIXES = [".duplicate"]
+MEMORY_PROFILE_SUFFIXES = [".memory", ".json"]
+CACHE_DIR_NAME = "theia-parse"
+HASH_INDEX_FILE_PREFIX = "hash-index-"
+WORK_QUEUE_FILE_NAME = ".theia-parse-queue.sqlite"
+MEDIA_STORE_DIR_NAME = ".theia-parse-media"
+
+PDF_POINTS_PER_INCH = 72
+"""Resolution of PDF coordinates, as pdfplumber.display.DEFAULT_RESOLUTION"""
 
 # TODO: keep updated
 SUPPORTED_EXTENSIONS = ["pdf"]
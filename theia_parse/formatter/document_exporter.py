@@ -0,0 +1,127 @@
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TextIO
+
+from theia_parse.const import PARSED_REFERENCE_SUFFIXES
+from theia_parse.formatter.__spi__ import Formatter
+from theia_parse.formatter.markdown_formatter import MarkdownFormatter
+from theia_parse.model import DocumentPage, ParsedDocument
+from theia_parse.output import OUTPUT_FORMAT_TO_SUFFIXES
+from theia_parse.output.lazy import LazyParsedDocument
+from theia_parse.parser.directory_scanner import DirectoryScanner
+from theia_parse.util.files import has_suffixes, with_suffix
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+DEFAULT_FORMATTER = MarkdownFormatter()
+
+_PARSED_SUFFIXES = [*OUTPUT_FORMAT_TO_SUFFIXES.values(), PARSED_REFERENCE_SUFFIXES]
+_MIN_FILES_PER_WORKER = 8
+
+
+class DocumentExporter:
+    """
+    Exports parsed documents as text with a Formatter. Pages are read and
+    written one at a time, so memory does not grow with the document size.
+    """
+
+    def __init__(
+        self,
+        formatter: Formatter = DEFAULT_FORMATTER,
+        output_suffix: str = ".parsed.md",
+    ) -> None:
+        self._formatter = formatter
+        self._output_suffix = output_suffix
+
+    def get_output_path(self, parsed_path: Path) -> Path:
+        suffixes = _get_parsed_suffixes(parsed_path)
+        if suffixes is None:
+            raise ValueError(f"Not a parsed file [path='{parsed_path}']")
+
+        return with_suffix(parsed_path, self._output_suffix, replace_suffixes=suffixes)
+
+    def export(self, parsed_path: Path, output_path: Path | None = None) -> Path:
+        """Exports the parsed file and returns the path of the output file."""
+
+        output_path = output_path or self.get_output_path(parsed_path)
+        document = LazyParsedDocument(parsed_path, persist_index=False)
+
+        tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+        with open(tmp_path, "w") as outfile:
+            self.write(
+                outfile, document.header, document.iter_pages(include_media=False)
+            )
+        os.replace(tmp_path, output_path)
+
+        return output_path
+
+    def write(
+        self,
+        outfile: TextIO,
+        header: ParsedDocument,
+        pages: Iterable[DocumentPage],
+    ) -> None:
+        outfile.write(f"PATH: {header.path}\n")
+        if header.metadata:
+            outfile.write(f"\n{header.metadata}")
+
+        for page in pages:
+            outfile.write(f"\n\n\n\nPAGE: {page.page_number}\n\n\n")
+            outfile.write(self._formatter.format(page.content))
+
+    def is_up_to_date(self, parsed_path: Path) -> bool:
+        output_path = self.get_output_path(parsed_path)
+
+        return (
+            output_path.is_file()
+            and output_path.stat().st_mtime >= parsed_path.stat().st_mtime
+        )
+
+    def export_directory(
+        self,
+        directory: str | Path,
+        max_workers: int | None = None,
+        force: bool = False,
+    ) -> int:
+        """
+        Exports all parsed files in the directory, whose output is missing or
+        older than the parsed file, in a process pool. Returns the number of
+        exported files.
+        """
+
+        extensions = list({s[-1].lstrip(".") for s in _PARSED_SUFFIXES})
+        scanner = DirectoryScanner(extensions=extensions)
+        paths = [
+            f.path
+            for f in scanner.scan(directory)
+            if _get_parsed_suffixes(f.path) is not None
+            and (force or not self.is_up_to_date(f.path))
+        ]
+
+        export = partial(_export, self)
+        if len(paths) < 2 * _MIN_FILES_PER_WORKER or max_workers == 1:
+            return sum(map(export, paths))
+
+        chunksize = max(_MIN_FILES_PER_WORKER, len(paths) // 256)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(export, paths, chunksize=chunksize))
+
+
+def _get_parsed_suffixes(path: Path) -> list[str] | None:
+    return next((s for s in _PARSED_SUFFIXES if has_suffixes(path, s)), None)
+
+
+def _export(exporter: DocumentExporter, parsed_path: Path) -> bool:
+    try:
+        exporter.export(parsed_path)
+    except Exception as e:
+        _log.error("Could not export [path='{0}', error='{1}']", parsed_path, e)
+        return False
+
+    return True
@@ -1,9 +1,11 @@
 from theia_parse.llm.__spi__ import LLM, LlmApiSettings
-from theia_parse.llm.openai.azure_openai_llm import AzureOpenAiLLM
 
 
 def get_llm(settings: LlmApiSettings) -> LLM:
     if settings.provider == "azure_openai":
+        # deferred, importing openai is slow
+        from theia_parse.llm.openai.azure_openai_llm import AzureOpenAiLLM
+
         return AzureOpenAiLLM(settings)
     else:
         raise Exception(f"LLM API provider {settings.provider} not supported.")
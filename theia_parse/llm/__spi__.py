@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Deque, Literal
+from functools import cache
+from typing import TYPE_CHECKING, Any, Deque, Literal
 
-from jinja2 import Environment as JinjaEnvironment
 from pydantic import BaseModel
 
-from theia_parse.__spi__ import BaseEnvSettings
 from theia_parse.model import (
     ContentElement,
     DocumentPage,
+    ErrorType,
     HeadingElement,
     LlmUsage,
     Medium,
@@ -17,6 +17,10 @@ from theia_parse.model import (
 from theia_parse.parser.__spi__ import DocumentParserConfig, LlmGenerationConfig
 
 
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+
 LlmApiProvider = Literal["azure_openai"]
 
 
@@ -28,28 +32,43 @@ class LlmApiSettings(BaseModel):
     key: str
 
 
-class LlmApiEnvSettings(BaseEnvSettings):
-    PROVIDER: LlmApiProvider = "azure_openai"
-    AZURE_OPENAI_API_VERSION: str = ""
-    AZURE_OPENAI_API_ENDPOINT: str = ""
-    AZURE_OPENAI_API_DEPLOYMENT: str = ""
-    AZURE_OPENAI_API_KEY: str = ""
-
-    def to_settings(self) -> LlmApiSettings:
-        return LlmApiSettings(
-            provider=self.PROVIDER,
-            api_version=self.AZURE_OPENAI_API_VERSION,
-            endpoint=self.AZURE_OPENAI_API_ENDPOINT,
-            model=self.AZURE_OPENAI_API_DEPLOYMENT,
-            key=self.AZURE_OPENAI_API_KEY,
-        )
-
-
 class LlmResponse(BaseModel):
     raw: str
     usage: LlmUsage = LlmUsage()
 
 
+class LlmError(Exception):
+    def __init__(
+        self,
+        error_type: ErrorType,
+        message: str,
+        retry_after: float | None = None,
+        raw: str = "",
+    ) -> None:
+        super().__init__(message)
+        self.error_type = error_type
+        self.retry_after = retry_after
+        """Delay in seconds requested by the API before retrying"""
+        self.raw = raw
+        """Raw LLM response, if any"""
+
+
+class SpendLimitExceededError(Exception):
+    """
+    Raised before an LLM call which would exceed the spend ceiling, see
+    DocumentParserConfig.max_cost. Aborts parsing instead of failing a page.
+    """
+
+    def __init__(self, max_cost: float, spent: float, estimated_cost: float) -> None:
+        super().__init__(
+            f"Spend limit of {max_cost:.2f} would be exceeded "
+            f"[spent={spent:.4f}, estimated_cost={estimated_cost:.4f}]"
+        )
+        self.max_cost = max_cost
+        self.spent = spent
+        self.estimated_cost = estimated_cost
+
+
 class LlmExtractionResult(BaseModel):
     raw: str
     content: list[ContentElement] | None = None
@@ -135,13 +154,41 @@ class LLM(ABC):
         page_image: LlmMedium | None,
         embedded_images: list[LlmMedium],
         config: LlmGenerationConfig,
-    ) -> LlmResponse | None:
+        response_schema: type[BaseModel] | None = None,
+    ) -> LlmResponse:
+        """
+        If a response schema is given and JSON mode is enabled, the response is
+        constrained to that schema where supported by the API.
+        Raises LlmError classified by ErrorType on failure.
+        """
         pass
 
 
 class Prompt:
     def __init__(self, template: str) -> None:
-        self._template = JinjaEnvironment(trim_blocks=True).from_string(template)
+        self._source = template
+        self._template: Template | None = None
+        """Compiled on the first render, shared by prompts of the same source"""
 
     def render(self, data: dict[str, Any]) -> str:
+        if self._template is None:
+            self._template = _compile_template(self._source)
+
         return self._template.render(**data).strip()
+
+
+@cache
+def _compile_template(source: str) -> Template:
+    from jinja2 import Environment as JinjaEnvironment
+
+    return JinjaEnvironment(trim_blocks=True).from_string(source)
+
+
+def __getattr__(name: str) -> Any:
+    # the settings import pydantic-settings, which is slow
+    if name == "LlmApiEnvSettings":
+        from theia_parse.llm.env_settings import LlmApiEnvSettings
+
+        return LlmApiEnvSettings
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,19 @@
+from theia_parse.__spi__ import BaseEnvSettings
+from theia_parse.llm.__spi__ import LlmApiProvider, LlmApiSettings
+
+
+class LlmApiEnvSettings(BaseEnvSettings):
+    PROVIDER: LlmApiProvider = "azure_openai"
+    AZURE_OPENAI_API_VERSION: str = ""
+    AZURE_OPENAI_API_ENDPOINT: str = ""
+    AZURE_OPENAI_API_DEPLOYMENT: str = ""
+    AZURE_OPENAI_API_KEY: str = ""
+
+    def to_settings(self) -> LlmApiSettings:
+        return LlmApiSettings(
+            provider=self.PROVIDER,
+            api_version=self.AZURE_OPENAI_API_VERSION,
+            endpoint=self.AZURE_OPENAI_API_ENDPOINT,
+            model=self.AZURE_OPENAI_API_DEPLOYMENT,
+            key=self.AZURE_OPENAI_API_KEY,
+        )
@@ -1,19 +1,34 @@
+import time
 from collections.abc import Iterator
 from contextlib import contextmanager
 from typing import cast
 
-from openai import AzureOpenAI, Omit, omit
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AzureOpenAI,
+    BadRequestError,
+    InternalServerError,
+    Omit,
+    OpenAIError,
+    RateLimitError,
+    omit,
+)
 from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 from openai.types.chat.completion_create_params import ResponseFormat
+from pydantic import BaseModel
 
 from theia_parse.llm.__spi__ import (
     LLM,
     LlmApiSettings,
+    LlmError,
     LlmMedium,
     LlmResponse,
 )
-from theia_parse.model import LlmUsage
+from theia_parse.llm.openai.util import to_strict_json_schema
+from theia_parse.model import ErrorType, LlmUsage
 from theia_parse.parser.__spi__ import LlmGenerationConfig
+from theia_parse.util.instrumentation import span
 from theia_parse.util.log import LogFactory
 
 
@@ -23,6 +38,7 @@ _log = LogFactory.get_logger()
 class AzureOpenAiLLM(LLM):
     def __init__(self, api_settings: LlmApiSettings) -> None:
         self._api_settings = api_settings
+        self._structured_output_supported = True
 
     @contextmanager
     def _get_client(self) -> Iterator[AzureOpenAI]:
@@ -30,6 +46,7 @@ class AzureOpenAiLLM(LLM):
             azure_endpoint=self._api_settings.endpoint,
             api_version=self._api_settings.api_version,
             api_key=self._api_settings.key,
+            max_retries=0,  # retries are handled per page, see RetryConfig
         )
         try:
             yield client
@@ -43,16 +60,15 @@ class AzureOpenAiLLM(LLM):
         page_image: LlmMedium | None,
         embedded_images: list[LlmMedium],
         config: LlmGenerationConfig,
-    ) -> LlmResponse | None:
+        response_schema: type[BaseModel] | None = None,
+    ) -> LlmResponse:
         _log.trace(
             "Calling LLM [system_prompt='{0}', user_prompt='{1}']",
             system_prompt,
             user_prompt,
         )
 
-        response_format: ResponseFormat | Omit = omit
-        if config.json_mode:
-            response_format = {"type": "json_object"}
+        response_format = self._get_response_format(config, response_schema)
 
         messages = self._assemble_raw_messages(
             system_prompt=system_prompt,
@@ -61,35 +77,112 @@ class AzureOpenAiLLM(LLM):
             embedded_images=embedded_images,
         )
 
+        start = time.perf_counter()
         try:
-            with self._get_client() as client:
-                response = client.chat.completions.create(
-                    model=self._api_settings.model,
-                    messages=messages,
-                    temperature=config.temperature or omit,
-                    max_completion_tokens=config.max_tokens,
-                    response_format=response_format,
-                )
-
-            _log.trace("Raw LLM response [response='{0}']", response)
-
-            content = response.choices[0].message.content
-            usage = response.usage
-            assert content is not None
-            assert usage is not None
-        except Exception as e:
-            _log.error("Exception calling LLM [msg='{0}']", e)
-            return
+            with (
+                span("llm-request", "llm", model=self._api_settings.model),
+                self._get_client() as client,
+            ):
+                try:
+                    response = client.chat.completions.create(
+                        model=self._api_settings.model,
+                        messages=messages,
+                        temperature=config.temperature or omit,
+                        max_completion_tokens=config.max_tokens,
+                        response_format=response_format,
+                    )
+                except BadRequestError as e:
+                    if not self._is_structured_output_unsupported(e, response_format):
+                        raise
+                    _log.warning(
+                        "Structured output not supported, falling back to JSON mode "
+                        "[model='{0}', msg='{1}']",
+                        self._api_settings.model,
+                        e,
+                    )
+                    self._structured_output_supported = False
+                    response = client.chat.completions.create(
+                        model=self._api_settings.model,
+                        messages=messages,
+                        temperature=config.temperature or omit,
+                        max_completion_tokens=config.max_tokens,
+                        response_format={"type": "json_object"},
+                    )
+        except OpenAIError as e:
+            error = _to_llm_error(e)
+            _log.error(
+                "Exception calling LLM [error_type='{0}', msg='{1}']",
+                error.error_type,
+                e,
+            )
+            raise error from e
+        latency_seconds = time.perf_counter() - start
+
+        _log.trace("Raw LLM response [response='{0}']", response)
 
+        choice = response.choices[0] if response.choices else None
+        content = choice.message.content if choice is not None else None
+        if choice is not None and choice.finish_reason == "content_filter":
+            raise LlmError(
+                ErrorType.CONTENT_FILTER,
+                "LLM response was filtered",
+                raw=content or "",
+            )
+        if content is None or response.usage is None:
+            raise LlmError(ErrorType.UNKNOWN, "LLM response without content or usage")
+
+        usage = response.usage
+        details = usage.prompt_tokens_details
         return LlmResponse(
             raw=content,
             usage=LlmUsage(
                 request_tokens=usage.prompt_tokens,
                 response_tokens=usage.completion_tokens,
+                total_tokens=usage.total_tokens,
+                cached_tokens=details.cached_tokens if details is not None else None,
+                n_calls=1,
+                latency_seconds=latency_seconds,
                 model=response.model,
             ),
         )
 
+    def _get_response_format(
+        self,
+        config: LlmGenerationConfig,
+        response_schema: type[BaseModel] | None,
+    ) -> ResponseFormat | Omit:
+        if not config.json_mode:
+            return omit
+
+        if (
+            config.structured_output
+            and response_schema is not None
+            and self._structured_output_supported
+        ):
+            return {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": response_schema.__name__,
+                    "schema": to_strict_json_schema(response_schema),
+                    "strict": True,
+                },
+            }
+
+        return {"type": "json_object"}
+
+    @staticmethod
+    def _is_structured_output_unsupported(
+        error: BadRequestError,
+        response_format: ResponseFormat | Omit,
+    ) -> bool:
+        if not isinstance(response_format, dict):
+            return False
+
+        return (
+            response_format.get("type") == "json_schema"
+            and "response_format" in str(error).lower()
+        )
+
     def _assemble_image_url(
         self,
         medium: LlmMedium,
@@ -136,3 +229,42 @@ class AzureOpenAiLLM(LLM):
         messages = cast(list[ChatCompletionMessageParam], messages)
 
         return messages
+
+
+def _to_llm_error(error: OpenAIError) -> LlmError:
+    """
+    Classifies OpenAI client errors. Connection errors include timeouts.
+    """
+
+    message = str(error)
+    if isinstance(error, RateLimitError):
+        return LlmError(
+            ErrorType.RATE_LIMIT, message, retry_after=_get_retry_after(error)
+        )
+    if isinstance(error, APIConnectionError | InternalServerError):
+        return LlmError(ErrorType.TRANSIENT, message)
+    if isinstance(error, APIStatusError):
+        code = str(getattr(error, "code", None) or "").lower()
+        if error.status_code in (408, 409) or error.status_code >= 500:
+            return LlmError(
+                ErrorType.TRANSIENT, message, retry_after=_get_retry_after(error)
+            )
+        if code == "content_filter" or "content_filter" in message.lower():
+            return LlmError(ErrorType.CONTENT_FILTER, message)
+        if code == "context_length_exceeded" or "maximum context length" in message:
+            return LlmError(ErrorType.CONTEXT_LENGTH, message)
+
+    return LlmError(ErrorType.UNKNOWN, message)
+
+
+def _get_retry_after(error: APIStatusError) -> float | None:
+    headers = error.response.headers
+    try:
+        if (retry_after_ms := headers.get("retry-after-ms")) is not None:
+            return float(retry_after_ms) / 1000
+        if (retry_after := headers.get("retry-after")) is not None:
+            return float(retry_after)
+    except ValueError:
+        pass
+
+    return
@@ -1,4 +1,7 @@
 import math
+from typing import Any
+
+from pydantic import BaseModel
 
 from theia_parse.model import LlmUsage
 
@@ -39,3 +42,40 @@ def calc_image_token_usage(
     tokens = tokens_per_tile * total_tiles + base_tokens
 
     return LlmUsage(request_tokens=tokens)
+
+
+def to_strict_json_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """
+    Converts the JSON schema of a pydantic model to the subset supported by
+    OpenAI structured outputs in strict mode, i.e. all properties are required,
+    no additional properties are allowed and defaults are removed.
+    Based on https://platform.openai.com/docs/guides/structured-outputs
+    """
+
+    return _to_strict_schema_node(model.model_json_schema())
+
+
+def _to_strict_schema_node(node: dict[str, Any]) -> dict[str, Any]:
+    node = {k: v for k, v in node.items() if k != "default"}
+
+    if "properties" in node:
+        node["properties"] = {
+            name: _to_strict_schema_node(prop)
+            for name, prop in node["properties"].items()
+        }
+        node["required"] = list(node["properties"])
+        node["additionalProperties"] = False
+
+    if "$defs" in node:
+        node["$defs"] = {
+            name: _to_strict_schema_node(d) for name, d in node["$defs"].items()
+        }
+
+    if isinstance(node.get("items"), dict):
+        node["items"] = _to_strict_schema_node(node["items"])
+
+    for key in ("anyOf", "allOf"):
+        if key in node:
+            node[key] = [_to_strict_schema_node(n) for n in node[key]]
+
+    return node
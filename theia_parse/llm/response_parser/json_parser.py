@@ -4,18 +4,113 @@ from typing import Any
 from theia_parse.util.log import LogFactory
 
 
+_CLOSING = {"{": "}", "[": "]"}
+_ESCAPED_CONTROL_CHARS = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
 class JsonParser:
     _log = LogFactory.get_logger()
 
     def parse(self, text: str) -> dict[str, Any] | None:
         start = text.find("{")
         end = text.rfind("}") + 1
-        text = text[start:end]
+        sliced = text[start:end]
 
         try:
-            return json.loads(text)
+            return self._as_dict(json.loads(sliced))
+        except Exception as e:
+            error = str(e)
+
+        if start < 0:
+            self._log.error(
+                "Could not parse JSON  [text='{0}', error='{1}']", text, error
+            )
+            return
+
+        repaired = self.repair(text[start:])
+        try:
+            parsed = self._as_dict(json.loads(repaired))
         except Exception as e:
             self._log.error(
                 "Could not parse JSON  [text='{0}', error='{1}']", text, str(e)
             )
             return
+
+        self._log.warning("Repaired invalid JSON [error='{0}']", error)
+
+        return parsed
+
+    @staticmethod
+    def repair(text: str) -> str:
+        """
+        Best effort repair of near-valid JSON starting with an object or array:
+        escapes raw control characters in strings, drops trailing commas,
+        ignores trailing text and closes truncated strings, objects and arrays.
+        """
+
+        out: list[str] = []
+        stack: list[str] = []
+        in_string = False
+        escaped = False
+
+        for char in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                else:
+                    char = _ESCAPED_CONTROL_CHARS.get(char, char)
+                out.append(char)
+                continue
+
+            if char == '"':
+                in_string = True
+            elif char in _CLOSING:
+                stack.append(_CLOSING[char])
+            elif char in "}]":
+                if not stack:
+                    break
+                JsonParser._drop_trailing_comma(out)
+                char = stack.pop()
+                out.append(char)
+                if not stack:
+                    break
+                continue
+            out.append(char)
+
+        if in_string:
+            if escaped:
+                out.pop()
+            out.append('"')
+
+        while stack:
+            JsonParser._drop_trailing_comma(out)
+            if JsonParser._last_token(out) == ":":
+                out.append("null")
+            out.append(stack.pop())
+
+        return "".join(out)
+
+    @staticmethod
+    def _as_dict(parsed: Any) -> dict[str, Any]:
+        if not isinstance(parsed, dict):
+            raise ValueError(f"Expected JSON object, got {type(parsed).__name__}")
+
+        return parsed
+
+    @staticmethod
+    def _last_token(out: list[str]) -> str | None:
+        for char in reversed(out):
+            if not char.isspace():
+                return char
+
+    @staticmethod
+    def _drop_trailing_comma(out: list[str]) -> None:
+        idx = len(out) - 1
+        while idx >= 0 and out[idx].isspace():
+            idx -= 1
+        if idx >= 0 and out[idx] == ",":
+            del out[idx:]
@@ -0,0 +1,97 @@
+from threading import Lock
+
+from pydantic import BaseModel
+
+from theia_parse.llm.__spi__ import (
+    LLM,
+    LlmMedium,
+    LlmResponse,
+    SpendLimitExceededError,
+)
+from theia_parse.llm.usage_estimator import UsageEstimator
+from theia_parse.parser.__spi__ import LlmGenerationConfig
+
+
+class SpendLimit:
+    """
+    Thread-safe spend ceiling shared by the LLM calls of a parser. The
+    estimated cost of calls in flight is reserved, so concurrent calls can not
+    exceed the ceiling together.
+    """
+
+    def __init__(self, max_cost: float) -> None:
+        self._max_cost = max_cost
+        self._spent = 0.0
+        self._reserved = 0.0
+        self._lock = Lock()
+
+    @property
+    def max_cost(self) -> float:
+        return self._max_cost
+
+    @property
+    def spent(self) -> float:
+        return self._spent
+
+    def reserve(self, estimated_cost: float) -> None:
+        """Raises SpendLimitExceededError if the call could exceed the ceiling."""
+
+        with self._lock:
+            if self._spent + self._reserved + estimated_cost > self._max_cost:
+                raise SpendLimitExceededError(
+                    self._max_cost, self._spent, estimated_cost
+                )
+            self._reserved += estimated_cost
+
+    def settle(self, estimated_cost: float, cost: float) -> None:
+        """Replaces the reservation by the actual cost of the call."""
+
+        with self._lock:
+            self._reserved -= estimated_cost
+            self._spent += cost
+
+
+class SpendLimitedLLM(LLM):
+    """Checks the spend limit before each call of the wrapped LLM."""
+
+    def __init__(
+        self,
+        llm: LLM,
+        spend_limit: SpendLimit,
+        usage_estimator: UsageEstimator,
+    ) -> None:
+        if not usage_estimator.has_price:
+            raise ValueError("A spend limit requires a price for the model")
+        self._llm = llm
+        self._spend_limit = spend_limit
+        self._usage_estimator = usage_estimator
+
+    def generate(
+        self,
+        system_prompt: str | None,
+        user_prompt: str,
+        page_image: LlmMedium | None,
+        embedded_images: list[LlmMedium],
+        config: LlmGenerationConfig,
+        response_schema: type[BaseModel] | None = None,
+    ) -> LlmResponse:
+        estimate = self._usage_estimator.estimate_generate(
+            system_prompt, user_prompt, page_image, embedded_images, config
+        )
+        estimated_cost = estimate.cost or 0.0
+        self._spend_limit.reserve(estimated_cost)
+        cost = 0.0
+        try:
+            response = self._llm.generate(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                page_image=page_image,
+                embedded_images=embedded_images,
+                config=config,
+                response_schema=response_schema,
+            )
+            cost = self._usage_estimator.get_cost(response.usage) or 0.0
+        finally:
+            self._spend_limit.settle(estimated_cost, cost)
+
+        return response
@@ -0,0 +1,122 @@
+import math
+from base64 import b64decode
+from collections.abc import Iterable
+from io import BytesIO
+
+from theia_parse.llm.__spi__ import LlmMedium
+from theia_parse.llm.openai.util import calc_image_token_usage
+from theia_parse.model import LlmUsage
+from theia_parse.parser.__spi__ import (
+    LlmGenerationConfig,
+    PriceTable,
+    UsageEstimationConfig,
+)
+
+
+type ImageSpec = tuple[int, int, bool]
+"""Width and height in pixels and whether the image is sent in low detail"""
+
+
+class UsageEstimator:
+    """
+    Estimates the usage, cost and latency of LLM calls before they are made,
+    from the length of the prompts and the sizes of the images.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        config: UsageEstimationConfig = UsageEstimationConfig(),  # noqa: B008
+        price_table: PriceTable = PriceTable(),  # noqa: B008
+    ) -> None:
+        self._model = model
+        self._config = config
+        self._price_table = price_table
+
+    @property
+    def has_price(self) -> bool:
+        return self._price_table.get_price(self._model) is not None
+
+    def count_tokens(self, text: str | None) -> int:
+        return math.ceil(len(text or "") / self._config.chars_per_token)
+
+    def estimate_response_tokens(self, text_tokens: int) -> int:
+        return self._config.min_response_tokens + round(
+            text_tokens * self._config.response_tokens_per_text_token
+        )
+
+    def estimate(
+        self,
+        prompts: Iterable[str | None],
+        images: Iterable[ImageSpec],
+        response_tokens: int,
+        context_tokens: int = 0,
+    ) -> LlmUsage:
+        """Estimates a single call, context tokens are added to the request."""
+
+        request_tokens = context_tokens + sum(self.count_tokens(p) for p in prompts)
+        for width, height, low_detail in images:
+            request_tokens += (
+                calc_image_token_usage(
+                    width,
+                    height,
+                    self._config.image_base_tokens,
+                    self._config.image_tokens_per_tile,
+                    low_res=low_detail,
+                ).request_tokens
+                or 0
+            )
+
+        usage = LlmUsage(
+            request_tokens=request_tokens,
+            response_tokens=response_tokens,
+            total_tokens=request_tokens + response_tokens,
+            n_calls=1,
+            latency_seconds=self._config.request_latency_seconds
+            + response_tokens / self._config.response_tokens_per_second,
+            model=self._model,
+        )
+        usage.cost = self.get_cost(usage)
+
+        return usage
+
+    def estimate_generate(
+        self,
+        system_prompt: str | None,
+        user_prompt: str,
+        page_image: LlmMedium | None,
+        embedded_images: list[LlmMedium],
+        config: LlmGenerationConfig,
+    ) -> LlmUsage:
+        """
+        Estimates a call of LLM.generate with these arguments. The response is
+        assumed to repeat the user prompt, but not to exceed config.max_tokens.
+        """
+
+        media = [page_image, *embedded_images] if page_image else embedded_images
+        response_tokens = self.estimate_response_tokens(self.count_tokens(user_prompt))
+        if config.max_tokens is not None:
+            response_tokens = min(response_tokens, config.max_tokens)
+
+        return self.estimate(
+            [system_prompt, user_prompt],
+            [_get_image_spec(m) for m in media if m.image.content_b64],
+            response_tokens,
+        )
+
+    def get_cost(self, usage: LlmUsage) -> float | None:
+        if usage.model is None:
+            usage = usage.model_copy(update={"model": self._model})
+
+        return self._price_table.get_cost(usage)
+
+
+def _get_image_spec(medium: LlmMedium) -> ImageSpec:
+    from PIL import Image
+
+    data = b64decode(medium.image.content_b64 or "")
+    # only the header is read to get the size
+    with Image.open(BytesIO(data)) as image:
+        width, height = image.size
+
+    return width, height, medium.detail_level == "low"
@@ -2,16 +2,18 @@ from __future__ import annotations
 
 from base64 import b64encode
 from enum import StrEnum
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from PIL.Image import Image
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel
 
-from theia_parse.types import ImageFormat
-from theia_parse.util.image import image_to_bytes
+from theia_parse.types import ImageFormat, PlanLimit, UsageStage
 from theia_parse.util.log import LogFactory
 
 
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+
 _log = LogFactory.get_logger()
 
 
@@ -19,38 +21,67 @@ class LlmUsage(BaseModel):
     request_tokens: int | None = None
     response_tokens: int | None = None
     total_tokens: int | None = None
+    cached_tokens: int | None = None
+    """Request tokens served from the prompt cache, included in request_tokens"""
+    n_calls: int | None = None
+    n_retries: int | None = None
+    latency_seconds: float | None = None
+    """Summed over all calls"""
+    cost: float | None = None
+    """In the currency of the price table, None if the model has no price"""
     model: str | None = None
 
     def __add__(self, other: LlmUsage) -> LlmUsage:
-        request_tokens = None
-        if self.request_tokens is not None or other.request_tokens is not None:
-            request_tokens = (self.request_tokens or 0) + (other.request_tokens or 0)
-
-        response_tokens = None
-        if self.response_tokens is not None or other.response_tokens is not None:
-            response_tokens = (self.response_tokens or 0) + (other.response_tokens or 0)
-
-        total_tokens = None
-        if self.total_tokens is not None or other.total_tokens is not None:
-            total_tokens = (self.total_tokens or 0) + (other.total_tokens or 0)
-
         return LlmUsage(
-            request_tokens=request_tokens,
-            response_tokens=response_tokens,
-            total_tokens=total_tokens,
+            **{
+                field: _add_optional(getattr(self, field), getattr(other, field))
+                for field in _SUMMED_USAGE_FIELDS
+            },
             model=self.model or other.model,
         )
 
     def __iadd__(self, other: LlmUsage) -> LlmUsage:
-        _sum = self + other
-        self.request_tokens = _sum.request_tokens
-        self.response_tokens = _sum.response_tokens
-        self.total_tokens = _sum.total_tokens
-        self.model = _sum.model
+        for field in _SUMMED_USAGE_FIELDS:
+            setattr(
+                self, field, _add_optional(getattr(self, field), getattr(other, field))
+            )
+        self.model = self.model or other.model
 
         return self
 
 
+_SUMMED_USAGE_FIELDS = (
+    "request_tokens",
+    "response_tokens",
+    "total_tokens",
+    "cached_tokens",
+    "n_calls",
+    "n_retries",
+    "latency_seconds",
+    "cost",
+)
+
+
+def _add_optional[T: (int, float)](a: T | None, b: T | None) -> T | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+
+    return a + b
+
+
+def add_stage_usage(
+    stage_usage: dict[UsageStage, LlmUsage],
+    other: dict[UsageStage, LlmUsage],
+) -> None:
+    for stage, usage in other.items():
+        if stage in stage_usage:
+            stage_usage[stage] += usage
+        else:
+            stage_usage[stage] = usage.model_copy()
+
+
 class ContentType(StrEnum):
     HEADING = "heading"
     TEXT = "text"
@@ -60,6 +91,15 @@ class ContentType(StrEnum):
     IMAGE = "image"
 
 
+class ErrorType(StrEnum):
+    TRANSIENT = "transient"
+    RATE_LIMIT = "rate-limit"
+    CONTENT_FILTER = "content-filter"
+    CONTEXT_LENGTH = "context-length"
+    PARSE_FAILURE = "parse-failure"
+    UNKNOWN = "unknown"
+
+
 class RawContentElement(BaseModel):
     type: ContentType
     content: str
@@ -90,6 +130,19 @@ class RawContentElement(BaseModel):
         return ContentElement(type=self.type, content=self.content)
 
 
+class RawPageContent(BaseModel):
+    """Response schema of the content extraction call"""
+
+    page_content_blocks: list[RawContentElement]
+
+
+class RawImprovedPageContent(BaseModel):
+    """Response schema of the post improvement call"""
+
+    improvement_analysis: str
+    page_content_blocks: list[RawContentElement]
+
+
 class ContentElement(BaseModel):
     type: ContentType
     content: str
@@ -108,7 +161,8 @@ class ImageElement(ContentElement):
 class Medium(BaseModel):
     id: str
     mime_type: str
-    content_b64: str
+    content_b64: str | None = None
+    """None if the content is kept in a MediaStore"""
     description: str | None = None
 
     @staticmethod
@@ -118,6 +172,8 @@ class Medium(BaseModel):
         raw: Image,
         description: str | None = None,
     ) -> Medium:
+        from theia_parse.util.image import image_to_bytes
+
         data = image_to_bytes(raw, image_format)
         mime_type = f"image/{image_format}"
         return Medium(
@@ -128,6 +184,24 @@ class Medium(BaseModel):
         )
 
 
+class PageQuality(BaseModel):
+    score: float
+    json_validity: float
+    text_coverage: float
+    heading_consistency: float
+    image_references: float
+    improved: bool = False
+    initial_score: float | None = None
+    """Score of the first LLM response, if the page was improved"""
+
+
+class PostImproveStats(BaseModel):
+    n_pages: int = 0
+    n_scored: int = 0
+    n_improved: int = 0
+    mean_score: float | None = None
+
+
 class DocumentPage(BaseModel):
     page_number: int
     content: list[ContentElement | HeadingElement | ImageElement]
@@ -135,8 +209,12 @@ class DocumentPage(BaseModel):
     raw_extracted_text: str
     raw_llm_response: str
     token_usage: LlmUsage
+    """Total usage of all stages"""
+    stage_usage: dict[UsageStage, LlmUsage] = {}
     metadata: dict[str, Any] = {}
+    quality: PageQuality | None = None
     error: bool = False
+    error_type: ErrorType | None = None
 
     def content_to_string(self) -> str:
         # TODO: use template / better representation
@@ -155,17 +233,91 @@ class ParsedDocument(BaseModel):
     content: list[DocumentPage]
     metadata: dict[str, Any] = {}
 
-    @computed_field
-    @property
-    def token_usage(self) -> LlmUsage:
-        request_tokens = 0
-        response_tokens = 0
-        for element in self.content:
-            request_tokens += element.token_usage.request_tokens or 0
-            response_tokens += element.token_usage.response_tokens or 0
+    token_usage: LlmUsage = LlmUsage()
+    """Total usage of all pages, set by `update_usage` once the document is parsed"""
+    stage_usage: dict[UsageStage, LlmUsage] = {}
 
-        model = self.content[0].token_usage.model if self.content else None
+    def update_usage(self, summary: DocumentSummary | None = None) -> None:
+        """Sets the usage from the summary or aggregates it over the pages."""
 
-        return LlmUsage(
-            request_tokens=request_tokens, response_tokens=response_tokens, model=model
-        )
+        summary = summary or self.get_summary()
+        self.token_usage = summary.token_usage
+        self.stage_usage = summary.stage_usage
+
+    def get_error_page_numbers(self) -> list[int]:
+        return [p.page_number for p in self.content if p.error]
+
+    def get_post_improve_stats(self) -> PostImproveStats:
+        return self.get_summary().post_improve_stats
+
+    def get_summary(self) -> DocumentSummary:
+        summary = DocumentSummary()
+        for page in self.content:
+            summary.add_page(page)
+
+        return summary
+
+
+class DocumentSummary(BaseModel):
+    """Aggregates over the pages of a document, which can be built page by page."""
+
+    n_pages: int = 0
+    token_usage: LlmUsage = LlmUsage()
+    stage_usage: dict[UsageStage, LlmUsage] = {}
+    error_page_numbers: list[int] = []
+    post_improve_stats: PostImproveStats = PostImproveStats()
+
+    def add_page(self, page: DocumentPage) -> None:
+        self.n_pages += 1
+        self.token_usage += page.token_usage
+        add_stage_usage(self.stage_usage, page.stage_usage)
+        if page.error:
+            self.error_page_numbers.append(page.page_number)
+
+        stats = self.post_improve_stats
+        stats.n_pages += 1
+        if page.quality is not None:
+            stats.n_scored += 1
+            stats.n_improved += int(page.quality.improved)
+            mean_score = stats.mean_score or 0.0
+            stats.mean_score = (
+                mean_score + (page.quality.score - mean_score) / stats.n_scored
+            )
+
+
+class UsageSummary(BaseModel):
+    """Usage aggregated over the documents of a directory."""
+
+    n_documents: int = 0
+    token_usage: LlmUsage = LlmUsage()
+    stage_usage: dict[UsageStage, LlmUsage] = {}
+
+    def add_document(self, parsed: ParsedDocument) -> None:
+        self.n_documents += 1
+        self.token_usage += parsed.token_usage
+        add_stage_usage(self.stage_usage, parsed.stage_usage)
+
+
+class ParsingPlan(BaseModel):
+    """Estimated usage, cost and duration of parsing a directory (dry run)."""
+
+    usage: UsageSummary = UsageSummary()
+    """Estimated usage of the documents which would be parsed"""
+    n_pages: int = 0
+    n_duplicates: int = 0
+    n_parsed: int = 0
+    """Documents skipped, because they are already parsed"""
+    currency: str = "EUR"
+    concurrency: int = 1
+    wall_seconds: float = 0.0
+    """Projected duration of the LLM calls for the concurrency and rate limits"""
+    limited_by: PlanLimit = "latency"
+    max_cost: float | None = None
+
+    @property
+    def cost(self) -> float | None:
+        return self.usage.token_usage.cost
+
+    @property
+    def exceeds_max_cost(self) -> bool:
+        return self.max_cost is not None and (self.cost or 0) > self.max_cost
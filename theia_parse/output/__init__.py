@@ -0,0 +1,169 @@
+import json
+import os
+from pathlib import Path
+
+from theia_parse.const import (
+    PARSED_BINARY_SUFFIXES,
+    PARSED_JSON_SUFFIXES,
+    PARSED_JSONL_SUFFIXES,
+    PARSED_REFERENCE_SUFFIXES,
+)
+from theia_parse.model import ParsedDocument
+from theia_parse.output.binary import BinaryDocumentReader, write_binary
+from theia_parse.output.jsonl import JsonlDocumentReader, JsonlDocumentWriter
+from theia_parse.parser.__spi__ import BinaryOutputConfig
+from theia_parse.types import OutputFormat
+from theia_parse.util.files import has_suffixes, with_suffix, write_json
+
+
+DEFAULT_BINARY_OUTPUT_CONFIG = BinaryOutputConfig()
+
+OUTPUT_FORMAT_TO_SUFFIXES: dict[OutputFormat, list[str]] = {
+    "json": PARSED_JSON_SUFFIXES,
+    "jsonl": PARSED_JSONL_SUFFIXES,
+    "binary": PARSED_BINARY_SUFFIXES,
+}
+
+
+def get_parsed_path(path: Path, output_format: OutputFormat = "json") -> Path:
+    return with_suffix(path, OUTPUT_FORMAT_TO_SUFFIXES[output_format])
+
+
+_MAX_REFERENCE_DEPTH = 8
+
+
+def find_parsed_path(path: Path) -> Path | None:
+    """
+    Returns the existing parsed file of the document in any output format or
+    its reference file, if the document is a restored duplicate.
+    """
+
+    for output_format in OUTPUT_FORMAT_TO_SUFFIXES:
+        parsed_path = get_parsed_path(path, output_format)
+        if parsed_path.is_file():
+            return parsed_path
+
+    reference_path = with_suffix(path, PARSED_REFERENCE_SUFFIXES)
+    if reference_path.is_file():
+        return reference_path
+
+    return
+
+
+def is_reference(parsed_path: Path) -> bool:
+    return has_suffixes(parsed_path, PARSED_REFERENCE_SUFFIXES)
+
+
+def write_reference(path: Path, source_path: Path) -> Path:
+    """
+    Records that the document is a duplicate of the source document instead
+    of copying the parsed file. Loaders read the parsed file of the source.
+    """
+
+    reference_path = with_suffix(path, PARSED_REFERENCE_SUFFIXES)
+    source = os.path.relpath(source_path, path.parent)
+    reference_path.write_text(json.dumps({"path": str(path), "source": source}))
+
+    return reference_path
+
+
+def resolve_reference(reference_path: Path) -> tuple[Path, str]:
+    """
+    Returns the parsed file of the source document and the path of the
+    duplicate document for a reference file.
+    """
+
+    path: str | None = None
+    parsed_path = reference_path
+    for _ in range(_MAX_REFERENCE_DEPTH):
+        if not is_reference(parsed_path):
+            assert path is not None
+            return parsed_path, path
+
+        data = json.loads(parsed_path.read_text())
+        path = path or data["path"]
+        source_path = parsed_path.parent / data["source"]
+        source_parsed_path = find_parsed_path(source_path)
+        if source_parsed_path is None:
+            raise FileNotFoundError(
+                f"No parsed file of the source [path='{source_path}']"
+            )
+        parsed_path = source_parsed_path
+
+    raise ValueError(f"Too many nested references [path='{reference_path}']")
+
+
+def get_output_format(parsed_path: Path) -> OutputFormat | None:
+    for output_format, suffixes in OUTPUT_FORMAT_TO_SUFFIXES.items():
+        if has_suffixes(parsed_path, suffixes):
+            return output_format
+
+    return
+
+
+def read_parsed(parsed_path: Path) -> ParsedDocument:
+    """Reads a parsed file of any output format or a reference to one."""
+
+    if is_reference(parsed_path):
+        source_parsed_path, path = resolve_reference(parsed_path)
+        parsed = read_parsed(source_parsed_path)
+        parsed.path = path
+        return parsed
+
+    output_format = get_output_format(parsed_path)
+    if output_format == "jsonl":
+        return JsonlDocumentReader(parsed_path).read()
+    if output_format == "binary":
+        return BinaryDocumentReader(parsed_path).read()
+
+    # validating the raw bytes is about twice as fast as json.load and validation
+    return ParsedDocument.model_validate_json(parsed_path.read_bytes())
+
+
+def write_parsed(
+    path: Path,
+    parsed: ParsedDocument,
+    output_format: OutputFormat = "json",
+    binary_output_config: BinaryOutputConfig = DEFAULT_BINARY_OUTPUT_CONFIG,
+) -> Path:
+    """Writes the parsed document next to the document and returns the path."""
+
+    parsed_path = get_parsed_path(path, output_format)
+    if output_format == "jsonl":
+        with JsonlDocumentWriter(parsed_path, parsed) as writer:
+            for page in parsed.content:
+                writer.write_page(page)
+    elif output_format == "binary":
+        write_binary(
+            parsed_path,
+            parsed,
+            compression=binary_output_config.compression,
+            drop_raw_fields=binary_output_config.drop_raw_fields,
+        )
+    else:
+        write_json(parsed_path, parsed)
+
+    return parsed_path
+
+
+def convert_parsed(
+    parsed_path: Path,
+    output_format: OutputFormat,
+    binary_output_config: BinaryOutputConfig = DEFAULT_BINARY_OUTPUT_CONFIG,
+) -> Path:
+    """
+    Converts a parsed file into another output format next to it and returns
+    the path of the converted file.
+    """
+
+    source_format = get_output_format(parsed_path)
+    if source_format is None:
+        raise ValueError(f"Not a parsed file [path='{parsed_path}']")
+
+    path = with_suffix(
+        parsed_path,
+        replace_suffixes=OUTPUT_FORMAT_TO_SUFFIXES[source_format],
+    )
+    parsed = read_parsed(parsed_path)
+
+    return write_parsed(path, parsed, output_format, binary_output_config)
@@ -0,0 +1,178 @@
+"""
+Compact binary format for parsed documents.
+
+Layout: a fixed size prefix (magic, format version, compression, flags and
+the length of the header), an uncompressed JSON header with the document
+fields except the content plus the document summary and page offsets, and
+the separately compressed JSON pages. The pages are validated straight from
+the decompressed bytes by pydantic, which is about twice as fast as
+json.load followed by model validation.
+"""
+
+import json
+import lzma
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from theia_parse.model import DocumentPage, DocumentSummary, ParsedDocument
+from theia_parse.output.page_index import PageIndex
+from theia_parse.types import Compression
+
+
+FORMAT_VERSION = 1
+
+_MAGIC = b"TPB"
+_PREFIX = struct.Struct(">3sBBBI")
+_FLAG_RAW_FIELDS_DROPPED = 1
+
+_COMPRESSION_TO_ID: dict[Compression, int] = {"none": 0, "zlib": 1, "lzma": 2}
+_ID_TO_COMPRESSION = {v: k for k, v in _COMPRESSION_TO_ID.items()}
+
+RAW_FIELDS = ("raw_extracted_text", "raw_llm_response")
+
+_SUMMARY = "summary"
+_PAGE_INDEX = "page_index"
+
+
+class BinaryFormatError(Exception):
+    pass
+
+
+def write_binary(
+    path: Path,
+    parsed: ParsedDocument,
+    compression: Compression = "zlib",
+    drop_raw_fields: bool = False,
+) -> None:
+    blocks: list[bytes] = []
+    page_index = PageIndex()
+    position = 0
+    for page in parsed.content:
+        if drop_raw_fields:
+            page = page.model_copy(update=dict.fromkeys(RAW_FIELDS, ""))
+        block = _compress(page.model_dump_json().encode(), compression)
+        blocks.append(block)
+        page_index.add(
+            page.page_number,
+            position,
+            position + len(block),
+            (m.id for m in page.media),
+        )
+        position += len(block)
+
+    header = parsed.model_dump(
+        mode="json", exclude={"content", "token_usage", "stage_usage"}
+    )
+    header[_SUMMARY] = parsed.get_summary().model_dump(mode="json")
+    header[_PAGE_INDEX] = page_index.model_dump(mode="json")
+    header_bytes = json.dumps(header).encode()
+
+    flags = _FLAG_RAW_FIELDS_DROPPED if drop_raw_fields else 0
+    prefix = _PREFIX.pack(
+        _MAGIC,
+        FORMAT_VERSION,
+        _COMPRESSION_TO_ID[compression],
+        flags,
+        len(header_bytes),
+    )
+
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as outfile:
+        outfile.write(prefix)
+        outfile.write(header_bytes)
+        for block in blocks:
+            outfile.write(block)
+    os.replace(tmp_path, path)
+
+
+class BinaryDocumentReader:
+    """
+    Reads documents written by write_binary. Pages are compressed separately,
+    so single pages can be read without decompressing the others.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        with open(path, "rb") as infile:
+            self._compression, header_length = _read_prefix(infile.read(_PREFIX.size))
+            self._header: dict[str, Any] = json.loads(infile.read(header_length))
+        self._body_start = _PREFIX.size + header_length
+
+    def read_header(self) -> ParsedDocument:
+        """Returns the document without content."""
+
+        header = {
+            k: v for k, v in self._header.items() if k not in (_SUMMARY, _PAGE_INDEX)
+        }
+
+        document = ParsedDocument(**header, content=[])
+        document.update_usage(self.read_summary())
+
+        return document
+
+    def read_summary(self) -> DocumentSummary:
+        return DocumentSummary(**self._header[_SUMMARY])
+
+    def read_page_index(self) -> PageIndex:
+        """Returns the page offsets relative to the start of the pages."""
+
+        return PageIndex(**self._header[_PAGE_INDEX])
+
+    def read_page_at(self, start: int, end: int) -> DocumentPage:
+        with open(self._path, "rb") as infile:
+            infile.seek(self._body_start + start)
+            block = infile.read(end - start)
+
+        return DocumentPage.model_validate_json(_decompress(block, self._compression))
+
+    def iter_pages(self) -> Iterator[DocumentPage]:
+        with open(self._path, "rb") as infile:
+            infile.seek(self._body_start)
+            for _, start, end in self.read_page_index().pages:
+                block = infile.read(end - start)
+                yield DocumentPage.model_validate_json(
+                    _decompress(block, self._compression)
+                )
+
+    def read(self) -> ParsedDocument:
+        document = self.read_header()
+        document.content = list(self.iter_pages())
+
+        return document
+
+
+def _read_prefix(prefix: bytes) -> tuple[Compression, int]:
+    if len(prefix) < _PREFIX.size:
+        raise BinaryFormatError("File too short")
+
+    magic, version, compression_id, _, header_length = _PREFIX.unpack(prefix)
+    if magic != _MAGIC:
+        raise BinaryFormatError("Not a binary parsed file")
+    if version > FORMAT_VERSION:
+        raise BinaryFormatError(f"Unsupported format version {version}")
+    if compression_id not in _ID_TO_COMPRESSION:
+        raise BinaryFormatError(f"Unsupported compression {compression_id}")
+
+    return _ID_TO_COMPRESSION[compression_id], header_length
+
+
+def _compress(data: bytes, compression: Compression) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(data, 6)
+    if compression == "lzma":
+        return lzma.compress(data)
+
+    return data
+
+
+def _decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "lzma":
+        return lzma.decompress(data)
+
+    return data
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from theia_parse.model import DocumentPage, DocumentSummary, ParsedDocument
+from theia_parse.output.page_index import PageIndex
+
+
+FORMAT_VERSION = 1
+
+_RECORD = "record"
+_HEADER = "header"
+_PAGE = "page"
+_FOOTER = "footer"
+_PAGE_INDEX = "page_index"
+_PAGE_PREFIX = json.dumps({_RECORD: _PAGE})[:-1].encode()
+
+
+class JsonlDocumentWriter:
+    """
+    Writes a parsed document as JSON lines: a header with the document fields
+    except the content, one line per page and a footer with the document
+    summary and the byte offsets of the pages. Pages are written as they are
+    passed, so only the current page has to be held in memory. The file is
+    written to a temporary path first and only replaces the target on close.
+    """
+
+    def __init__(self, path: Path, hull: ParsedDocument) -> None:
+        self._path = path
+        self._tmp_path = path.with_name(f"{path.name}.tmp")
+        self._summary = DocumentSummary()
+        self._page_index = PageIndex()
+        self._position = 0
+        self._outfile: BinaryIO = open(self._tmp_path, "wb")  # noqa: SIM115
+        header = hull.model_dump(
+            mode="json", exclude={"content", "token_usage", "stage_usage"}
+        )
+        self._write_record(_HEADER, {"format_version": FORMAT_VERSION, **header})
+
+    @property
+    def summary(self) -> DocumentSummary:
+        return self._summary
+
+    def write_page(self, page: DocumentPage) -> None:
+        start = self._position
+        self._write_record(_PAGE, page.model_dump(mode="json"))
+        self._page_index.add(
+            page.page_number, start, self._position, (m.id for m in page.media)
+        )
+        self._summary.add_page(page)
+
+    def close(self) -> None:
+        self._write_record(
+            _FOOTER,
+            {
+                **self._summary.model_dump(mode="json"),
+                _PAGE_INDEX: self._page_index.model_dump(mode="json"),
+            },
+        )
+        self._outfile.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self) -> None:
+        self._outfile.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> JsonlDocumentWriter:
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_record(self, record: str, data: dict[str, Any]) -> None:
+        line = f"{json.dumps({_RECORD: record, **data})}\n".encode()
+        self._outfile.write(line)
+        self._position += len(line)
+
+
+class JsonlDocumentReader:
+    """
+    Reads documents written by JsonlDocumentWriter. Header and footer are read
+    without parsing the pages, pages are parsed lazily while iterating.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    def read_header(self) -> ParsedDocument:
+        """Returns the document without content."""
+
+        with open(self._path) as infile:
+            header = self._parse_record(infile.readline(), _HEADER)
+        header.pop("format_version", None)
+        document = ParsedDocument(**header, content=[])
+        summary = self.read_summary()
+        if summary is not None:
+            document.update_usage(summary)
+
+        return document
+
+    def read_summary(self) -> DocumentSummary | None:
+        """Returns the footer summary or None if the file is incomplete."""
+
+        last_line = _read_last_line(self._path)
+        try:
+            footer = self._parse_record(last_line, _FOOTER)
+        except ValueError:
+            return
+
+        return DocumentSummary(**footer)
+
+    def read_page_index(self) -> PageIndex | None:
+        """Returns the byte offsets of the pages or None if the file is incomplete."""
+
+        try:
+            footer = self._parse_record(_read_last_line(self._path), _FOOTER)
+        except ValueError:
+            return
+
+        return PageIndex(**footer.get(_PAGE_INDEX, {}))
+
+    def iter_pages(self) -> Iterator[DocumentPage]:
+        with open(self._path, "rb") as infile:
+            for line in infile:
+                # the record key is written first, other keys are ignored on validation
+                if line.startswith(_PAGE_PREFIX):
+                    yield DocumentPage.model_validate_json(line)
+
+    def read(self) -> ParsedDocument:
+        document = self.read_header()
+        document.content = list(self.iter_pages())
+        document.update_usage()
+
+        return document
+
+    def _parse_record(self, line: str, record: str) -> dict[str, Any]:
+        data = json.loads(line) if line.strip() else {}
+        if data.pop(_RECORD, None) != record:
+            raise ValueError(f"Expected {record} record [path='{self._path}']")
+
+        return data
+
+
+def _read_last_line(path: Path, block_size: int = 64 * 1024) -> str:
+    with open(path, "rb") as infile:
+        infile.seek(0, os.SEEK_END)
+        end = infile.tell()
+        data = b""
+        pos = end
+        while pos > 0:
+            pos = max(0, pos - block_size)
+            infile.seek(pos)
+            data = infile.read(end - pos)
+            lines = data.rstrip(b"\n").rsplit(b"\n", 1)
+            if len(lines) == 2 or pos == 0:
+                return lines[-1].decode("utf-8")
+
+    return ""
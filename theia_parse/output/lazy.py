@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+from functools import cached_property
+from pathlib import Path
+
+from pydantic import BaseModel, ValidationError
+
+from theia_parse.const import PARSED_INDEX_SUFFIXES
+from theia_parse.model import DocumentPage, Medium, ParsedDocument
+from theia_parse.output import get_output_format, is_reference, resolve_reference
+from theia_parse.output.binary import BinaryDocumentReader
+from theia_parse.output.jsonl import JsonlDocumentReader
+from theia_parse.output.media_store import MediaStore
+from theia_parse.output.page_index import PageIndex
+from theia_parse.util.files import with_suffix
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+# strings (unrolled to skip long base64 content quickly) and brackets
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+_PAGE_NUMBER = re.compile(rb'"page_number"\s*:\s*(\d+)')
+_MEDIUM_ID = re.compile(rb'\{\s*"id"\s*:\s*"([^"\\]*)"\s*,\s*"mime_type"')
+_CONTENT_KEY = b'"content"'
+_JSONL_PAGE_RECORD = b'"record": "page"'
+
+
+class LazyParsedDocument:
+    """
+    Random access to the pages of a parsed file of any output format. Only the
+    requested pages are read and validated, media content is only kept if
+    requested and may be loaded from a media store on demand.
+
+    The byte offsets of the pages are taken from the file (jsonl, binary) or
+    built once for json files and stored next to the parsed file.
+    """
+
+    def __init__(
+        self,
+        parsed_path: Path,
+        media_store: MediaStore | None = None,
+        persist_index: bool = True,
+    ) -> None:
+        self._path_override = None
+        if is_reference(parsed_path):
+            parsed_path, self._path_override = resolve_reference(parsed_path)
+
+        output_format = get_output_format(parsed_path)
+        if output_format is None:
+            raise ValueError(f"Not a parsed file [path='{parsed_path}']")
+
+        self._path = parsed_path
+        self._output_format = output_format
+        self._media_store = media_store
+        self._persist_index = persist_index
+
+    @cached_property
+    def header(self) -> ParsedDocument:
+        """The document without content."""
+
+        header = self._read_header()
+        if self._path_override is not None:
+            header.path = self._path_override
+
+        return header
+
+    @cached_property
+    def page_index(self) -> PageIndex:
+        if self._output_format == "jsonl":
+            page_index = JsonlDocumentReader(self._path).read_page_index()
+            return page_index or _scan_jsonl(self._path)
+        if self._output_format == "binary":
+            return self._binary_reader.read_page_index()
+
+        return self._json_index.page_index
+
+    @property
+    def page_numbers(self) -> list[int]:
+        return [page_number for page_number, _, _ in self.page_index.pages]
+
+    def __len__(self) -> int:
+        return len(self.page_index.pages)
+
+    def get_page(
+        self,
+        page_number: int,
+        include_media: bool = True,
+    ) -> DocumentPage | None:
+        span = self.page_index.get_span(page_number)
+        if span is None:
+            return
+
+        return self._read_page(*span, include_media)
+
+    def iter_pages(self, include_media: bool = True) -> Iterator[DocumentPage]:
+        for _, start, end in self.page_index.pages:
+            yield self._read_page(start, end, include_media)
+
+    def get_medium(self, medium_id: str) -> Medium | None:
+        """Returns the medium with its content from its page or the media store."""
+
+        page_number = self.page_index.medium_pages.get(medium_id)
+        page = self.get_page(page_number) if page_number is not None else None
+        medium = (
+            next((m for m in page.media if m.id == medium_id), None) if page else None
+        )
+        if self._media_store is None:
+            return medium
+        if medium is None:
+            medium = Medium(id=medium_id, mime_type="")
+
+        return self._media_store.load(medium)
+
+    def load(self, include_media: bool = True) -> ParsedDocument:
+        return self.header.model_copy(
+            update={"content": list(self.iter_pages(include_media))}
+        )
+
+    def _read_header(self) -> ParsedDocument:
+        if self._output_format == "jsonl":
+            return JsonlDocumentReader(self._path).read_header()
+        if self._output_format == "binary":
+            return self._binary_reader.read_header()
+
+        index = self._json_index
+        with open(self._path, "rb") as infile:
+            head = infile.read(index.content_start)
+            infile.seek(index.content_end)
+            tail = infile.read()
+
+        return ParsedDocument.model_validate_json(head + b"[]" + tail)
+
+    @cached_property
+    def _binary_reader(self) -> BinaryDocumentReader:
+        return BinaryDocumentReader(self._path)
+
+    @cached_property
+    def _json_index(self) -> _JsonFileIndex:
+        stat = self._path.stat()
+        index_path = with_suffix(self._path, PARSED_INDEX_SUFFIXES)
+        if index_path.is_file():
+            try:
+                index = _JsonFileIndex.model_validate_json(index_path.read_bytes())
+                if (index.size, index.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    return index
+            except ValidationError:
+                _log.warning("Ignoring invalid page index [path='{0}']", index_path)
+
+        index = _scan_json(self._path.read_bytes())
+        index.size, index.mtime_ns = stat.st_size, stat.st_mtime_ns
+        if self._persist_index:
+            index_path.write_text(index.model_dump_json())
+
+        return index
+
+    def _read_page(self, start: int, end: int, include_media: bool) -> DocumentPage:
+        if self._output_format == "binary":
+            page = self._binary_reader.read_page_at(start, end)
+        else:
+            with open(self._path, "rb") as infile:
+                infile.seek(start)
+                page = DocumentPage.model_validate_json(infile.read(end - start))
+
+        if not include_media and page.media:
+            page.media = [
+                m.model_copy(update={"content_b64": None}) for m in page.media
+            ]
+
+        return page
+
+
+class _JsonFileIndex(BaseModel):
+    size: int = 0
+    mtime_ns: int = 0
+    content_start: int
+    content_end: int
+    page_index: PageIndex
+
+
+def _scan_json(data: bytes) -> _JsonFileIndex:
+    """Finds the byte ranges of the content array and its pages in a parsed json file."""
+
+    depth = 0
+    last_key: bytes | None = None
+    in_content = False
+    content_start = content_end = page_start = -1
+    page_index = PageIndex()
+
+    for token in _JSON_TOKEN.finditer(data):
+        char = data[token.start()]
+        if char == ord('"'):
+            if depth == 1:
+                last_key = token.group()
+            continue
+
+        if char in b"[{":
+            depth += 1
+            if depth == 2 and char == ord("[") and last_key == _CONTENT_KEY:
+                in_content = True
+                content_start = token.start()
+            elif depth == 3 and in_content:
+                page_start = token.start()
+            continue
+
+        if depth == 3 and in_content:
+            _add_page(page_index, data, page_start, token.end())
+        elif depth == 2 and in_content:
+            in_content = False
+            content_end = token.end()
+        depth -= 1
+
+    if content_start < 0 or content_end < 0:
+        raise ValueError("No content found in parsed json")
+
+    return _JsonFileIndex(
+        content_start=content_start, content_end=content_end, page_index=page_index
+    )
+
+
+def _scan_jsonl(path: Path) -> PageIndex:
+    """Indexes the pages of a jsonl file without footer, e.g. a partial file."""
+
+    page_index = PageIndex()
+    position = 0
+    with open(path, "rb") as infile:
+        for line in infile:
+            if line.endswith(b"\n") and _JSONL_PAGE_RECORD in line[:32]:
+                _add_page(page_index, line, 0, len(line), offset=position)
+            position += len(line)
+
+    return page_index
+
+
+def _add_page(
+    page_index: PageIndex,
+    data: bytes,
+    start: int,
+    end: int,
+    offset: int = 0,
+) -> None:
+    page_number = _PAGE_NUMBER.search(data, start, end)
+    if page_number is None:
+        raise ValueError("Page without page number")
+
+    page_index.add(
+        int(page_number.group(1)),
+        offset + start,
+        offset + end,
+        (m.group(1).decode() for m in _MEDIUM_ID.finditer(data, start, end)),
+    )
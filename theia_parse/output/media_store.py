@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import sqlite3
+from base64 import b64decode, b64encode
+from collections.abc import Iterable
+from pathlib import Path
+from threading import Lock
+from uuid import uuid4
+
+from theia_parse.const import MEDIA_STORE_DIR_NAME
+from theia_parse.model import DocumentPage, Medium, ParsedDocument
+from theia_parse.parser.__spi__ import MediaStoreConfig
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+_INDEX_FILE_NAME = "media.sqlite"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id TEXT PRIMARY KEY,
+    mime_type TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    medium_id TEXT NOT NULL,
+    document TEXT NOT NULL,
+    PRIMARY KEY (medium_id, document)
+);
+CREATE INDEX IF NOT EXISTS refs_document ON refs (document);
+"""
+
+
+class MediaStore:
+    """
+    Content-addressed store for the media of parsed documents.
+
+    Media are keyed by Medium.id, which is derived from the image content, so a
+    recurring image (e.g. a logo) is stored once, no matter on how many pages
+    or in how many documents it occurs. Stored media are referenced by
+    documents, media without references are removed by collect_garbage.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            root / _INDEX_FILE_NAME, timeout=60.0, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def add(self, medium: Medium) -> Medium:
+        """
+        Stores the content of the medium, unless already stored, and returns
+        the medium without content.
+        """
+
+        if medium.content_b64 is None:
+            return medium
+
+        with self._lock:
+            known = self._connection.execute(
+                "SELECT 1 FROM media WHERE id = ?", (medium.id,)
+            ).fetchone()
+        if known is None:
+            data = b64decode(medium.content_b64)
+            file_name = f"{medium.id}{_get_extension(medium.mime_type)}"
+            self._write_file(self._get_path(file_name), data)
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO media (id, mime_type, file_name, size) "
+                    "VALUES (?, ?, ?, ?)",
+                    (medium.id, medium.mime_type, file_name, len(data)),
+                )
+                self._connection.commit()
+
+        return medium.model_copy(update={"content_b64": None})
+
+    def add_page(self, page: DocumentPage) -> DocumentPage:
+        """Returns a copy of the page, whose media only reference the store."""
+
+        if not page.media:
+            return page
+
+        return page.model_copy(update={"media": [self.add(m) for m in page.media]})
+
+    def add_document(self, document: ParsedDocument) -> ParsedDocument:
+        """
+        Stores all media of the document, replaces its references and returns
+        a copy of the document, whose media only reference the store.
+        """
+
+        content = [self.add_page(page) for page in document.content]
+        self.set_references(document.path, (m.id for p in content for m in p.media))
+
+        return document.model_copy(update={"content": content})
+
+    def set_references(self, document: str, medium_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM refs WHERE document = ?", (document,))
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO refs (medium_id, document) VALUES (?, ?)",
+                ((medium_id, document) for medium_id in medium_ids),
+            )
+            self._connection.commit()
+
+    def remove_references(self, document: str) -> None:
+        self.set_references(document, [])
+
+    def get_reference_count(self, medium_id: str) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) FROM refs WHERE medium_id = ?", (medium_id,)
+            ).fetchone()
+
+        return row[0]
+
+    def collect_garbage(self) -> int:
+        """Removes all media which are not referenced and returns their number."""
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, file_name FROM media "
+                "WHERE id NOT IN (SELECT medium_id FROM refs)"
+            ).fetchall()
+            for medium_id, file_name in rows:
+                self._get_path(file_name).unlink(missing_ok=True)
+                self._connection.execute("DELETE FROM media WHERE id = ?", (medium_id,))
+            self._connection.commit()
+
+        if rows:
+            _log.info("Removed unreferenced media [count={0}]", len(rows))
+
+        return len(rows)
+
+    def get_bytes(self, medium_id: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT file_name FROM media WHERE id = ?", (medium_id,)
+            ).fetchone()
+        if row is None:
+            return
+
+        try:
+            return self._get_path(row[0]).read_bytes()
+        except FileNotFoundError:
+            _log.warning("Stored medium is missing [id='{0}']", medium_id)
+            return
+
+    def load(self, medium: Medium) -> Medium:
+        """Returns the medium with its content, if the content is stored."""
+
+        if medium.content_b64 is not None:
+            return medium
+
+        data = self.get_bytes(medium.id)
+        if data is None:
+            return medium
+
+        return medium.model_copy(update={"content_b64": b64encode(data).decode()})
+
+    def load_document(self, document: ParsedDocument) -> ParsedDocument:
+        """Returns a copy of the document with the content of all its media."""
+
+        content = [
+            page.model_copy(update={"media": [self.load(m) for m in page.media]})
+            for page in document.content
+        ]
+
+        return document.model_copy(update={"content": content})
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> MediaStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_path(self, file_name: str) -> Path:
+        # shard by prefix to keep directories small
+        return self._root / file_name[:2] / file_name
+
+    @staticmethod
+    def _write_file(path: Path, data: bytes) -> None:
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+
+def get_media_store_path(path: Path, config: MediaStoreConfig) -> Path:
+    """Returns the root of the store used for the media of the given document."""
+
+    if config.path is not None:
+        return Path(config.path)
+
+    return path.parent / MEDIA_STORE_DIR_NAME
+
+
+def _get_extension(mime_type: str) -> str:
+    return mimetypes.guess_extension(mime_type) or ""
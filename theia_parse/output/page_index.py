@@ -0,0 +1,30 @@
+from collections.abc import Iterable
+
+from pydantic import BaseModel
+
+
+class PageIndex(BaseModel):
+    """Byte ranges of the pages in a parsed file for random access."""
+
+    pages: list[tuple[int, int, int]] = []
+    """(page number, start offset, end offset)"""
+    medium_pages: dict[str, int] = {}
+    """Medium id -> page number of the first page containing the medium"""
+
+    def add(
+        self,
+        page_number: int,
+        start: int,
+        end: int,
+        medium_ids: Iterable[str] = (),
+    ) -> None:
+        self.pages.append((page_number, start, end))
+        for medium_id in medium_ids:
+            self.medium_pages.setdefault(medium_id, page_number)
+
+    def get_span(self, page_number: int) -> tuple[int, int] | None:
+        for number, start, end in self.pages:
+            if number == page_number:
+                return start, end
+
+        return
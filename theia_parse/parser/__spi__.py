@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-from pdfplumber.display import DEFAULT_RESOLUTION
 from pydantic import BaseModel
 
-from theia_parse.types import ImageExtractionMethod, ImageFormat, RawParserTypeName
+from theia_parse.const import PDF_POINTS_PER_INCH
+from theia_parse.model import ErrorType, LlmUsage
+from theia_parse.types import (
+    Compression,
+    ImageExtractionMethod,
+    ImageFormat,
+    OutputFormat,
+    RawParserTypeName,
+    SchedulingPolicy,
+)
 
 
 T_num = int | float
@@ -24,7 +32,7 @@ class ImageSize(BaseModel):
         total_height: T_num,
         resolution: int | None,
     ) -> ImageSize:
-        scale = resolution / DEFAULT_RESOLUTION if resolution is not None else 1
+        scale = resolution / PDF_POINTS_PER_INCH if resolution is not None else 1
         width = self.width
         if isinstance(self.width, float):
             width = int(self.width * total_width * scale)
@@ -47,6 +55,12 @@ class ImageExtractionConfig(BaseModel):
     yodocus_iou_threshold: float = 0.45
     yodocus_postprocessor_containment_threshold: float = 0.9
     yodocus_additional_margin: float = 10
+    yodocus_service_socket: str | None = None
+    """
+    Unix socket of a shared detection service, which loads the model once for
+    all parser processes of a host, see detection_service. The model is loaded
+    in each process if None.
+    """
 
     min_size: ImageSize | None = ImageSize(width=20, height=20)
     max_size: ImageSize | None = ImageSize(width=0.9, height=0.9)
@@ -82,27 +96,240 @@ class RawParserConfig(BaseModel):
     llm_use_vision: bool = False
 
 
+class PostImproveConfig(BaseModel):
+    quality_threshold: float | None = 0.8
+    """
+    Only pages whose quality score is below this threshold are improved.
+    None improves every page.
+    """
+
+    json_validity_weight: float = 1.0
+    text_coverage_weight: float = 1.0
+    heading_consistency_weight: float = 0.5
+    image_references_weight: float = 0.5
+
+
 class LlmGenerationConfig(BaseModel):
     temperature: float | None = 0
     max_tokens: int | None = None
     json_mode: bool = True
+    structured_output: bool = True
+    """
+    Constrain JSON responses to the expected response schema (strict structured
+    output), if supported by the LLM API. Falls back to plain JSON mode otherwise.
+    """
+
+
+class RetryConfig(BaseModel):
+    max_attempts: dict[ErrorType, int] = {
+        ErrorType.TRANSIENT: 4,
+        ErrorType.RATE_LIMIT: 6,
+        ErrorType.CONTENT_FILTER: 1,
+        ErrorType.CONTEXT_LENGTH: 2,
+        ErrorType.PARSE_FAILURE: 2,
+        ErrorType.UNKNOWN: 2,
+    }
+    """Maximum number of attempts per page by error type, 1 disables retries"""
+
+    backoff_base_seconds: float = 2.0
+    backoff_max_seconds: float = 60.0
+    jitter: bool = True
+
+
+class ModelPrice(BaseModel):
+    """Prices per million tokens"""
+
+    request: float
+    response: float
+    cached_request: float | None = None
+    """Defaults to the request price"""
+
+
+class PriceTable(BaseModel):
+    currency: str = "EUR"
+    model_prices: dict[str, ModelPrice] = {}
+    """
+    Keyed by model name, the longest key which is a prefix of the model name
+    reported by the API is used (e.g. "gpt-4o-mini" for "gpt-4o-mini-2024-07-18")
+    """
+
+    def get_price(self, model: str | None) -> ModelPrice | None:
+        if model is None:
+            return
+
+        matches = [k for k in self.model_prices if model.startswith(k)]
+        if not matches:
+            return
+
+        return self.model_prices[max(matches, key=len)]
+
+    def get_cost(self, usage: LlmUsage) -> float | None:
+        price = self.get_price(usage.model)
+        if price is None:
+            return
+
+        cached_tokens = usage.cached_tokens or 0
+        cached_price = (
+            price.cached_request if price.cached_request is not None else price.request
+        )
+
+        return (
+            ((usage.request_tokens or 0) - cached_tokens) * price.request
+            + cached_tokens * cached_price
+            + (usage.response_tokens or 0) * price.response
+        ) / 1_000_000
+
+
+class UsageEstimationConfig(BaseModel):
+    """
+    Assumptions for estimating the usage of LLM calls before they are made,
+    see DirectoryParser.plan and DocumentParserConfig.max_cost
+    """
+
+    chars_per_token: float = 4.0
+    image_base_tokens: int = 85
+    image_tokens_per_tile: int = 170
+    """Image tokens of the model, e.g. 2833 and 5667 for gpt-4o-mini"""
+
+    min_response_tokens: int = 150
+    response_tokens_per_text_token: float = 1.5
+    """Responses repeat the page text as JSON content blocks"""
+
+    improve_ratio: float = 0.3
+    """Share of pages improved if PostImproveConfig.quality_threshold is set"""
+
+    request_latency_seconds: float = 1.5
+    response_tokens_per_second: float = 60.0
+
+
+class MediaStoreConfig(BaseModel):
+    enabled: bool = False
+    """
+    Write media of saved files once to a content-addressed store, pages only
+    reference them by Medium.id
+    """
+    path: str | None = None
+    """
+    Share one store, e.g. across a corpus. Defaults to MEDIA_STORE_DIR_NAME
+    in the directory of each document
+    """
+
+
+class BinaryOutputConfig(BaseModel):
+    compression: Compression = "zlib"
+    drop_raw_fields: bool = False
+    """Drop raw_extracted_text and raw_llm_response of the pages"""
 
 
 class DocumentParserConfig(BaseModel):
     verbose: bool = True
     save_file: bool = False
+    output_format: OutputFormat = "json"
+    """
+    Format of the saved file. With "jsonl" pages are streamed to the file as
+    they are parsed and DocumentParser.parse returns the document without
+    content, so memory does not grow with the document size
+    """
+    binary_output_config: BinaryOutputConfig = BinaryOutputConfig()
+    """Options of the "binary" output format"""
+    checkpoint: bool = True
+    """Persist each parsed page to resume interrupted runs, requires save_file"""
+    media_store_config: MediaStoreConfig = MediaStoreConfig()
     use_vision: bool = True
     post_improve: bool = False
+    post_improve_config: PostImproveConfig = PostImproveConfig()
     raw_parser_config: RawParserConfig = RawParserConfig()
     prompt_config: PromptConfig = PromptConfig()
     image_extraction_config: ImageExtractionConfig = ImageExtractionConfig()
     generation_config: LlmGenerationConfig = LlmGenerationConfig()
+    retry_config: RetryConfig = RetryConfig()
+    price_table: PriceTable = PriceTable()
+    """Prices to report the cost of each LLM call in its usage"""
+    max_cost: float | None = None
+    """
+    Spend ceiling in the currency of the price table for all LLM calls of a
+    parser. A call which would exceed it raises SpendLimitExceededError before
+    it is sent, requires a price for the model
+    """
+    usage_estimation_config: UsageEstimationConfig = UsageEstimationConfig()
 
 
 DEFAULT_DOCUMENT_PARSER_CONFIG = DocumentParserConfig()
 
 
+class ScanConfig(BaseModel):
+    include: list[str] | None = None
+    """
+    fnmatch patterns matched against the file path relative to the scanned
+    directory (`*` also matches `/`), e.g. `reports/*.pdf`. None includes all files.
+    """
+
+    exclude: list[str] = []
+    """fnmatch patterns for relative file or directory paths to skip, e.g. `*/.git`"""
+
+    min_size: int | None = None
+    max_size: int | None = None
+    """File size limits in bytes"""
+
+    follow_symlinks: bool = False
+    """Descend into symlinked directories, symlinked files are always scanned"""
+    workers: int = 1
+    """
+    Number of threads scanning subtrees in parallel. With 1 worker files are
+    yielded in a deterministic (sorted, depth first) order, which also makes the
+    choice of the original among duplicates deterministic.
+    """
+
+    queue_size: int = 100_000
+    """Maximum number of discovered files buffered ahead of the consumer"""
+
+
+class SharedQueueConfig(BaseModel):
+    queue_path: str | None = None
+    """Defaults to WORK_QUEUE_FILE_NAME in the parsed directory"""
+    worker_id: str | None = None
+    """Defaults to host name, process id and a random suffix"""
+    lease_seconds: float = 300.0
+    heartbeat_seconds: float = 60.0
+    max_attempts: int = 3
+
+
+class PlanConfig(BaseModel):
+    concurrency: int | None = None
+    """Number of concurrent LLM calls, defaults to DirectoryParserConfig.page_workers"""
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    """Rate limits of the LLM deployment"""
+    workers: int | None = None
+    """Number of processes planning documents, defaults to the number of CPUs"""
+
+
 class DirectoryParserConfig(BaseModel):
     verbose: bool = True
     deduplicate_docs: bool = True
+    skip_parsed: bool = True
+    """Skip documents whose parsed file is newer than the document"""
+    use_hash_index: bool = True
+    """Cache md5 sums and page counts in a persistent index"""
+    hash_index_path: str | None = None
+    """
+    Defaults to an index per parsed directory in the user cache directory, see
+    get_default_index_path, so read-only corpora can be indexed
+    """
+    hashing_workers: int = 8
+    page_counting_workers: int | None = None
+    """Number of processes for page counting, defaults to the number of CPUs"""
+    scan_config: ScanConfig = ScanConfig()
+    page_workers: int = 1
+    """
+    Number of pages parsed concurrently across documents. With more than one
+    worker, documents are split into page tasks of a shared queue
+    """
+    scheduling_policy: SchedulingPolicy = "fifo"
+    """Order in which page tasks of different documents are started"""
+    scheduling_window: int = 64
+    """Maximum number of documents with pages in the queue at the same time"""
+    shared_queue_config: SharedQueueConfig = SharedQueueConfig()
+    plan_config: PlanConfig = PlanConfig()
+    """Assumptions of the dry run, see DirectoryParser.plan"""
     document_parser_config: DocumentParserConfig = DocumentParserConfig()
@@ -0,0 +1,91 @@
+import json
+import os
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from theia_parse.const import CHECKPOINT_SUFFIXES
+from theia_parse.model import DocumentPage, ParsedDocument
+from theia_parse.util.files import with_suffix
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+class PageCheckpoint:
+    """
+    Durable, append-only record of the parsed pages of a document.
+    The first line holds the document hull (without content), every further
+    line one parsed page as JSON.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = with_suffix(path, CHECKPOINT_SUFFIXES)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def open(self, hull: ParsedDocument) -> list[DocumentPage]:
+        """
+        Returns the pages completed by a previous run for the same document
+        version (same md5 sum) and starts a new checkpoint otherwise.
+        """
+
+        pages = self._load(hull)
+        if pages is None:
+            pages = []
+            self._write_line(hull.model_dump(mode="json", exclude={"content"}), "wt")
+        elif pages:
+            _log.info(
+                "Resuming from checkpoint [path='{0}', completed_pages={1}]",
+                self._path,
+                len(pages),
+            )
+
+        return pages
+
+    def append(self, page: DocumentPage) -> None:
+        self._write_line(page.model_dump(mode="json"), "at")
+
+    def remove(self) -> None:
+        self._path.unlink(missing_ok=True)
+
+    def _load(self, hull: ParsedDocument) -> list[DocumentPage] | None:
+        if not self._path.is_file():
+            return
+
+        data = self._path.read_bytes()
+        complete_length = data.rfind(b"\n") + 1
+        if complete_length < len(data):
+            # drop a partially written last line, also on disk, so appended
+            # pages do not continue it
+            os.truncate(self._path, complete_length)
+        lines = data[:complete_length].decode("utf-8").splitlines()
+        if not lines:
+            return
+
+        try:
+            header = json.loads(lines[0])
+            if header.get("md5_sum") != hull.md5_sum:
+                _log.info("Discarding outdated checkpoint [path='{0}']", self._path)
+                return
+            pages = [DocumentPage(**json.loads(line)) for line in lines[1:]]
+        except (json.JSONDecodeError, ValidationError) as e:
+            _log.warning(
+                "Discarding invalid checkpoint [path='{0}', error='{1}']",
+                self._path,
+                e,
+            )
+            return
+
+        # keep the last record per page
+        return list({p.page_number: p for p in pages}.values())
+
+    def _write_line(self, data: dict, mode: str) -> None:
+        with open(self._path, mode) as outfile:
+            outfile.write(json.dumps(data))
+            outfile.write("\n")
+            outfile.flush()
+            os.fsync(outfile.fileno())
@@ -1,15 +1,26 @@
-import os
+from collections.abc import Iterator
+from itertools import batched
 from pathlib import Path
 from typing import Generator
 
 from tqdm import tqdm
 
-from theia_parse.const import DUPLICATE_SUFFIXES
-from theia_parse.llm.__spi__ import LlmApiEnvSettings, LlmApiSettings
-from theia_parse.model import ParsedDocument
+from theia_parse.const import DUPLICATE_SUFFIXES, WORK_QUEUE_FILE_NAME
+from theia_parse.llm.__spi__ import (
+    LlmApiSettings,
+    SpendLimitExceededError,
+)
+from theia_parse.model import ParsedDocument, ParsingPlan, UsageSummary
+from theia_parse.output import find_parsed_path, is_reference
 from theia_parse.parser.__spi__ import DirectoryParserConfig
+from theia_parse.parser.directory_scanner import DirectoryScanner, ScannedFile
 from theia_parse.parser.document_parser import DocumentParser
-from theia_parse.util.files import get_md5_sum, is_file_supported, with_suffix
+from theia_parse.parser.file_parser import count_pages
+from theia_parse.parser.page_scheduler import PageScheduler, ScheduledDocument
+from theia_parse.parser.planner import plan_documents, project_wall_seconds
+from theia_parse.parser.work_queue import SharedWorkQueue
+from theia_parse.util.files import with_suffix
+from theia_parse.util.hash_index import FileHashIndex, get_default_index_path
 from theia_parse.util.log import LogFactory
 
 
@@ -26,58 +37,238 @@ class DirectoryParser:
         config: DirectoryParserConfig = DEFAULT_DIRECTORY_PARSER_CONFIG,
     ) -> None:
         if llm_api_settings is None:
-            self._llm_api_settings = LlmApiEnvSettings().to_settings()
+            from theia_parse.llm.env_settings import LlmApiEnvSettings
+
+            llm_api_settings = LlmApiEnvSettings().to_settings()
         self._llm_api_settings = llm_api_settings
         self._config = config
         self._document_parser = DocumentParser(
             llm_api_settings, config.document_parser_config
         )
+        self._scanner = DirectoryScanner(config.scan_config)
+        self._usage = UsageSummary()
+
+    @property
+    def usage(self) -> UsageSummary:
+        """
+        Usage of the documents yielded by the last call of parse, parse_shared
+        or retry_failed_pages, updated as documents are yielded.
+        """
+
+        return self._usage
 
     def parse(
         self,
         directory: str | Path,
         existing_hash_to_path: dict[str, str | Path] | None = None,
     ) -> Generator[ParsedDocument, None, None]:
+        """
+        Parses all supported files in the directory. Already parsed files are
+        skipped (not yielded) and partially parsed files are resumed from their
+        checkpoint, see DirectoryParserConfig.skip_parsed and
+        DocumentParserConfig.checkpoint. Raises SpendLimitExceededError before
+        exceeding DocumentParserConfig.max_cost, the run can be resumed later.
+        """
+
         directory = Path(directory)
 
         if not directory.is_dir():
             _log.warning("Not a directory [path='{0}']", directory)
             return
 
+        self._usage = UsageSummary()
         hash_to_path: dict[str, Path] = {}
         if existing_hash_to_path is not None:
             hash_to_path = {k: Path(v) for k, v in existing_hash_to_path.items()}
 
-        for root, _, file_names in os.walk(directory):
-            _log.info("Working on directory [dir_name='{0}']", root)
-            file_name_iterator = tqdm(
-                sorted(f for f in file_names if is_file_supported(f)),
-                desc="file in dir",
-                disable=not self._config.verbose,
-                ncols=80,
+        progress = tqdm(
+            total=0,
+            desc="files",
+            unit="file",
+            disable=not self._config.verbose,
+            ncols=80,
+        )
+        with self._open_hash_index(directory) as hash_index, progress:
+            documents = self._get_documents_to_parse(
+                directory, hash_to_path, hash_index, progress
             )
-            for file_name in file_name_iterator:
-                current_path = Path(root) / file_name
-                _log.info("Working on file [path='{0}']", current_path)
-                md5_sum = get_md5_sum(current_path)
-                if self._config.deduplicate_docs and (
-                    existing_path := hash_to_path.get(md5_sum)
-                ):
-                    _log.info(
-                        "Skipping file due to deduplication "
-                        "[path='{0}', duplicate_path='{1}']",
-                        current_path,
-                        existing_path,
+            if self._config.page_workers > 1:
+                scheduler = PageScheduler(
+                    self._document_parser,
+                    max_workers=self._config.page_workers,
+                    policy=self._config.scheduling_policy,
+                    window=self._config.scheduling_window,
+                )
+                for parsed in scheduler.run(documents):
+                    progress.update()
+                    self._usage.add_document(parsed)
+                    yield parsed
+                return
+
+            for document in documents:
+                parsed = self._document_parser.parse(document.path, document.md5_sum)
+                progress.update()
+                if parsed is not None:
+                    self._usage.add_document(parsed)
+                    yield parsed
+
+    def parse_shared(
+        self, directory: str | Path
+    ) -> Generator[ParsedDocument, None, None]:
+        """
+        Parses the directory together with other workers (processes or machines)
+        running parse_shared on the same directory, coordinated by a shared
+        work queue, see DirectoryParserConfig.shared_queue_config. Only the
+        documents parsed by this worker are yielded.
+        """
+
+        directory = Path(directory)
+
+        if not directory.is_dir():
+            _log.warning("Not a directory [path='{0}']", directory)
+            return
+
+        self._usage = UsageSummary()
+        progress = tqdm(
+            desc="files",
+            unit="file",
+            disable=not self._config.verbose,
+            ncols=80,
+        )
+        with (
+            self._open_hash_index(directory, shared=True) as hash_index,
+            self._open_work_queue(directory) as queue,
+            progress,
+        ):
+            # every worker enqueues the files, already known files are ignored
+            for batch in batched(self._scanner.scan(directory), 1000):
+                queue.enqueue(f.path for f in batch)
+
+            while (path := queue.claim()) is not None:
+                _log.info(
+                    "Working on file [path='{0}', worker_id='{1}']",
+                    path,
+                    queue.worker_id,
+                )
+                try:
+                    parsed = self._parse_claimed(path, queue, hash_index)
+                except SpendLimitExceededError:
+                    # the claim is released when its lease expires
+                    raise
+                except Exception as e:
+                    _log.error(
+                        "Could not parse file [path='{0}', error='{1}']", path, e
                     )
-                    self._save_duplicate_info(current_path, existing_path)
-                    file_name_iterator.update()
+                    queue.fail(path, str(e))
                     continue
+                finally:
+                    progress.update()
 
-                parsed = self._document_parser.parse(current_path)
+                queue.complete(path)
                 if parsed is not None:
-                    hash_to_path[md5_sum] = current_path
+                    self._usage.add_document(parsed)
                     yield parsed
 
+    def retry_failed_pages(
+        self,
+        directory: str | Path,
+    ) -> Generator[ParsedDocument, None, None]:
+        """
+        Re-parses the error pages of all parsed documents in the directory.
+        """
+
+        directory = Path(directory)
+
+        if not directory.is_dir():
+            _log.warning("Not a directory [path='{0}']", directory)
+            return
+
+        self._usage = UsageSummary()
+        for file in self._scanner.scan(directory):
+            parsed_path = find_parsed_path(file.path)
+            if parsed_path is None or is_reference(parsed_path):
+                continue
+            parsed = self._document_parser.retry_failed_pages(file.path)
+            if parsed is not None:
+                self._usage.add_document(parsed)
+                yield parsed
+
+    def plan(
+        self,
+        directory: str | Path,
+        existing_hash_to_path: dict[str, str | Path] | None = None,
+    ) -> ParsingPlan:
+        """
+        Dry run of parse: estimates the LLM usage and cost of the documents
+        which would be parsed, without calling the LLM or writing parsed files,
+        and projects the duration for the concurrency and rate limits of
+        DirectoryParserConfig.plan_config. Documents are planned in parallel.
+        """
+
+        directory = Path(directory)
+        plan_config = self._config.plan_config
+        document_parser_config = self._config.document_parser_config
+        plan = ParsingPlan(
+            currency=document_parser_config.price_table.currency,
+            concurrency=plan_config.concurrency or self._config.page_workers,
+            max_cost=document_parser_config.max_cost,
+        )
+
+        if not directory.is_dir():
+            _log.warning("Not a directory [path='{0}']", directory)
+            return plan
+
+        hash_to_path: dict[str, Path] = {}
+        if existing_hash_to_path is not None:
+            hash_to_path = {k: Path(v) for k, v in existing_hash_to_path.items()}
+
+        progress = tqdm(
+            total=0,
+            desc="files",
+            unit="file",
+            disable=not self._config.verbose,
+            ncols=80,
+        )
+        documents: list[tuple[Path, str | None]] = []
+        with self._open_hash_index(directory) as hash_index, progress:
+            for file, md5_sum in self._scan_with_md5_sums(
+                directory, hash_index, progress
+            ):
+                if self._config.deduplicate_docs and md5_sum in hash_to_path:
+                    plan.n_duplicates += 1
+                    progress.update()
+                    continue
+                hash_to_path[md5_sum] = file.path
+                if self._config.skip_parsed and self._is_parsed(file.path):
+                    plan.n_parsed += 1
+                    progress.update()
+                    continue
+                documents.append((file.path, md5_sum))
+
+            for parsed in plan_documents(
+                documents,
+                self._llm_api_settings,
+                document_parser_config,
+                plan_config.workers,
+            ):
+                progress.update()
+                if parsed is not None:
+                    plan.usage.add_document(parsed)
+                    plan.n_pages += len(parsed.content)
+
+        plan.wall_seconds, plan.limited_by = project_wall_seconds(
+            plan.usage.token_usage, plan.concurrency, plan_config
+        )
+        if plan.exceeds_max_cost:
+            _log.warning(
+                "Estimated cost exceeds the spend limit, parsing would be aborted "
+                "[cost={0:.2f}, max_cost={1:.2f}]",
+                plan.cost,
+                plan.max_cost,
+            )
+
+        return plan
+
     def get_number_of_pages(
         self,
         directory: str | Path,
@@ -97,20 +288,179 @@ class DirectoryParser:
         if existing_hash_to_path is not None:
             hash_to_path = {k: Path(v) for k, v in existing_hash_to_path.items()}
 
+        files = list(self._scanner.scan(directory))
+        paths = [f.path for f in files]
+        stats = {f.path: f.stat for f in files}
+
+        with self._open_hash_index(directory) as hash_index:
+            md5_sums = hash_index.get_md5_sums(paths, stats)
+            path_to_n_pages = {
+                p: hash_index.get_number_of_pages(p, stats[p]) for p in paths
+            }
+            missing = [p for p, n in path_to_n_pages.items() if n is None]
+            counted = count_pages(missing, self._config.page_counting_workers)
+            path_to_n_pages.update(counted)
+            hash_index.set_numbers_of_pages(
+                {p: n for p, n in counted.items() if n is not None}, stats
+            )
+
         total_pages = 0
         duplicate_pages = 0
-        for root, _, file_names in os.walk(directory):
-            for file_name in sorted(f for f in file_names if is_file_supported(f)):
-                current_path = Path(root) / file_name
-                n_pages = self._document_parser.get_number_of_pages(current_path)
-                total_pages += n_pages or 0
-                md5_sum = get_md5_sum(current_path)
-                if md5_sum in hash_to_path:
-                    duplicate_pages += n_pages or 0
-                hash_to_path[md5_sum] = current_path
+        for current_path in paths:
+            n_pages = path_to_n_pages[current_path]
+            total_pages += n_pages or 0
+            md5_sum = md5_sums[current_path]
+            if md5_sum in hash_to_path:
+                duplicate_pages += n_pages or 0
+            hash_to_path[md5_sum] = current_path
 
         return total_pages, duplicate_pages
 
+    def close(self) -> None:
+        """Closes the open media stores, see DocumentParser.close."""
+
+        self._document_parser.close()
+
+    def __enter__(self) -> "DirectoryParser":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_documents_to_parse(
+        self,
+        directory: Path,
+        hash_to_path: dict[str, Path],
+        hash_index: FileHashIndex,
+        progress: tqdm,
+    ) -> Iterator[ScheduledDocument]:
+        """
+        Streams the files which need to be parsed. Duplicates and already
+        parsed files are handled here and only counted in the progress.
+        """
+
+        for file, md5_sum in self._scan_with_md5_sums(directory, hash_index, progress):
+            current_path = file.path
+            _log.info("Working on file [path='{0}']", current_path)
+            if self._config.deduplicate_docs and (
+                existing_path := hash_to_path.get(md5_sum)
+            ):
+                _log.info(
+                    "Skipping file due to deduplication "
+                    "[path='{0}', duplicate_path='{1}']",
+                    current_path,
+                    existing_path,
+                )
+                self._save_duplicate_info(current_path, existing_path)
+                progress.update()
+                continue
+
+            hash_to_path[md5_sum] = current_path
+            if self._config.skip_parsed and self._is_parsed(current_path):
+                _log.info("Skipping already parsed file [path='{0}']", current_path)
+                progress.update()
+                continue
+
+            n_pages = None
+            if self._config.page_workers > 1:
+                n_pages = hash_index.get_number_of_pages(current_path, file.stat)
+                if n_pages is None:
+                    n_pages = self._document_parser.get_number_of_pages(current_path)
+                    if n_pages is not None:
+                        hash_index.set_number_of_pages(current_path, n_pages, file.stat)
+
+            yield ScheduledDocument(current_path, md5_sum, n_pages)
+
+    def _scan_with_md5_sums(
+        self,
+        directory: Path,
+        hash_index: FileHashIndex,
+        progress: tqdm,
+    ) -> Iterator[tuple[ScannedFile, str]]:
+        """
+        Streams the scanned files with their md5 sums, hashing small batches of
+        files in parallel. The progress total grows as files are discovered.
+        """
+
+        def on_discovered(_: ScannedFile) -> None:
+            progress.total += 1
+
+        files = self._scanner.scan(directory, on_discovered)
+        for batch in batched(files, max(1, 4 * self._config.hashing_workers)):
+            md5_sums = hash_index.get_md5_sums(
+                (f.path for f in batch), {f.path: f.stat for f in batch}
+            )
+            for file in batch:
+                yield file, md5_sums[file.path]
+
+    def _parse_claimed(
+        self,
+        path: Path,
+        queue: SharedWorkQueue,
+        hash_index: FileHashIndex,
+    ) -> ParsedDocument | None:
+        md5_sum = hash_index.get_md5_sum(path)
+        existing_path = queue.register_hash(md5_sum, path)
+        if self._config.deduplicate_docs and existing_path is not None:
+            _log.info(
+                "Skipping file due to deduplication [path='{0}', duplicate_path='{1}']",
+                path,
+                existing_path,
+            )
+            self._save_duplicate_info(path, existing_path)
+            return
+
+        if self._config.skip_parsed and self._is_parsed(path):
+            _log.info("Skipping already parsed file [path='{0}']", path)
+            return
+
+        return self._document_parser.parse(path, md5_sum)
+
+    def _open_work_queue(self, directory: Path) -> SharedWorkQueue:
+        config = self._config.shared_queue_config
+
+        return SharedWorkQueue(
+            config.queue_path or directory / WORK_QUEUE_FILE_NAME,
+            root=directory,
+            worker_id=config.worker_id,
+            lease_seconds=config.lease_seconds,
+            heartbeat_seconds=config.heartbeat_seconds,
+            max_attempts=config.max_attempts,
+        )
+
+    def _open_hash_index(self, directory: Path, shared: bool = False) -> FileHashIndex:
+        if not self._config.use_hash_index:
+            return FileHashIndex(max_workers=self._config.hashing_workers)
+
+        if self._config.hash_index_path is not None:
+            index_path = Path(self._config.hash_index_path)
+        else:
+            index_path = get_default_index_path(directory)
+            try:
+                index_path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                _log.warning(
+                    "Could not create hash index, using an in-memory index "
+                    "[path='{0}', error='{1}']",
+                    index_path,
+                    e,
+                )
+                return FileHashIndex(max_workers=self._config.hashing_workers)
+
+        # workers of shared runs may open the index (a configured one or in a
+        # shared home directory) over network filesystems, where WAL does not work
+        return FileHashIndex(
+            index_path, max_workers=self._config.hashing_workers, wal=not shared
+        )
+
+    def _is_parsed(self, path: Path) -> bool:
+        parsed_path = find_parsed_path(path)
+
+        return (
+            parsed_path is not None
+            and parsed_path.stat().st_mtime >= path.stat().st_mtime
+        )
+
     def _save_duplicate_info(self, path: Path, existing_path: Path) -> None:
         save_path = with_suffix(path, DUPLICATE_SUFFIXES)
         save_path.write_text(str(existing_path))
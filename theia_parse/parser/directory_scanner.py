@@ -0,0 +1,176 @@
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from fnmatch import fnmatchcase
+from pathlib import Path
+from queue import Queue
+from threading import Event, Thread
+from typing import NamedTuple
+
+from theia_parse.const import SUPPORTED_EXTENSIONS
+from theia_parse.parser.__spi__ import ScanConfig
+from theia_parse.util.files import is_file_supported
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+class ScannedFile(NamedTuple):
+    path: Path
+    stat: os.stat_result
+
+
+type _DirScan = tuple[list[ScannedFile], list[Path]]
+
+_DONE = object()
+
+
+class DirectoryScanner:
+    """
+    Streams the files of a directory tree as they are discovered, based on
+    os.scandir, which avoids additional stat calls on most platforms.
+    """
+
+    def __init__(
+        self,
+        config: ScanConfig = ScanConfig(),  # noqa: B008
+        extensions: list[str] | None = SUPPORTED_EXTENSIONS,
+    ) -> None:
+        self._config = config
+        self._extensions = extensions
+
+    def scan(
+        self,
+        directory: str | Path,
+        on_discovered: Callable[[ScannedFile], None] | None = None,
+    ) -> Iterator[ScannedFile]:
+        """
+        Yields all matching files. `on_discovered` is called as soon as a file is
+        found, which may be well before it is yielded when scanning in parallel.
+        """
+
+        directory = Path(directory)
+        if self._config.workers <= 1:
+            yield from self._scan_serial(directory, on_discovered)
+        else:
+            yield from self._scan_parallel(directory, on_discovered)
+
+    def _scan_serial(
+        self,
+        directory: Path,
+        on_discovered: Callable[[ScannedFile], None] | None,
+    ) -> Iterator[ScannedFile]:
+        pending = [directory]
+        while pending:
+            files, sub_directories = self._scan_directory(directory, pending.pop())
+            for file in files:
+                if on_discovered is not None:
+                    on_discovered(file)
+                yield file
+            pending.extend(reversed(sub_directories))
+
+    def _scan_parallel(
+        self,
+        directory: Path,
+        on_discovered: Callable[[ScannedFile], None] | None,
+    ) -> Iterator[ScannedFile]:
+        queue: Queue = Queue(maxsize=self._config.queue_size)
+        stop = Event()
+
+        def produce() -> None:
+            try:
+                with ThreadPoolExecutor(max_workers=self._config.workers) as executor:
+                    futures: set[Future[_DirScan]] = {
+                        executor.submit(self._scan_directory, directory, directory)
+                    }
+                    while futures and not stop.is_set():
+                        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            files, sub_directories = future.result()
+                            futures.update(
+                                executor.submit(self._scan_directory, directory, d)
+                                for d in sub_directories
+                            )
+                            for file in files:
+                                if on_discovered is not None:
+                                    on_discovered(file)
+                                queue.put(file)
+                    for future in futures:
+                        future.cancel()
+            except Exception as e:
+                queue.put(e)
+            finally:
+                queue.put(_DONE)
+
+        producer = Thread(target=produce, name="directory-scanner", daemon=True)
+        producer.start()
+        try:
+            while (item := queue.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # unblock the producer if the consumer stopped early
+            while producer.is_alive():
+                while not queue.empty():
+                    queue.get_nowait()
+                producer.join(timeout=0.01)
+
+    def _scan_directory(self, root: Path, directory: Path) -> _DirScan:
+        files: list[ScannedFile] = []
+        sub_directories: list[Path] = []
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            _log.warning(
+                "Could not scan directory [path='{0}', error='{1}']", directory, e
+            )
+            return files, sub_directories
+
+        follow_symlinks = self._config.follow_symlinks
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    path = Path(entry.path)
+                    if not self._is_excluded(path.relative_to(root).as_posix()):
+                        sub_directories.append(path)
+                # symlinked files are always followed, like os.walk does
+                elif entry.is_file():
+                    if self._extensions is not None and not is_file_supported(
+                        entry.name, self._extensions
+                    ):
+                        continue
+                    path = Path(entry.path)
+                    if not self._is_included(path.relative_to(root).as_posix()):
+                        continue
+                    stat = entry.stat()
+                    if self._is_size_included(stat.st_size):
+                        files.append(ScannedFile(path, stat))
+            except OSError as e:
+                _log.warning(
+                    "Could not scan entry [path='{0}', error='{1}']", entry.path, e
+                )
+
+        return files, sub_directories
+
+    def _is_included(self, relative_path: str) -> bool:
+        if self._is_excluded(relative_path):
+            return False
+        if self._config.include is None:
+            return True
+
+        return any(fnmatchcase(relative_path, p) for p in self._config.include)
+
+    def _is_excluded(self, relative_path: str) -> bool:
+        return any(fnmatchcase(relative_path, p) for p in self._config.exclude)
+
+    def _is_size_included(self, size: int) -> bool:
+        if self._config.min_size is not None and size < self._config.min_size:
+            return False
+        if self._config.max_size is not None and size > self._config.max_size:
+            return False
+
+        return True
@@ -1,15 +1,39 @@
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
+from threading import Lock
 
-from theia_parse.const import PARSED_JSON_SUFFIXES
-from theia_parse.llm.__spi__ import LlmApiEnvSettings, LlmApiSettings
-from theia_parse.model import ParsedDocument
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.llm.spend_limit import SpendLimit
+from theia_parse.model import DocumentPage, ParsedDocument, PostImproveStats
+from theia_parse.output import (
+    find_parsed_path,
+    get_output_format,
+    get_parsed_path,
+    is_reference,
+    read_parsed,
+    write_parsed,
+)
+from theia_parse.output.jsonl import JsonlDocumentWriter
+from theia_parse.output.media_store import MediaStore, get_media_store_path
 from theia_parse.parser.__spi__ import DocumentParserConfig
-from theia_parse.parser.file_parser import get_parser
-from theia_parse.util.files import with_suffix, write_json
+from theia_parse.parser.checkpoint import PageCheckpoint
+from theia_parse.parser.file_parser import DEFAULT_PARSER_POOL
+from theia_parse.parser.file_parser.__spi__ import FileParser
+from theia_parse.types import OutputFormat
+from theia_parse.util.instrumentation import finish_document, span
+from theia_parse.util.log import LogFactory
 
 
 DEFAULT_DOCUMENT_PARSER_CONFIG = DocumentParserConfig()
 
+MAX_OPEN_MEDIA_STORES = 8
+"""Media stores kept open beyond their use, each holds a sqlite connection"""
+
+
+_log = LogFactory.get_logger()
+
 
 class DocumentParser:
     def __init__(
@@ -18,30 +42,272 @@ class DocumentParser:
         config: DocumentParserConfig = DEFAULT_DOCUMENT_PARSER_CONFIG,
     ) -> None:
         if llm_api_settings is None:
+            from theia_parse.llm.env_settings import LlmApiEnvSettings
+
             llm_api_settings = LlmApiEnvSettings().to_settings()
         self._llm_api_settings = llm_api_settings
         self._config = config
+        self._media_stores: OrderedDict[Path, MediaStore] = OrderedDict()
+        self._media_store_users: Counter[Path] = Counter()
+        self._media_stores_lock = Lock()
+        self._spend_limit = (
+            SpendLimit(config.max_cost) if config.max_cost is not None else None
+        )
+
+    @property
+    def config(self) -> DocumentParserConfig:
+        return self._config
+
+    @property
+    def spend_limit(self) -> SpendLimit | None:
+        """See DocumentParserConfig.max_cost, shared by all file parsers"""
+
+        return self._spend_limit
 
-    def parse(self, path: str | Path) -> ParsedDocument | None:
+    def parse(
+        self,
+        path: str | Path,
+        md5_sum: str | None = None,
+    ) -> ParsedDocument | None:
         path = Path(path)
 
-        parser = get_parser(path, self._llm_api_settings)
+        parser = self.get_file_parser(path)
         if parser is None:
             return
 
-        parsed = parser.parse(path, self._config)
-        if parsed is None:
-            return
+        with span("document", "document", path=str(path)):
+            if self._config.save_file and self._config.output_format == "jsonl":
+                return self._parse_streaming(parser, path, md5_sum)
+
+            if self._config.save_file and self._config.checkpoint:
+                parsed = self._parse_with_checkpoint(parser, path, md5_sum)
+            else:
+                parsed = parser.parse(path, md5_sum)
+            if parsed is None:
+                return
+
+            self.save(path, parsed)
+
+        return parsed
+
+    def get_file_parser(self, path: Path) -> FileParser | None:
+        """Returns a warm parser for the file type, shared between threads."""
+
+        return DEFAULT_PARSER_POOL.get(
+            path, self._llm_api_settings, self._config, self._spend_limit
+        )
+
+    def save(self, path: Path, parsed: ParsedDocument) -> None:
+        """
+        Finishes a parsed document: aggregates its usage, logs post improvement
+        stats, writes the memory profile and the parsed file, replacing the
+        checkpoint, if configured.
+        """
+
+        parsed.update_usage()
+        self._log_post_improve_stats(path, parsed.get_post_improve_stats())
+        finish_document(path)
 
         if self._config.save_file:
-            save_path = with_suffix(path, PARSED_JSON_SUFFIXES)
-            write_json(save_path, parsed)
+            self._write(path, parsed, self._config.output_format)
+            if self._config.checkpoint:
+                PageCheckpoint(path).remove()
+
+    def close(self) -> None:
+        """Closes the open media stores."""
+
+        with self._media_stores_lock:
+            for media_store in self._media_stores.values():
+                media_store.close()
+            self._media_stores.clear()
+            self._media_store_users.clear()
+
+    def __enter__(self) -> "DocumentParser":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @contextmanager
+    def _use_media_store(self, path: Path) -> Iterator[MediaStore | None]:
+        """
+        Yields the media store for the document, if media stores are enabled.
+        Stores are cached, the least recently used ones beyond
+        MAX_OPEN_MEDIA_STORES are closed once no document uses them.
+        """
+
+        config = self._config.media_store_config
+        if not config.enabled:
+            yield
+            return
+
+        root = get_media_store_path(path, config)
+        with self._media_stores_lock:
+            media_store = self._media_stores.get(root)
+            if media_store is None:
+                media_store = MediaStore(root)
+                self._media_stores[root] = media_store
+            self._media_stores.move_to_end(root)
+            self._media_store_users[root] += 1
+        try:
+            yield media_store
+        finally:
+            with self._media_stores_lock:
+                self._media_store_users[root] -= 1
+                self._close_unused_media_stores()
+
+    def _close_unused_media_stores(self) -> None:
+        for root in list(self._media_stores):
+            if len(self._media_stores) <= MAX_OPEN_MEDIA_STORES:
+                break
+            if self._media_store_users[root] == 0:
+                self._media_stores.pop(root).close()
+                del self._media_store_users[root]
+
+    def _write(
+        self,
+        path: Path,
+        parsed: ParsedDocument,
+        output_format: OutputFormat,
+    ) -> None:
+        with self._use_media_store(path) as media_store:
+            if media_store is not None:
+                parsed = media_store.add_document(parsed)
+        write_parsed(path, parsed, output_format, self._config.binary_output_config)
+
+    def _parse_streaming(
+        self,
+        parser: FileParser,
+        path: Path,
+        md5_sum: str | None,
+    ) -> ParsedDocument:
+        """
+        Writes each page to the parsed file as soon as it is parsed, pages of
+        an existing checkpoint are merged in page order.
+        """
+
+        hull = parser.parse_hull(path, md5_sum)
+        checkpoint = PageCheckpoint(path) if self._config.checkpoint else None
+        completed = checkpoint.open(hull) if checkpoint is not None else []
+        completed.sort(key=lambda p: p.page_number)
+        n_written = 0
+        medium_ids: list[str] = []
+
+        parsed_path = get_parsed_path(path, self._config.output_format)
+        with self._use_media_store(path) as media_store:
+            with JsonlDocumentWriter(parsed_path, hull) as writer:
+
+                def write_page(page: DocumentPage) -> None:
+                    if media_store is not None:
+                        page = media_store.add_page(page)
+                        medium_ids.extend(m.id for m in page.media)
+                    writer.write_page(page)
+
+                for page in parser.parse_paged(path, context_pages=completed):
+                    if checkpoint is not None:
+                        checkpoint.append(page)
+                    while n_written < len(completed) and (
+                        completed[n_written].page_number < page.page_number
+                    ):
+                        write_page(completed[n_written])
+                        n_written += 1
+                    write_page(page)
+                for page in completed[n_written:]:
+                    write_page(page)
+
+            if media_store is not None:
+                media_store.set_references(hull.path, medium_ids)
+        if checkpoint is not None:
+            checkpoint.remove()
+        hull.update_usage(writer.summary)
+        self._log_post_improve_stats(path, writer.summary.post_improve_stats)
+        finish_document(path)
+
+        return hull
+
+    def _log_post_improve_stats(self, path: Path, stats: PostImproveStats) -> None:
+        if self._config.post_improve:
+            _log.info(
+                "Post improvement finished [path='{0}', improved={1}, pages={2}]",
+                path,
+                stats.n_improved,
+                stats.n_pages,
+            )
+
+    def _parse_with_checkpoint(
+        self,
+        parser: FileParser,
+        path: Path,
+        md5_sum: str | None,
+    ) -> ParsedDocument:
+        parsed = parser.parse_hull(path, md5_sum)
+        checkpoint = PageCheckpoint(path)
+        pages = checkpoint.open(parsed)
+        for page in parser.parse_paged(path, context_pages=list(pages)):
+            checkpoint.append(page)
+            pages.append(page)
+
+        parsed.content = sorted(pages, key=lambda p: p.page_number)
+
+        return parsed
+
+    def retry_failed_pages(self, path: str | Path) -> ParsedDocument | None:
+        """
+        Re-parses only the error pages of the existing parsed file of the given
+        document and updates the parsed file. Duplicates are skipped, their
+        pages are retried with the source document.
+        """
+
+        path = Path(path)
+        parsed_path = find_parsed_path(path)
+        if parsed_path is None:
+            _log.warning("No parsed file found [path='{0}']", path)
+            return
+        if is_reference(parsed_path):
+            _log.debug("Skipping duplicate [path='{0}']", path)
+            return
+
+        parsed = read_parsed(parsed_path)
+        error_page_numbers = parsed.get_error_page_numbers()
+        if not error_page_numbers:
+            return parsed
+
+        parser = self.get_file_parser(path)
+        if parser is None:
+            return
+
+        _log.info(
+            "Retrying failed pages [path='{0}', page_numbers={1}]",
+            path,
+            error_page_numbers,
+        )
+        try:
+            retried = {
+                page.page_number: page
+                for page in parser.parse_paged(
+                    path,
+                    page_numbers=error_page_numbers,
+                    context_pages=[p for p in parsed.content if not p.error],
+                )
+            }
+        finally:
+            finish_document(path)
+        parsed.content = [retried.get(p.page_number, p) for p in parsed.content]
+        parsed.update_usage()
+
+        _log.info(
+            "Retried failed pages [path='{0}', fixed={1}, failed={2}]",
+            path,
+            len(error_page_numbers) - len(parsed.get_error_page_numbers()),
+            len(parsed.get_error_page_numbers()),
+        )
+        self._write(path, parsed, get_output_format(parsed_path) or "json")
 
         return parsed
 
     def get_number_of_pages(self, path: Path) -> int | None:
-        parser = get_parser(path, self._llm_api_settings)
+        parser = self.get_file_parser(path)
         if parser is not None:
-            return parser.get_number_of_pages(path, self._config)
+            return parser.get_number_of_pages(path)
 
         return
@@ -1,8 +1,21 @@
+import importlib
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
 from pathlib import Path
+from threading import Lock
 
 from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.llm.spend_limit import SpendLimit
+from theia_parse.parser.__spi__ import (
+    DEFAULT_DOCUMENT_PARSER_CONFIG,
+    DocumentParserConfig,
+)
 from theia_parse.parser.file_parser.__spi__ import FileParser
-from theia_parse.parser.file_parser.pdf.pdf_parser import PdfParser
+from theia_parse.parser.file_parser.pdf.page_counter import (
+    count_pdf_pages_with_fallback,
+)
 from theia_parse.util.log import LogFactory
 
 
@@ -10,18 +23,123 @@ _log = LogFactory.get_logger()
 
 
 # TODO: Add more file types (or wrapper filetype -> pdf)
-EXTENSION_TO_PARSER: dict[str, type[FileParser]] = {
-    "pdf": PdfParser,
+EXTENSION_TO_PARSER: dict[str, str] = {
+    "pdf": "theia_parse.parser.file_parser.pdf.pdf_parser.PdfParser",
 }
+"""Import paths of the parsers, which are imported on first use"""
+
+EXTENSION_TO_PAGE_COUNTER: dict[str, Callable[[Path], int | None]] = {
+    "pdf": count_pdf_pages_with_fallback,
+}
+
+_MIN_FILES_PER_PAGE_COUNTING_WORKER = 16
 
 
 def get_parser(
     path: Path,
     llm_api_settings: LlmApiSettings | None = None,
+    config: DocumentParserConfig = DEFAULT_DOCUMENT_PARSER_CONFIG,
+    spend_limit: SpendLimit | None = None,
 ) -> FileParser | None:
-    parser_cls = EXTENSION_TO_PARSER.get(path.suffix.strip(".").lower())
+    parser_cls = _get_parser_cls(path.suffix.strip(".").lower())
     if parser_cls is None:
         _log.warning("Filetype not supported [path='{0}']", path)
         return
 
-    return parser_cls(llm_api_settings)
+    return parser_cls(llm_api_settings, config, spend_limit)
+
+
+class ParserPool:
+    """
+    Keeps warm file parsers per file type, LLM API settings, config and spend
+    limit, so their templates, models and LLM clients are reused across files.
+    Parsers are shared between threads, the least recently used ones are
+    dropped beyond max_size.
+    """
+
+    def __init__(self, max_size: int = 16) -> None:
+        self._max_size = max_size
+        self._parsers: OrderedDict[tuple[str, str | None, str, int], FileParser] = (
+            OrderedDict()
+        )
+        self._lock = Lock()
+
+    def get(
+        self,
+        path: Path,
+        llm_api_settings: LlmApiSettings | None = None,
+        config: DocumentParserConfig = DEFAULT_DOCUMENT_PARSER_CONFIG,
+        spend_limit: SpendLimit | None = None,
+    ) -> FileParser | None:
+        key = (
+            path.suffix.strip(".").lower(),
+            llm_api_settings.model_dump_json() if llm_api_settings else None,
+            config.model_dump_json(),
+            # the parser keeps the spend limit alive, so its id is not reused
+            id(spend_limit),
+        )
+        with self._lock:
+            parser = self._parsers.get(key)
+            if parser is not None:
+                self._parsers.move_to_end(key)
+                return parser
+
+            parser = get_parser(path, llm_api_settings, config, spend_limit)
+            if parser is None:
+                return
+
+            self._parsers[key] = parser
+            if len(self._parsers) > self._max_size:
+                self._parsers.popitem(last=False)
+
+        return parser
+
+    def clear(self) -> None:
+        with self._lock:
+            self._parsers.clear()
+
+
+DEFAULT_PARSER_POOL = ParserPool()
+"""Parsers shared by the document parsers and planners of the process"""
+
+
+def count_pages(
+    paths: Sequence[Path],
+    max_workers: int | None = None,
+) -> dict[Path, int | None]:
+    """
+    Counts the pages of all files without instantiating parsers, using a
+    process pool for larger numbers of files.
+    """
+
+    if len(paths) < 2 * _MIN_FILES_PER_PAGE_COUNTING_WORKER or max_workers == 1:
+        return {path: _count_pages(path) for path in paths}
+
+    chunksize = max(_MIN_FILES_PER_PAGE_COUNTING_WORKER, len(paths) // 256)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        n_pages = executor.map(_count_pages, paths, chunksize=chunksize)
+
+        return dict(zip(paths, n_pages, strict=True))
+
+
+def _get_parser_cls(extension: str) -> type[FileParser] | None:
+    import_path = EXTENSION_TO_PARSER.get(extension)
+    if import_path is None:
+        return
+
+    return _import_parser_cls(import_path)
+
+
+@cache
+def _import_parser_cls(import_path: str) -> type[FileParser]:
+    module_name, cls_name = import_path.rsplit(".", 1)
+
+    return getattr(importlib.import_module(module_name), cls_name)
+
+
+def _count_pages(path: Path) -> int | None:
+    page_counter = EXTENSION_TO_PAGE_COUNTER.get(path.suffix.strip(".").lower())
+    if page_counter is None:
+        return
+
+    return page_counter(path)
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Collection, Iterable
 from pathlib import Path
 
 from theia_parse.llm import get_llm
-from theia_parse.llm.__spi__ import LlmApiEnvSettings, LlmApiSettings
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.llm.spend_limit import SpendLimit, SpendLimitedLLM
+from theia_parse.llm.usage_estimator import UsageEstimator
 from theia_parse.model import DocumentPage, ParsedDocument
 from theia_parse.parser.__spi__ import (
     DEFAULT_DOCUMENT_PARSER_CONFIG,
@@ -16,24 +18,54 @@ class FileParser(ABC):
         self,
         llm_api_settings: LlmApiSettings | None = None,
         config: DocumentParserConfig = DEFAULT_DOCUMENT_PARSER_CONFIG,
+        spend_limit: SpendLimit | None = None,
     ) -> None:
         if llm_api_settings is None:
+            from theia_parse.llm.env_settings import LlmApiEnvSettings
+
             llm_api_settings = LlmApiEnvSettings().to_settings()
+        self._usage_estimator = UsageEstimator(
+            llm_api_settings.model, config.usage_estimation_config, config.price_table
+        )
         self._llm = get_llm(llm_api_settings)
+        if spend_limit is not None:
+            self._llm = SpendLimitedLLM(self._llm, spend_limit, self._usage_estimator)
         self._config = config
 
     @abstractmethod
-    def parse(self, path: Path) -> ParsedDocument:
+    def parse(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
         pass
 
     @abstractmethod
-    def parse_paged(self, path: Path) -> Iterable[DocumentPage]:
+    def parse_paged(
+        self,
+        path: Path,
+        page_numbers: Collection[int] | None = None,
+        context_pages: Iterable[DocumentPage] | None = None,
+    ) -> Iterable[DocumentPage]:
+        """
+        Parses the given (1-based) page numbers or all pages not contained in
+        the context pages. Already parsed context pages are not parsed again,
+        but provide the context (e.g. previous headings) for following pages.
+        """
         pass
 
     @abstractmethod
-    def parse_hull(self, path: Path) -> ParsedDocument:
+    def parse_hull(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        """
+        Returns the document without content. The md5 sum is computed if not given.
+        """
         pass
 
     @abstractmethod
-    def get_number_of_pages(self, path: Path) -> int:
+    def plan(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        """
+        Dry run: estimates the LLM usage of parsing the document without calling
+        the LLM. The pages of the returned document only contain the estimated
+        usage, see UsageEstimationConfig.
+        """
         pass
+
+    @abstractmethod
+    def get_number_of_pages(self, path: Path) -> int | None:
+        """Returns None if the pages of the file cannot be counted."""
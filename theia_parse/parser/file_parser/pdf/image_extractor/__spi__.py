@@ -1,12 +1,18 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 from pathlib import Path
 
 from pdfplumber.page import Page
+from PIL.Image import Image
+from pydantic import BaseModel
 
 from theia_parse.parser.__spi__ import ImageExtractionConfig
 from theia_parse.parser.file_parser.pdf.embedded_pdf_page_image import (
     EmbeddedPdfPageImage,
 )
+from theia_parse.types import BBox
 
 
 class ImageExtractor(ABC):
@@ -16,3 +22,41 @@ class ImageExtractor(ABC):
     @abstractmethod
     def extract(self, path: Path, page: Page) -> list[EmbeddedPdfPageImage]:
         pass
+
+
+class DetectionParameters(BaseModel):
+    confidence_threshold: float
+    iou_threshold: float
+    containment_threshold: float
+
+    @staticmethod
+    def create(config: ImageExtractionConfig) -> DetectionParameters:
+        return DetectionParameters(
+            confidence_threshold=config.yodocus_confidence_threshold,
+            iou_threshold=config.yodocus_iou_threshold,
+            containment_threshold=config.yodocus_postprocessor_containment_threshold,
+        )
+
+
+class PageDetector(ABC):
+    """Detects the pictures of a rendered page, safe for concurrent use."""
+
+    @property
+    @abstractmethod
+    def input_width(self) -> int:
+        pass
+
+    @property
+    @abstractmethod
+    def input_height(self) -> int:
+        pass
+
+    @abstractmethod
+    def detect(self, image: Image, parameters: DetectionParameters) -> list[BBox]:
+        """Returns the postprocessed boxes in pixels of the image."""
+
+    def detect_batch(
+        self,
+        requests: Sequence[tuple[Image, DetectionParameters]],
+    ) -> list[list[BBox]]:
+        return [self.detect(image, parameters) for image, parameters in requests]
@@ -0,0 +1,409 @@
+"""
+Shared detection service: one process loads the yodocus model and detects the
+pictures of page bitmaps sent by the parser processes of a host over a Unix
+socket, see ImageExtractionConfig.yodocus_service_socket.
+
+    python -m theia_parse.parser.file_parser.pdf.image_extractor.detection_service \
+        --socket /run/theia-parse/detection.sock
+
+Requests of all connections are queued and passed in batches of up to
+max_batch_size to a single inference thread, which waits at most
+max_wait_seconds for a batch to fill. Requests not detected within
+request_timeout_seconds fail.
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from concurrent.futures import Future
+from contextlib import suppress
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Any
+
+from PIL import Image as PilImage
+from PIL.Image import Image
+
+from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import (
+    DetectionParameters,
+    PageDetector,
+)
+from theia_parse.types import BBox
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+_PREFIX = struct.Struct("!II")
+"""Lengths of the JSON header and of the payload of a message"""
+
+type _Request = tuple[Image, DetectionParameters, Future[list[BBox]]]
+
+
+class DetectionServiceError(Exception):
+    pass
+
+
+class DetectionClient(PageDetector):
+    """
+    Detects with a detection service. Each thread keeps its own connection,
+    which is reopened once if the service was restarted.
+    """
+
+    def __init__(self, socket_path: str | Path, timeout: float = 60.0) -> None:
+        self._socket_path = str(socket_path)
+        self._timeout = timeout
+        self._local = threading.local()
+        self._info: dict[str, Any] | None = None
+
+    @property
+    def input_width(self) -> int:
+        return self._get_info()["input_width"]
+
+    @property
+    def input_height(self) -> int:
+        return self._get_info()["input_height"]
+
+    def detect(self, image: Image, parameters: DetectionParameters) -> list[BBox]:
+        header = {
+            "type": "detect",
+            "mode": image.mode,
+            "width": image.width,
+            "height": image.height,
+            "parameters": parameters.model_dump(),
+        }
+        response = self._request(header, image.tobytes())
+
+        return [tuple(box) for box in response["boxes"]]
+
+    def close(self) -> None:
+        connection: socket.socket | None = self._local.__dict__.pop("connection", None)
+        if connection is not None:
+            connection.close()
+
+    def _get_info(self) -> dict[str, Any]:
+        if self._info is None:
+            self._info = self._request({"type": "info"})
+
+        return self._info
+
+    def _request(self, header: dict[str, Any], payload: bytes = b"") -> dict[str, Any]:
+        for attempt in range(2):
+            try:
+                connection = self._get_connection()
+                _send(connection, header, payload)
+                message = _receive(connection)
+                if message is None:
+                    raise ConnectionResetError(
+                        "Detection service closed the connection"
+                    )
+                break
+            except OSError as e:
+                self.close()
+                if attempt == 1:
+                    raise DetectionServiceError(
+                        "Detection service not available "
+                        f"[socket='{self._socket_path}', error='{e}']"
+                    ) from e
+
+        response, _ = message
+        if "error" in response:
+            raise DetectionServiceError(response["error"])
+
+        return response
+
+    def _get_connection(self) -> socket.socket:
+        connection: socket.socket | None = self._local.__dict__.get("connection")
+        if connection is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self._timeout)
+            connection.connect(self._socket_path)
+            self._local.connection = connection
+
+        return connection
+
+
+class DetectionServer:
+    """Serves the detections of a page detector, see the module documentation."""
+
+    def __init__(
+        self,
+        socket_path: str | Path,
+        detector: PageDetector,
+        max_batch_size: int = 16,
+        max_wait_seconds: float = 0.005,
+        request_timeout_seconds: float = 30.0,
+    ) -> None:
+        self._socket_path = Path(socket_path)
+        self._detector = detector
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_seconds = max_wait_seconds
+        self._request_timeout_seconds = request_timeout_seconds
+        self._queue: Queue[_Request] = Queue()
+        self._stopped = threading.Event()
+        self._n_batches = 0
+        self._n_requests = 0
+        self._server: socketserver.ThreadingUnixStreamServer | None = None
+
+    @property
+    def n_batches(self) -> int:
+        return self._n_batches
+
+    @property
+    def n_requests(self) -> int:
+        return self._n_requests
+
+    def serve_forever(self) -> None:
+        """Serves until shutdown is called, removes the socket afterwards."""
+
+        self._remove_stale_socket()
+        self._socket_path.parent.mkdir(parents=True, exist_ok=True)
+        server = _UnixServer(str(self._socket_path), _Handler)
+        server.detection_server = self
+        self._server = server
+        inference = threading.Thread(
+            target=self._run_inference, name="detection-inference", daemon=True
+        )
+        inference.start()
+        _log.info(
+            "Detection service started [socket='{0}', max_batch_size={1}]",
+            self._socket_path,
+            self._max_batch_size,
+        )
+        try:
+            server.serve_forever()
+        finally:
+            self._stopped.set()
+            server.server_close()
+            inference.join()
+            self._socket_path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+    def get_info(self) -> dict[str, Any]:
+        return {
+            "input_width": self._detector.input_width,
+            "input_height": self._detector.input_height,
+        }
+
+    def submit(
+        self,
+        image: Image,
+        parameters: DetectionParameters,
+    ) -> Future[list[BBox]]:
+        if self._stopped.is_set():
+            raise DetectionServiceError("Detection service stopped")
+
+        future: Future[list[BBox]] = Future()
+        self._queue.put((image, parameters, future))
+
+        return future
+
+    def detect(self, image: Image, parameters: DetectionParameters) -> list[BBox]:
+        """Submits the request and waits at most request_timeout_seconds."""
+
+        future = self.submit(image, parameters)
+        try:
+            return future.result(timeout=self._request_timeout_seconds)
+        except TimeoutError as e:
+            future.cancel()
+            raise DetectionServiceError(
+                f"Detection timed out [seconds={self._request_timeout_seconds}]"
+            ) from e
+
+    def _run_inference(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except Empty:
+                continue
+
+            deadline = time.monotonic() + self._max_wait_seconds
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, remaining)))
+                except Empty:
+                    break
+
+            try:
+                self._detect_batch(batch)
+            except Exception as e:
+                # e.g. a wrong number of results, the thread must survive
+                _log.error(
+                    "Could not detect batch [size={0}, error='{1}']", len(batch), e
+                )
+                _fail(batch, e)
+            self._n_batches += 1
+            self._n_requests += len(batch)
+
+        pending: list[_Request] = []
+        with suppress(Empty):
+            while True:
+                pending.append(self._queue.get_nowait())
+        _fail(pending, DetectionServiceError("Detection service stopped"))
+
+    def _detect_batch(self, batch: list[_Request]) -> None:
+        """
+        Detects the batch at once, falls back to detecting request by request
+        if the batch fails, so a bad request only fails itself.
+        """
+
+        batch = [r for r in batch if r[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self._detector.detect_batch(
+                [(image, parameters) for image, parameters, _ in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            _log.warning(
+                "Could not detect batch, detecting requests one by one "
+                "[size={0}, error='{1}']",
+                len(batch),
+                e,
+            )
+            for image, parameters, future in batch:
+                try:
+                    future.set_result(self._detector.detect(image, parameters))
+                except Exception as request_error:
+                    future.set_exception(request_error)
+        else:
+            for (_, _, future), boxes in zip(batch, results, strict=True):
+                future.set_result(boxes)
+
+    def _remove_stale_socket(self) -> None:
+        if not self._socket_path.exists():
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(self._socket_path))
+            except OSError:
+                self._socket_path.unlink()
+                return
+
+        raise DetectionServiceError(
+            f"Detection service already running [socket='{self._socket_path}']"
+        )
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    detection_server: DetectionServer
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: _UnixServer
+
+    def handle(self) -> None:
+        detection_server = self.server.detection_server
+        while (message := _receive(self.request)) is not None:
+            header, payload = message
+            try:
+                if header.get("type") == "info":
+                    response = detection_server.get_info()
+                else:
+                    image = PilImage.frombytes(
+                        header["mode"], (header["width"], header["height"]), payload
+                    )
+                    parameters = DetectionParameters(**header["parameters"])
+                    response = {"boxes": detection_server.detect(image, parameters)}
+            except Exception as e:
+                _log.error("Could not detect [error='{0}']", e)
+                response = {"error": str(e)}
+            _send(self.request, response)
+
+
+def _fail(requests: list[_Request], error: Exception) -> None:
+    for _, _, future in requests:
+        if not future.done():
+            future.set_exception(error)
+
+
+def _send(
+    connection: socket.socket, header: dict[str, Any], payload: bytes = b""
+) -> None:
+    data = json.dumps(header).encode("utf-8")
+    connection.sendall(_PREFIX.pack(len(data), len(payload)) + data)
+    if payload:
+        connection.sendall(payload)
+
+
+def _receive(connection: socket.socket) -> tuple[dict[str, Any], bytes] | None:
+    """Returns None if the connection was closed between messages."""
+
+    prefix = _receive_exactly(connection, _PREFIX.size, allow_eof=True)
+    if prefix is None:
+        return
+
+    header_length, payload_length = _PREFIX.unpack(prefix)
+    header = json.loads(_receive_exactly(connection, header_length) or b"")
+    payload = _receive_exactly(connection, payload_length) or b""
+
+    return header, payload
+
+
+def _receive_exactly(
+    connection: socket.socket,
+    n_bytes: int,
+    allow_eof: bool = False,
+) -> bytes | None:
+    data = bytearray(n_bytes)
+    view = memoryview(data)
+    received = 0
+    while received < n_bytes:
+        n = connection.recv_into(view[received:])
+        if n == 0:
+            if allow_eof and received == 0:
+                return
+            raise ConnectionResetError("Connection closed within a message")
+        received += n
+
+    return bytes(data)
+
+
+def main() -> int:
+    from theia_parse.parser.__spi__ import ImageExtractionConfig
+    from theia_parse.parser.file_parser.pdf.image_extractor.yodocus_image_extractor import (
+        YodocusDetector,
+    )
+
+    parser = ArgumentParser(description="Shared yodocus detection service")
+    parser.add_argument("--socket", required=True, help="Path of the Unix socket")
+    parser.add_argument(
+        "--model", default=ImageExtractionConfig().yodocus_model, help="yodocus model"
+    )
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Seconds")
+    args = parser.parse_args()
+
+    server = DetectionServer(
+        args.socket,
+        YodocusDetector(args.model),
+        args.max_batch_size,
+        args.max_wait_ms / 1000,
+        args.request_timeout,
+    )
+    with suppress(KeyboardInterrupt):
+        server.serve_forever()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
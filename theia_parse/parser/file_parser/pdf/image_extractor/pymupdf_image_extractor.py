@@ -10,6 +10,7 @@ from theia_parse.parser.file_parser.pdf.embedded_pdf_page_image import (
     EmbeddedPdfPageImage,
 )
 from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import ImageExtractor
+from theia_parse.util.instrumentation import stage
 from theia_parse.util.log import LogFactory
 
 
@@ -23,13 +24,14 @@ class PymupdfImageExtractor(ImageExtractor):
 
         with TemporaryDirectory() as temp_dir:
             # TODO: use markdown
-            pymupdf4llm.to_markdown(
-                path,
-                pages=[page.page_number - 1],  # pdfplumber 1-based, pymupdf 0-based
-                write_images=True,
-                image_path=temp_dir,
-                table_strategy="",
-            )
+            with stage("pymupdf-extract"):
+                pymupdf4llm.to_markdown(
+                    path,
+                    pages=[page.page_number - 1],  # pdfplumber 1-based, pymupdf 0-based
+                    write_images=True,
+                    image_path=temp_dir,
+                    table_strategy="",
+                )
 
             for filename in os.listdir(temp_dir):
                 image_path = os.path.join(temp_dir, filename)
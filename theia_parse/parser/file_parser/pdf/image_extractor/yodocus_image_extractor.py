@@ -1,70 +1,126 @@
+from __future__ import annotations
+
 from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING
 
 from pdfplumber.page import Page
-from yodocus import (
-    DetectionConfig,
-    Detector,
-    HeuristicPostprocessor,
-    PostprocessorConfig,
-)
+from PIL.Image import Image
 
 from theia_parse.parser.__spi__ import ImageExtractionConfig
 from theia_parse.parser.file_parser.pdf.embedded_pdf_page_image import (
     EmbeddedPdfPageImage,
 )
-from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import ImageExtractor
+from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import (
+    DetectionParameters,
+    ImageExtractor,
+    PageDetector,
+)
 from theia_parse.types import BBox
 from theia_parse.util.bbox import clamp
+from theia_parse.util.instrumentation import stage
+
+
+if TYPE_CHECKING:
+    from yodocus import HeuristicPostprocessor
+
+
+_detectors: dict[str, PageDetector] = {}
+"""Loaded models and service clients, shared by all extractors of the process"""
+_detectors_lock = Lock()
+
+
+class YodocusDetector(PageDetector):
+    """Detects with a yodocus model loaded in this process."""
+
+    def __init__(self, model: str) -> None:
+        from yodocus import Detector
+
+        self._detector = Detector(model)
+        self._processors: dict[float, HeuristicPostprocessor] = {}
+
+    @property
+    def input_width(self) -> int:
+        return self._detector.input_width
+
+    @property
+    def input_height(self) -> int:
+        return self._detector.input_height
+
+    def detect(self, image: Image, parameters: DetectionParameters) -> list[BBox]:
+        from yodocus import DetectionConfig
+
+        result = self._detector.detect(
+            image,
+            DetectionConfig(
+                confidence_threshold=parameters.confidence_threshold,
+                iou_threshold=parameters.iou_threshold,
+                visualize=False,
+            ),
+        )
+        result = self._get_processor(parameters.containment_threshold).process(
+            result, original_image=None
+        )
+
+        return [
+            (float(box.x0), float(box.y0), float(box.x1), float(box.y1))
+            for box in result.boxes
+        ]
+
+    def _get_processor(self, containment_threshold: float) -> HeuristicPostprocessor:
+        if containment_threshold not in self._processors:
+            from yodocus import HeuristicPostprocessor, PostprocessorConfig
+
+            self._processors[containment_threshold] = HeuristicPostprocessor(
+                config=PostprocessorConfig(containment_threshold=containment_threshold)
+            )
+
+        return self._processors[containment_threshold]
 
 
 class YodocusImageExtractor(ImageExtractor):
     def __init__(self, config: ImageExtractionConfig) -> None:
         super().__init__(config)
-        self._detector = Detector(config.yodocus_model)
-        self._yodocus_config = DetectionConfig(
-            confidence_threshold=config.yodocus_confidence_threshold,
-            iou_threshold=config.yodocus_iou_threshold,
-            visualize=False,
-        )
-        self._processor = HeuristicPostprocessor(
-            config=PostprocessorConfig(
-                containment_threshold=config.yodocus_postprocessor_containment_threshold
-            )
-        )
+        self._detector: PageDetector | None = None
+        """Loaded on the first page which needs it"""
+        self._parameters = DetectionParameters.create(config)
 
     def extract(self, path: Path, page: Page) -> list[EmbeddedPdfPageImage]:
+        detector = self._get_detector()
         page_width, page_height = page.width, page.height
-        if page_height < page_width and page_height < self._detector.input_height:
-            input_image = page.to_image(height=self._detector.input_height)
-            scale = self._detector.input_height / page_height
-        elif page_width < self._detector.input_width:
-            input_image = page.to_image(width=self._detector.input_width)
-            scale = self._detector.input_width / page_width
-        else:
-            input_image = page.to_image()
-            scale = 1
-
-        result = self._detector.detect(input_image.original, self._yodocus_config)
-        result = self._processor.process(result, original_image=None)
+        with stage("yodocus-render"):
+            if page_height < page_width and page_height < detector.input_height:
+                input_image = page.to_image(height=detector.input_height)
+                scale = detector.input_height / page_height
+            elif page_width < detector.input_width:
+                input_image = page.to_image(width=detector.input_width)
+                scale = detector.input_width / page_width
+            else:
+                input_image = page.to_image()
+                scale = 1
+
+        with stage("yodocus-detect"):
+            boxes = detector.detect(input_image.original, self._parameters)
 
         embedded_images: list[EmbeddedPdfPageImage] = []
         embedded_images_bboxes: set[BBox] = set()
         caption_idx = 1
-        for box in result.boxes:
-            x0 = box.x0 / scale - self._config.yodocus_additional_margin
-            top = box.y0 / scale - self._config.yodocus_additional_margin
-            x1 = box.x1 / scale + self._config.yodocus_additional_margin
-            bottom = box.y1 / scale + self._config.yodocus_additional_margin
+        for box_x0, box_y0, box_x1, box_y1 in boxes:
+            x0 = box_x0 / scale - self._config.yodocus_additional_margin
+            top = box_y0 / scale - self._config.yodocus_additional_margin
+            x1 = box_x1 / scale + self._config.yodocus_additional_margin
+            bottom = box_y1 / scale + self._config.yodocus_additional_margin
             bbox = clamp((x0, top, x1, bottom), width=page_width, height=page_height)
 
             if bbox in embedded_images_bboxes:
                 continue
 
-            raw_image = (
-                page.crop(bbox, relative=True, strict=False)
-                .to_image(self._config.resolution)
-                .original
-            )
+            with stage("yodocus-crop"):
+                raw_image = (
+                    page.crop(bbox, relative=True, strict=False)
+                    .to_image(self._config.resolution)
+                    .original
+                )
             img = EmbeddedPdfPageImage(
                 page=page,
                 raw_image=raw_image,
@@ -83,3 +139,24 @@ class YodocusImageExtractor(ImageExtractor):
             ei.caption_idx = caption_idx
 
         return embedded_images
+
+    def _get_detector(self) -> PageDetector:
+        if self._detector is not None:
+            return self._detector
+
+        socket_path = self._config.yodocus_service_socket
+        with _detectors_lock:
+            key = socket_path or self._config.yodocus_model
+            if key not in _detectors:
+                if socket_path is not None:
+                    from theia_parse.parser.file_parser.pdf.image_extractor.detection_service import (
+                        DetectionClient,
+                    )
+
+                    _detectors[key] = DetectionClient(socket_path)
+                else:
+                    with stage("yodocus-load"):
+                        _detectors[key] = YodocusDetector(self._config.yodocus_model)
+            self._detector = _detectors[key]
+
+        return self._detector
@@ -0,0 +1,357 @@
+"""
+Lightweight PDF page counting, which only reads the cross-reference data, the
+document catalog and the root of the page tree instead of parsing the document.
+"""
+
+import mmap
+import re
+import zlib
+from pathlib import Path
+
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+_TAIL_SIZE = 4096
+_MAX_XREF_SECTIONS = 64
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_XREF_SUBSECTION = re.compile(rb"(\d+)\s+(\d+)\s*[\r\n]")
+_XREF_ENTRY = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+_OBJ_HEADER = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_ROOT = re.compile(rb"/Root\s+(\d+)\s+(\d+)\s+R")
+_PAGES = re.compile(rb"/Pages\s+(\d+)\s+(\d+)\s+R")
+_COUNT = re.compile(rb"/Count\s+(\d+)(?![\d\s]*R)")
+_COUNT_REF = re.compile(rb"/Count\s+(\d+)\s+\d+\s+R")
+_INT = re.compile(rb"\s*(\d+)\s*")
+_PREV = re.compile(rb"/Prev\s+(\d+)")
+_XREF_STM = re.compile(rb"/XRefStm\s+(\d+)")
+_INT_TEMPLATE = rb"/%s\s+(\d+)"
+_ARRAY_TEMPLATE = rb"/%s\s*\[([\d\s]*)\]"
+_PREDICTOR = re.compile(rb"/Predictor\s+(\d+)")
+_COLUMNS = re.compile(rb"/Columns\s+(\d+)")
+
+
+class PdfPageCountError(Exception):
+    pass
+
+
+def count_pdf_pages(path: Path) -> int | None:
+    """
+    Returns the number of pages from the /Count entry of the page tree root
+    or None if it could not be determined without fully parsing the file.
+    """
+
+    try:
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            return _PdfTrailerReader(data).count_pages()
+    except (OSError, ValueError, PdfPageCountError, zlib.error) as e:
+        _log.debug("Fast page count failed [path='{0}', error='{1}']", path, e)
+
+    return
+
+
+def count_pdf_pages_with_fallback(path: Path) -> int | None:
+    """
+    Counts pages with the lightweight reader and falls back to pdfplumber for
+    files it cannot handle (e.g. broken cross-reference data).
+    """
+
+    n_pages = count_pdf_pages(path)
+    if n_pages is not None:
+        return n_pages
+
+    import pdfplumber
+
+    try:
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        _log.error("Could not open pdf [path='{0}']", path)
+
+    return
+
+
+class _PdfTrailerReader:
+    def __init__(self, data: mmap.mmap) -> None:
+        self._data = data
+        # object number -> byte offset or (object stream number, index)
+        self._xref: dict[int, int | tuple[int, int]] = {}
+        self._root: tuple[int, int] | None = None
+        self._object_streams: dict[int, tuple[bytes, list[int]]] = {}
+
+    def count_pages(self) -> int:
+        self._read_xref_sections()
+        if self._root is None:
+            raise PdfPageCountError("No /Root in trailer")
+
+        catalog = self._get_object(self._root[0])
+        pages_ref = _PAGES.search(catalog)
+        if pages_ref is None:
+            raise PdfPageCountError("No /Pages in catalog")
+
+        pages = _strip_nested_dicts(self._get_object(int(pages_ref.group(1))))
+        if count := _COUNT.search(pages):
+            return int(count.group(1))
+
+        if count_ref := _COUNT_REF.search(pages):
+            count = _INT.fullmatch(self._get_object(int(count_ref.group(1))))
+            if count is None:
+                raise PdfPageCountError("Invalid indirect /Count")
+
+            return int(count.group(1))
+
+        raise PdfPageCountError("No /Count in page tree root")
+
+    def _read_xref_sections(self) -> None:
+        tail_start = max(0, len(self._data) - _TAIL_SIZE)
+        matches = list(_STARTXREF.finditer(self._data, tail_start))
+        if not matches:
+            raise PdfPageCountError("No startxref")
+
+        pending = [int(matches[-1].group(1))]
+        visited: set[int] = set()
+        while pending and len(visited) < _MAX_XREF_SECTIONS:
+            offset = pending.pop(0)
+            if offset in visited or offset >= len(self._data):
+                continue
+            visited.add(offset)
+
+            if self._data[offset : offset + 4] == b"xref":
+                trailer = self._read_xref_table(offset)
+            else:
+                trailer = self._read_xref_stream(offset)
+
+            if self._root is None and (root := _ROOT.search(trailer)):
+                self._root = int(root.group(1)), int(root.group(2))
+            # entries of a hybrid file's xref stream take precedence over /Prev
+            if xref_stm := _XREF_STM.search(trailer):
+                pending.insert(0, int(xref_stm.group(1)))
+            if prev := _PREV.search(trailer):
+                pending.append(int(prev.group(1)))
+
+    def _read_xref_table(self, offset: int) -> bytes:
+        trailer_pos = self._data.find(b"trailer", offset)
+        if trailer_pos < 0:
+            raise PdfPageCountError("No trailer")
+
+        pos = offset + 4
+        while (
+            subsection := _XREF_SUBSECTION.match(self._data, _skip_ws(self._data, pos))
+        ) and (subsection.start() < trailer_pos):
+            start, count = int(subsection.group(1)), int(subsection.group(2))
+            pos = subsection.end()
+            for obj_num in range(start, start + count):
+                entry = _XREF_ENTRY.match(self._data, _skip_ws(self._data, pos))
+                if entry is None:
+                    raise PdfPageCountError("Invalid xref entry")
+                pos = entry.end()
+                if entry.group(3) == b"n":
+                    self._xref.setdefault(obj_num, int(entry.group(1)))
+
+        end = self._data.find(b"startxref", trailer_pos)
+
+        return bytes(self._data[trailer_pos : end if end > 0 else None])
+
+    def _read_xref_stream(self, offset: int) -> bytes:
+        header = _OBJ_HEADER.match(self._data, _skip_ws(self._data, offset))
+        if header is None:
+            raise PdfPageCountError("Invalid startxref offset")
+
+        dictionary, stream = self._read_stream_object(header.end())
+        widths = [int(w) for w in _get_array(dictionary, b"W")]
+        size = _get_int(dictionary, b"Size")
+        if len(widths) != 3 or size is None:
+            raise PdfPageCountError("Invalid xref stream")
+
+        index = [int(i) for i in _get_array(dictionary, b"Index")] or [0, size]
+        row_size = sum(widths)
+        pos = 0
+        for start, count in zip(index[::2], index[1::2], strict=True):
+            for obj_num in range(start, start + count):
+                row = stream[pos : pos + row_size]
+                pos += row_size
+                if len(row) < row_size:
+                    raise PdfPageCountError("Truncated xref stream")
+                fields = _split_fields(row, widths)
+                entry_type = fields[0] if widths[0] else 1
+                if entry_type == 1:
+                    self._xref.setdefault(obj_num, fields[1])
+                elif entry_type == 2:
+                    self._xref.setdefault(obj_num, (fields[1], fields[2]))
+
+        return dictionary
+
+    def _get_object(self, obj_num: int) -> bytes:
+        location = self._xref.get(obj_num)
+        if isinstance(location, tuple):
+            return self._get_compressed_object(*location)
+        if location is not None:
+            header = _OBJ_HEADER.match(self._data, _skip_ws(self._data, location))
+            if header is not None and int(header.group(1)) == obj_num:
+                return self._read_object_body(header.end())
+
+        # damaged or missing offset, search the object header instead
+        header = re.compile(rb"(?<!\d)%d\s+0\s+obj\b" % obj_num).search(self._data)
+        if header is None:
+            raise PdfPageCountError(f"Object {obj_num} not found")
+
+        return self._read_object_body(header.end())
+
+    def _get_compressed_object(self, stream_num: int, index: int) -> bytes:
+        if stream_num not in self._object_streams:
+            location = self._xref.get(stream_num)
+            if not isinstance(location, int):
+                raise PdfPageCountError("Object stream not found")
+            header = _OBJ_HEADER.match(self._data, _skip_ws(self._data, location))
+            if header is None:
+                raise PdfPageCountError("Invalid object stream offset")
+            dictionary, stream = self._read_stream_object(header.end())
+            n = _get_int(dictionary, b"N")
+            first = _get_int(dictionary, b"First")
+            if n is None or first is None:
+                raise PdfPageCountError("Invalid object stream")
+            offsets = [int(v) for v in stream[:first].split()[1 : 2 * n : 2]]
+            self._object_streams[stream_num] = (stream[first:], offsets)
+
+        objects, offsets = self._object_streams[stream_num]
+        if index >= len(offsets):
+            raise PdfPageCountError("Invalid object stream index")
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(objects)
+
+        return objects[offsets[index] : end]
+
+    def _read_object_body(self, start: int) -> bytes:
+        end = self._data.find(b"endobj", start)
+        if end < 0:
+            raise PdfPageCountError("Unterminated object")
+
+        return bytes(self._data[start:end])
+
+    def _read_stream_object(self, start: int) -> tuple[bytes, bytes]:
+        stream_pos = self._data.find(b"stream", start)
+        end = self._data.find(b"endstream", stream_pos)
+        if stream_pos < 0 or end < 0:
+            raise PdfPageCountError("Invalid stream object")
+
+        dictionary = bytes(self._data[start:stream_pos])
+        data_start = stream_pos + len(b"stream")
+        if self._data[data_start : data_start + 2] == b"\r\n":
+            data_start += 2
+        elif self._data[data_start : data_start + 1] in (b"\n", b"\r"):
+            data_start += 1
+        raw = bytes(self._data[data_start:end])
+
+        if b"/FlateDecode" in dictionary:
+            raw = zlib.decompressobj().decompress(raw)
+        elif b"/Filter" in dictionary:
+            raise PdfPageCountError("Unsupported stream filter")
+
+        predictor = _PREDICTOR.search(dictionary)
+        if predictor is not None and int(predictor.group(1)) >= 10:
+            columns = _COLUMNS.search(dictionary)
+            raw = _undo_png_predictor(raw, int(columns.group(1)) if columns else 1)
+
+        return dictionary, raw
+
+
+def _skip_ws(data: mmap.mmap | bytes, pos: int) -> int:
+    while pos < len(data) and data[pos : pos + 1] in (b" ", b"\r", b"\n", b"\t", b"\f"):
+        pos += 1
+
+    return pos
+
+
+def _get_int(dictionary: bytes, key: bytes) -> int | None:
+    match = re.search(_INT_TEMPLATE % key, dictionary)
+
+    return int(match.group(1)) if match else None
+
+
+def _get_array(dictionary: bytes, key: bytes) -> list[bytes]:
+    match = re.search(_ARRAY_TEMPLATE % key, dictionary)
+
+    return match.group(1).split() if match else []
+
+
+def _split_fields(row: bytes, widths: list[int]) -> list[int]:
+    fields = []
+    pos = 0
+    for width in widths:
+        fields.append(int.from_bytes(row[pos : pos + width], "big"))
+        pos += width
+
+    return fields
+
+
+def _strip_nested_dicts(obj: bytes) -> bytes:
+    """Removes nested dictionaries, so only keys of the outer dictionary remain."""
+
+    start = obj.find(b"<<")
+    if start < 0:
+        return obj
+
+    out = bytearray()
+    depth = 0
+    pos = start
+    while pos < len(obj):
+        if obj.startswith(b"<<", pos):
+            depth += 1
+            pos += 2
+            continue
+        if obj.startswith(b">>", pos):
+            depth -= 1
+            pos += 2
+            if depth == 0:
+                break
+            continue
+        if depth == 1:
+            out.append(obj[pos])
+        pos += 1
+
+    return bytes(out)
+
+
+def _undo_png_predictor(data: bytes, columns: int) -> bytes:
+    row_size = columns + 1
+    previous = bytearray(columns)
+    out = bytearray()
+    for row_start in range(0, len(data) - columns, row_size):
+        filter_type = data[row_start]
+        row = bytearray(data[row_start + 1 : row_start + row_size])
+        for i in range(len(row)):
+            left = row[i - 1] if i > 0 else 0
+            up = previous[i]
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif filter_type == 4:
+                up_left = previous[i - 1] if i > 0 else 0
+                row[i] = (row[i] + _paeth(left, up, up_left)) & 0xFF
+        out.extend(row)
+        previous = row
+
+    return bytes(out)
+
+
+def _paeth(left: int, up: int, up_left: int) -> int:
+    estimate = left + up - up_left
+    d_left, d_up, d_up_left = (
+        abs(estimate - left),
+        abs(estimate - up),
+        abs(estimate - up_left),
+    )
+    if d_left <= d_up and d_left <= d_up_left:
+        return left
+    if d_up <= d_up_left:
+        return up
+
+    return up_left
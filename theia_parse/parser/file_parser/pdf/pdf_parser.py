@@ -1,14 +1,16 @@
-from collections import deque
-from collections.abc import Iterable
+import time
+from collections import Counter, deque
+from collections.abc import Collection, Iterable
 from pathlib import Path
 from typing import Any
 
-import pdf2image
 import pdfplumber
 from pdfplumber.page import Page as PdfPage
 
+from theia_parse.const import PDF_POINTS_PER_INCH
 from theia_parse.llm.__spi__ import (
     LlmApiSettings,
+    LlmError,
     LlmMedium,
     LlmResponse,
     Prompt,
@@ -22,23 +24,40 @@ from theia_parse.llm.prompt_templates import (
     PDF_USER_PARSE_RAW,
 )
 from theia_parse.llm.response_parser.json_parser import JsonParser
+from theia_parse.llm.spend_limit import SpendLimit
+from theia_parse.llm.usage_estimator import ImageSpec
 from theia_parse.model import (
     ContentElement,
     DocumentPage,
+    ErrorType,
     HeadingElement,
     ImageElement,
     LlmUsage,
     Medium,
+    PageQuality,
     ParsedDocument,
     RawContentElement,
+    RawImprovedPageContent,
+    RawPageContent,
+    add_stage_usage,
+)
+from theia_parse.parser.__spi__ import (
+    DEFAULT_DOCUMENT_PARSER_CONFIG,
+    DocumentParserConfig,
 )
-from theia_parse.parser.__spi__ import DocumentParserConfig
 from theia_parse.parser.file_parser.__spi__ import FileParser
 from theia_parse.parser.file_parser.pdf.embedded_pdf_page_image import (
     EmbeddedPdfPageImage,
 )
 from theia_parse.parser.file_parser.pdf.image_extractor.__spi__ import ImageExtractor
+from theia_parse.parser.file_parser.pdf.page_counter import (
+    count_pdf_pages_with_fallback,
+)
+from theia_parse.parser.page_validator import PageValidator
+from theia_parse.parser.retry_policy import RetryPolicy
+from theia_parse.types import UsageStage
 from theia_parse.util.files import get_md5_sum
+from theia_parse.util.instrumentation import span, stage
 from theia_parse.util.log import LogFactory
 
 
@@ -48,10 +67,11 @@ _log = LogFactory.get_logger()
 class PdfParser(FileParser):
     def __init__(
         self,
-        llm_api_settings: LlmApiSettings,
-        config: DocumentParserConfig,
+        llm_api_settings: LlmApiSettings | None = None,
+        config: DocumentParserConfig = DEFAULT_DOCUMENT_PARSER_CONFIG,
+        spend_limit: SpendLimit | None = None,
     ) -> None:
-        super().__init__(llm_api_settings, config)
+        super().__init__(llm_api_settings, config, spend_limit)
 
         self._system_prompt_extraction = Prompt(
             self._config.prompt_config.pdf_extract_content_system_prompt_template
@@ -74,6 +94,8 @@ class PdfParser(FileParser):
         )
 
         self._json_parser = JsonParser()
+        self._page_validator = PageValidator(self._config.post_improve_config)
+        self._retry_policy = RetryPolicy(self._config.retry_config)
         self._image_extractor: ImageExtractor
         if self._config.image_extraction_config.extract_images:
             if config.image_extraction_config.method == "yodocus":
@@ -93,29 +115,51 @@ class PdfParser(FileParser):
                     config.image_extraction_config
                 )
 
-    def parse(self, path: Path) -> ParsedDocument:
-        doc = self.parse_hull(path)
+    def parse(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        doc = self.parse_hull(path, md5_sum)
         doc.content = [page for page in self.parse_paged(path) if page is not None]
+        doc.update_usage()
 
         return doc
 
-    def parse_paged(self, path: Path) -> Iterable[DocumentPage]:
+    def parse_paged(
+        self,
+        path: Path,
+        page_numbers: Collection[int] | None = None,
+        context_pages: Iterable[DocumentPage] | None = None,
+    ) -> Iterable[DocumentPage]:
         headings: deque[HeadingElement] = deque(
             maxlen=self._config.prompt_config.consider_last_headings_n
         )
         parsed_pages: deque[DocumentPage] = deque(
             maxlen=self._config.prompt_config.consider_last_parsed_pages_n
         )
+        context = sorted(context_pages or [], key=lambda p: p.page_number)
+        context_page_numbers = {p.page_number for p in context}
+        n_fed = 0
 
-        with pdfplumber.open(path) as pdf:
+        # only requested pages are loaded, context pages are fed in page order
+        pages = sorted(page_numbers) if page_numbers is not None else None
+        with pdfplumber.open(path, pages=pages) as pdf:
             for page in pdf.pages:
-                parsed_page = self._parse_page(path, page, headings, parsed_pages)
-                if parsed_page is not None:
-                    headings.extend(parsed_page.get_headings())
-                    parsed_pages.append(parsed_page)
+                if pages is None and page.page_number in context_page_numbers:
+                    page.close()
+                    continue
+
+                while n_fed < len(context) and (
+                    context[n_fed].page_number < page.page_number
+                ):
+                    headings.extend(context[n_fed].get_headings())
+                    parsed_pages.append(context[n_fed])
+                    n_fed += 1
+
+                with stage("page", path=str(path), page_number=page.page_number):
+                    parsed_page = self._parse_page(path, page, headings, parsed_pages)
+                headings.extend(parsed_page.get_headings())
+                parsed_pages.append(parsed_page)
+                page.close()
 
                 yield parsed_page
-                page.close()
 
     def _parse_page(
         self,
@@ -126,10 +170,84 @@ class PdfParser(FileParser):
     ) -> DocumentPage:
         page_image, embedded_images = self._get_images(path, page)
 
-        usage = LlmUsage()
+        stage_usage: dict[UsageStage, LlmUsage] = {}
 
         raw_extracted_text, raw_usage = self._parse_raw(page, page_image)
-        usage += raw_usage
+        self._add_usage(stage_usage, "raw-parse", raw_usage)
+
+        attempts: Counter[ErrorType] = Counter()
+        while True:
+            try:
+                return self._parse_page_attempt(
+                    page=page,
+                    raw_extracted_text=raw_extracted_text,
+                    headings=headings,
+                    parsed_pages=parsed_pages,
+                    page_image=page_image,
+                    embedded_images=embedded_images,
+                    stage_usage=stage_usage,
+                )
+            except LlmError as e:
+                attempts[e.error_type] += 1
+                delay = self._retry_policy.get_delay(e, attempts[e.error_type])
+                if delay is None:
+                    _log.error(
+                        "Could not parse page [path='{0}', page_number={1}, "
+                        "error_type='{2}', attempts={3}]",
+                        path,
+                        page.page_number,
+                        e.error_type,
+                        attempts.total(),
+                    )
+                    return DocumentPage(
+                        page_number=page.page_number,
+                        content=[],
+                        media=[],
+                        raw_llm_response=e.raw,
+                        raw_extracted_text=raw_extracted_text,
+                        token_usage=sum(stage_usage.values(), LlmUsage()),
+                        stage_usage=stage_usage,
+                        error=True,
+                        error_type=e.error_type,
+                    )
+
+                _log.warning(
+                    "Retrying page [path='{0}', page_number={1}, error_type='{2}', "
+                    "attempt={3}, delay={4:.1f}s]",
+                    path,
+                    page.page_number,
+                    e.error_type,
+                    attempts[e.error_type],
+                    delay,
+                )
+                self._add_usage(stage_usage, "extraction", LlmUsage(n_retries=1))
+                if e.error_type == ErrorType.CONTEXT_LENGTH:
+                    # retry without the context of previous pages
+                    headings = deque()
+                    parsed_pages = deque()
+                with span(
+                    "retry-wait",
+                    "retry",
+                    page_number=page.page_number,
+                    error_type=e.error_type,
+                    attempt=attempts[e.error_type],
+                ):
+                    time.sleep(delay)
+
+    def _parse_page_attempt(
+        self,
+        page: PdfPage,
+        raw_extracted_text: str,
+        headings: deque[HeadingElement],
+        parsed_pages: deque[DocumentPage],
+        page_image: Medium | None,
+        embedded_images: list[EmbeddedPdfPageImage],
+        stage_usage: dict[UsageStage, LlmUsage],
+    ) -> DocumentPage:
+        """
+        Accumulates the usage of all LLM calls in `stage_usage`.
+        Raises LlmError on failures which may be retried.
+        """
 
         response = self._call_llm(
             raw_extracted_text=raw_extracted_text,
@@ -141,51 +259,33 @@ class PdfParser(FileParser):
                 for img in embedded_images
             ],
         )
-        if response is None:
-            return DocumentPage(
-                page_number=page.page_number,
-                content=[],
-                media=[],
-                raw_llm_response="",
-                raw_extracted_text=raw_extracted_text,
-                token_usage=usage,
-                error=True,
-            )
-
-        usage += response.usage
+        self._add_usage(stage_usage, "extraction", response.usage)
+        with stage("json-parse"):
+            parsed_response = self._json_parser.parse(response.raw)
 
+        quality = None
         if self._config.post_improve:
-            improved = self._improve_parsed(
-                raw_parsed=response.raw,
+            response, parsed_response, quality, improve_usage = self._post_improve(
+                response=response,
+                parsed_response=parsed_response,
                 raw_extracted_text=raw_extracted_text,
+                headings=headings,
                 page_image=page_image,
+                embedded_images=embedded_images,
             )
-            if improved is not None:
-                usage += improved.usage
-                response = improved
+            self._add_usage(stage_usage, "improve", improve_usage)
 
-        parsed_response = self._json_parser.parse(response.raw)
         if parsed_response is None:
-            return DocumentPage(
-                page_number=page.page_number,
-                content=[],
-                media=[],
-                raw_llm_response=response.raw,
-                raw_extracted_text=raw_extracted_text,
-                token_usage=usage,
-                error=True,
+            raise LlmError(
+                ErrorType.PARSE_FAILURE, "Invalid JSON response", raw=response.raw
             )
 
         content_blocks = parsed_response.get("page_content_blocks")
-        if content_blocks is None:
-            return DocumentPage(
-                page_number=page.page_number,
-                content=[],
-                media=[],
-                raw_llm_response=response.raw,
-                raw_extracted_text=raw_extracted_text,
-                token_usage=usage,
-                error=True,
+        if not isinstance(content_blocks, list):
+            raise LlmError(
+                ErrorType.PARSE_FAILURE,
+                "Response without page content blocks",
+                raw=response.raw,
             )
 
         content, error = self._get_content_list(content_blocks, embedded_images)
@@ -198,12 +298,126 @@ class PdfParser(FileParser):
             media=media,
             raw_llm_response=response.raw,
             raw_extracted_text=raw_extracted_text,
-            token_usage=usage,
+            token_usage=sum(stage_usage.values(), LlmUsage()),
+            stage_usage=stage_usage,
+            quality=quality,
             error=error,
+            error_type=ErrorType.PARSE_FAILURE if error else None,
+        )
+
+    def plan(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        doc = self.parse_hull(path, md5_sum)
+        # previous pages are part of the prompt with roughly their response size
+        previous_response_tokens: deque[int] = deque(
+            maxlen=self._config.prompt_config.consider_last_parsed_pages_n
         )
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                doc.content.append(
+                    self._plan_page(path, page, previous_response_tokens)
+                )
+                page.close()
+        doc.update_usage()
 
-    def parse_hull(self, path: Path) -> ParsedDocument:
-        md5_sum = get_md5_sum(path)
+        return doc
+
+    def _plan_page(
+        self,
+        path: Path,
+        page: PdfPage,
+        previous_response_tokens: deque[int],
+    ) -> DocumentPage:
+        """
+        Renders the prompts of all stages for the extracted text and uses the
+        sizes of the page image and of the extracted, filtered embedded images.
+        Previous headings are unknown before parsing and not included.
+        """
+
+        estimator = self._usage_estimator
+        image_config = self._config.image_extraction_config
+        page_images: list[ImageSpec] = []
+        embedded_images: list[ImageSpec] = []
+        if self._config.use_vision:
+            scale = image_config.resolution / PDF_POINTS_PER_INCH
+            page_images.append(
+                (int(page.width * scale), int(page.height * scale), False)
+            )
+            if image_config.extract_images:
+                with stage("image-extraction"):
+                    embedded_images = [
+                        (int(img.width), int(img.height), image_config.use_low_details)
+                        for img in self._image_extractor.extract(path, page)
+                    ]
+
+        with stage("extract-text"):
+            text = page.extract_text()
+        text_tokens = estimator.count_tokens(text)
+        prompt_data = PromptAdditions.create(
+            config=self._config, raw_extracted_text=text
+        ).to_dict()
+        stage_usage: dict[UsageStage, LlmUsage] = {}
+
+        if self._config.raw_parser_config.parser_type == "llm":
+            user_prompt = self._user_prompt_parse_raw.render(prompt_data)
+            self._add_usage(
+                stage_usage,
+                "raw-parse",
+                estimator.estimate([user_prompt], page_images, text_tokens),
+            )
+
+        response_tokens = estimator.estimate_response_tokens(text_tokens)
+        extraction_data = {**prompt_data, "embedded_images": bool(embedded_images)}
+        self._add_usage(
+            stage_usage,
+            "extraction",
+            estimator.estimate(
+                [
+                    self._system_prompt_extraction.render(extraction_data),
+                    self._user_prompt_extraction.render(extraction_data),
+                ],
+                page_images + embedded_images,
+                response_tokens,
+                context_tokens=sum(previous_response_tokens),
+            ),
+        )
+        previous_response_tokens.append(response_tokens)
+
+        if self._config.post_improve and self._is_improvement_planned(page.page_number):
+            # the improve prompt contains the first response as raw_parsed
+            self._add_usage(
+                stage_usage,
+                "improve",
+                estimator.estimate(
+                    [
+                        self._system_prompt_improve.render(prompt_data),
+                        self._user_prompt_improve.render(prompt_data),
+                    ],
+                    page_images,
+                    response_tokens,
+                    context_tokens=response_tokens,
+                ),
+            )
+
+        return DocumentPage(
+            page_number=page.page_number,
+            content=[],
+            raw_extracted_text="",
+            raw_llm_response="",
+            token_usage=sum(stage_usage.values(), LlmUsage()),
+            stage_usage=stage_usage,
+        )
+
+    def _is_improvement_planned(self, page_number: int) -> bool:
+        if self._config.post_improve_config.quality_threshold is None:
+            return True
+
+        # spreads the improved pages evenly at the configured ratio
+        ratio = self._config.usage_estimation_config.improve_ratio
+        return int(page_number * ratio) > int((page_number - 1) * ratio)
+
+    def parse_hull(self, path: Path, md5_sum: str | None = None) -> ParsedDocument:
+        if md5_sum is None:
+            md5_sum = get_md5_sum(path)
         with pdfplumber.open(path) as pdf:
             metadata = pdf.metadata
 
@@ -211,14 +425,8 @@ class PdfParser(FileParser):
             path=str(path), content=[], md5_sum=md5_sum, metadata=metadata
         )
 
-    def get_number_of_pages(self, path: Path) -> int:
-        try:
-            pdf = pdfplumber.open(path)
-            return len(pdf.pages)
-        except Exception:
-            _log.error("Could not open pdf [path='{0}']", path)
-
-        return 0
+    def get_number_of_pages(self, path: Path) -> int | None:
+        return count_pdf_pages_with_fallback(path)
 
     def _call_llm(
         self,
@@ -227,7 +435,7 @@ class PdfParser(FileParser):
         parsed_pages: deque[DocumentPage],
         page_image: Medium | None,
         embedded_images: list[Medium],
-    ) -> LlmResponse | None:
+    ) -> LlmResponse:
         image_config = self._config.image_extraction_config
 
         prompt_additions = PromptAdditions.create(
@@ -251,24 +459,76 @@ class PdfParser(FileParser):
             for img in embedded_images
         ]
 
-        return self._llm.generate(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            page_image=(
-                LlmMedium(image=page_image, description=page_image.description)
-                if page_image is not None
-                else None
-            ),
-            embedded_images=images,
-            config=self._config.generation_config,
+        with stage("llm-extraction"):
+            return self._llm.generate(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                page_image=(
+                    LlmMedium(image=page_image, description=page_image.description)
+                    if page_image is not None
+                    else None
+                ),
+                embedded_images=images,
+                config=self._config.generation_config,
+                response_schema=RawPageContent,
+            )
+
+    def _post_improve(
+        self,
+        response: LlmResponse,
+        parsed_response: dict[str, Any] | None,
+        raw_extracted_text: str,
+        headings: deque[HeadingElement],
+        page_image: Medium | None,
+        embedded_images: list[EmbeddedPdfPageImage],
+    ) -> tuple[LlmResponse, dict[str, Any] | None, PageQuality, LlmUsage | None]:
+        image_numbers = [img.caption_idx for img in embedded_images]
+        quality = self._page_validator.score(
+            parsed_response, raw_extracted_text, headings, image_numbers
         )
+        if not self._page_validator.needs_improvement(quality):
+            return response, parsed_response, quality, None
+
+        try:
+            improved = self._improve_parsed(
+                raw_parsed=response.raw,
+                raw_extracted_text=raw_extracted_text,
+                page_image=page_image,
+            )
+        except LlmError as e:
+            _log.warning(
+                "Post improvement failed, keeping first response "
+                "[error_type='{0}', msg='{1}']",
+                e.error_type,
+                e,
+            )
+            return response, parsed_response, quality, None
+
+        with stage("json-parse"):
+            improved_parsed = self._json_parser.parse(improved.raw)
+        improved_quality = self._page_validator.score(
+            improved_parsed, raw_extracted_text, headings, image_numbers
+        )
+        if improved_parsed is None or improved_quality.score < quality.score:
+            _log.info(
+                "Discarding post improvement with lower quality "
+                "[score={0:.2f}, improved_score={1:.2f}]",
+                quality.score,
+                improved_quality.score,
+            )
+            return response, parsed_response, quality, improved.usage
+
+        improved_quality.improved = True
+        improved_quality.initial_score = quality.score
+
+        return improved, improved_parsed, improved_quality, improved.usage
 
     def _improve_parsed(
         self,
         raw_parsed: str,
         raw_extracted_text: str,
         page_image: Medium | None,
-    ) -> LlmResponse | None:
+    ) -> LlmResponse:
         prompt_additions = PromptAdditions.create(
             config=self._config,
             raw_extracted_text=raw_extracted_text,
@@ -278,17 +538,32 @@ class PdfParser(FileParser):
         system_prompt = self._system_prompt_improve.render(prompt_additions.to_dict())
         user_prompt = self._user_prompt_improve.render(prompt_additions.to_dict())
 
-        return self._llm.generate(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            page_image=(
-                LlmMedium(image=page_image, description=page_image.description)
-                if page_image is not None
-                else None
-            ),
-            embedded_images=[],
-            config=self._config.generation_config,
-        )
+        with stage("llm-improve"):
+            return self._llm.generate(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                page_image=(
+                    LlmMedium(image=page_image, description=page_image.description)
+                    if page_image is not None
+                    else None
+                ),
+                embedded_images=[],
+                config=self._config.generation_config,
+                response_schema=RawImprovedPageContent,
+            )
+
+    def _add_usage(
+        self,
+        stage_usage: dict[UsageStage, LlmUsage],
+        stage: UsageStage,
+        usage: LlmUsage | None,
+    ) -> None:
+        if usage is None:
+            return
+
+        if usage.n_calls:
+            usage.cost = self._config.price_table.get_cost(usage)
+        add_stage_usage(stage_usage, {stage: usage})
 
     def _get_content_list(
         self,
@@ -337,23 +612,29 @@ class PdfParser(FileParser):
         if not self._config.use_vision:
             return None, []
 
+        import pdf2image
+
         image_config = self._config.image_extraction_config
-        full_page_image = Medium.create_from_image(
-            id="",
-            image_format=image_config.image_format,
-            raw=pdf2image.convert_from_path(
+        with stage("render"):
+            raw_page_image = pdf2image.convert_from_path(
                 path,
                 dpi=image_config.resolution,
                 first_page=page.page_number,
                 last_page=page.page_number,
-            )[0],
-            description="Image of the full PDF page:",
-        )
+            )[0]
+        with stage("encode"):
+            full_page_image = Medium.create_from_image(
+                id="",
+                image_format=image_config.image_format,
+                raw=raw_page_image,
+                description="Image of the full PDF page:",
+            )
 
         if not image_config.extract_images:
             return full_page_image, []
 
-        embedded_images = self._image_extractor.extract(path, page)
+        with stage("image-extraction"):
+            embedded_images = self._image_extractor.extract(path, page)
 
         return full_page_image, embedded_images
 
@@ -361,9 +642,10 @@ class PdfParser(FileParser):
         self,
         page: PdfPage,
         page_image: Medium | None,
-    ) -> tuple[str, LlmUsage]:
-        raw = page.extract_text()
-        usage = LlmUsage()
+    ) -> tuple[str, LlmUsage | None]:
+        with stage("extract-text"):
+            raw = page.extract_text()
+        usage = None
         if self._config.raw_parser_config.parser_type == "llm":
             prompt_additions = PromptAdditions.create(
                 config=self._config,
@@ -375,19 +657,29 @@ class PdfParser(FileParser):
                 deep=True, update={"json_mode": False}
             )
 
-            response = self._llm.generate(
-                system_prompt=None,
-                user_prompt=user_prompt,
-                page_image=(
-                    LlmMedium(image=page_image, description=page_image.description)
-                    if page_image is not None
-                    else None
-                ),
-                embedded_images=[],
-                config=generation_config,
-            )
-
-            if response is not None:
+            try:
+                with stage("llm-raw-parse"):
+                    response = self._llm.generate(
+                        system_prompt=None,
+                        user_prompt=user_prompt,
+                        page_image=(
+                            LlmMedium(
+                                image=page_image, description=page_image.description
+                            )
+                            if page_image is not None
+                            else None
+                        ),
+                        embedded_images=[],
+                        config=generation_config,
+                    )
+            except LlmError as e:
+                _log.warning(
+                    "Raw LLM parsing failed, using extracted text "
+                    "[error_type='{0}', msg='{1}']",
+                    e.error_type,
+                    e,
+                )
+            else:
                 raw = response.raw
                 usage = response.usage
 
@@ -0,0 +1,308 @@
+import heapq
+import time
+from bisect import bisect_left, insort
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import NamedTuple
+
+from theia_parse.llm.__spi__ import SpendLimitExceededError
+from theia_parse.model import DocumentPage, ErrorType, LlmUsage, ParsedDocument
+from theia_parse.parser.checkpoint import PageCheckpoint
+from theia_parse.parser.document_parser import DocumentParser
+from theia_parse.parser.file_parser.__spi__ import FileParser
+from theia_parse.types import SchedulingPolicy
+from theia_parse.util.instrumentation import get_tracer
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+class ScheduledDocument(NamedTuple):
+    path: Path
+    md5_sum: str | None = None
+    n_pages: int | None = None
+    """Counted by the file parser if not given"""
+
+
+class _DocumentJob:
+    def __init__(
+        self,
+        seq: int,
+        parser: FileParser,
+        parsed: ParsedDocument,
+        n_pages: int,
+        completed: list[DocumentPage],
+        checkpoint: PageCheckpoint | None,
+        n_context_pages: int,
+        n_context_headings: int,
+    ) -> None:
+        self.seq = seq
+        self.parser = parser
+        self.parsed = parsed
+        self.path = Path(parsed.path)
+        self.n_pages = n_pages
+        self.checkpoint = checkpoint
+        self.n_context_pages = n_context_pages
+        self.n_context_headings = n_context_headings
+        self.ordered = n_context_pages > 0 or n_context_headings > 0
+        self.completed = {p.page_number: p for p in completed}
+        self.heading_page_numbers = sorted(
+            p.page_number for p in completed if p.get_headings()
+        )
+        self.pending = [n for n in range(1, n_pages + 1) if n not in self.completed]
+        self.n_in_flight = 0
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def is_done(self) -> bool:
+        return not self.pending and self.n_in_flight == 0
+
+    def take_ready(self) -> list[int]:
+        """Returns the page numbers which may be started now."""
+
+        if not self.pending or (self.ordered and self.n_in_flight):
+            return []
+
+        if self.ordered:
+            ready = [self.pending.pop(0)]
+        else:
+            ready, self.pending = self.pending, []
+        self.n_in_flight += len(ready)
+
+        return ready
+
+    def get_context_pages(self, page_number: int) -> list[DocumentPage]:
+        """
+        Returns the completed pages before the page the prompt considers: the
+        last n_context_pages pages and the pages of the last n_context_headings
+        headings, instead of all pages before.
+        """
+
+        if not self.ordered:
+            return []
+
+        page_numbers = {
+            n
+            for n in range(max(1, page_number - self.n_context_pages), page_number)
+            if n in self.completed
+        }
+        n_headings = 0
+        end = bisect_left(self.heading_page_numbers, page_number)
+        for n in reversed(self.heading_page_numbers[:end]):
+            if n_headings >= self.n_context_headings:
+                break
+            page_numbers.add(n)
+            n_headings += len(self.completed[n].get_headings())
+
+        return [self.completed[n] for n in sorted(page_numbers)]
+
+    def complete(self, page: DocumentPage) -> None:
+        self.n_in_flight -= 1
+        self.completed[page.page_number] = page
+        if page.get_headings():
+            insort(self.heading_page_numbers, page.page_number)
+        if self.checkpoint is not None:
+            self.checkpoint.append(page)
+
+    def to_parsed_document(self) -> ParsedDocument:
+        self.parsed.content = [self.completed[n] for n in sorted(self.completed)]
+
+        return self.parsed
+
+
+class PageScheduler:
+    """
+    Parses the pages of many documents with a shared pool of workers, so a
+    single long document does not block the others.
+
+    Documents are split into page tasks, which are started in the order of the
+    scheduling policy. If the prompt uses the headings or pages parsed before,
+    the pages of a document are parsed one after another, otherwise all pages
+    of a document may be parsed concurrently. Documents are yielded as soon as
+    all of their pages are parsed, which is not necessarily the input order.
+    """
+
+    def __init__(
+        self,
+        document_parser: DocumentParser,
+        max_workers: int,
+        policy: SchedulingPolicy = "fifo",
+        window: int = 64,
+    ) -> None:
+        self._document_parser = document_parser
+        self._config = document_parser.config
+        self._max_workers = max(1, max_workers)
+        self._policy = policy
+        self._window = max(1, window)
+
+    def run(self, documents: Iterable[ScheduledDocument]) -> Iterator[ParsedDocument]:
+        documents = iter(documents)
+        jobs: dict[int, _DocumentJob] = {}
+        ready: list[tuple[tuple[int, ...], int, int]] = []
+        futures: dict[Future[DocumentPage], tuple[_DocumentJob, int]] = {}
+        exhausted = False
+        seq = 0
+
+        executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        try:
+            while True:
+                while not exhausted and len(jobs) < self._window:
+                    document = next(documents, None)
+                    if document is None:
+                        exhausted = True
+                        break
+                    job = self._try_create_job(seq, document)
+                    seq += 1
+                    if job is None:
+                        continue
+                    if job.is_done:
+                        yield self._finish(job)
+                        continue
+                    jobs[job.seq] = job
+                    self._push_ready(job, ready)
+
+                while ready and len(futures) < self._max_workers:
+                    _, page_number, job_seq = heapq.heappop(ready)
+                    job = jobs[job_seq]
+                    future = executor.submit(
+                        self._parse_page,
+                        job,
+                        page_number,
+                        job.get_context_pages(page_number),
+                    )
+                    futures[future] = (job, page_number)
+
+                if not futures:
+                    if exhausted:
+                        break
+                    continue
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, page_number = futures.pop(future)
+                    job.complete(future.result())
+                    self._push_ready(job, ready)
+                    if job.is_done:
+                        del jobs[job.seq]
+                        yield self._finish(job)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _try_create_job(
+        self,
+        seq: int,
+        document: ScheduledDocument,
+    ) -> _DocumentJob | None:
+        """Returns None if the document is skipped, also on errors."""
+
+        try:
+            return self._create_job(seq, document)
+        except SpendLimitExceededError:
+            raise
+        except Exception as e:
+            _log.error(
+                "Could not parse file [path='{0}', error='{1}']", document.path, e
+            )
+
+    def _create_job(self, seq: int, document: ScheduledDocument) -> _DocumentJob | None:
+        parser = self._document_parser.get_file_parser(document.path)
+        if parser is None:
+            return
+
+        n_pages = document.n_pages
+        if n_pages is None:
+            n_pages = parser.get_number_of_pages(document.path)
+        if not n_pages:
+            # not saved, so the document is not skipped as parsed by later runs
+            _log.error("Could not count pages [path='{0}']", document.path)
+            return
+
+        parsed = parser.parse_hull(document.path, document.md5_sum)
+        checkpoint = None
+        completed: list[DocumentPage] = []
+        if self._config.save_file and self._config.checkpoint:
+            checkpoint = PageCheckpoint(document.path)
+            completed = checkpoint.open(parsed)
+
+        return _DocumentJob(
+            seq=seq,
+            parser=parser,
+            parsed=parsed,
+            n_pages=n_pages,
+            completed=completed,
+            checkpoint=checkpoint,
+            n_context_pages=self._config.prompt_config.consider_last_parsed_pages_n,
+            n_context_headings=self._config.prompt_config.consider_last_headings_n,
+        )
+
+    def _push_ready(
+        self,
+        job: _DocumentJob,
+        ready: list[tuple[tuple[int, ...], int, int]],
+    ) -> None:
+        for page_number in job.take_ready():
+            heapq.heappush(ready, (self._get_priority(job), page_number, job.seq))
+
+    def _get_priority(self, job: _DocumentJob) -> tuple[int, ...]:
+        if self._policy == "shortest-document-first":
+            return job.n_pages, job.seq
+        if self._policy == "longest-document-first":
+            return -job.n_pages, job.seq
+
+        return (job.seq,)
+
+    def _parse_page(
+        self,
+        job: _DocumentJob,
+        page_number: int,
+        context_pages: list[DocumentPage],
+    ) -> DocumentPage:
+        """Returns an error page if the page could not be parsed, to retry it later."""
+
+        try:
+            pages = job.parser.parse_paged(
+                job.path, page_numbers=[page_number], context_pages=context_pages
+            )
+            for page in pages:
+                return page
+            _log.error(
+                "Page not found [path='{0}', page_number={1}]", job.path, page_number
+            )
+        except SpendLimitExceededError:
+            raise
+        except Exception as e:
+            _log.error(
+                "Could not parse page [path='{0}', page_number={1}, error='{2}']",
+                job.path,
+                page_number,
+                e,
+            )
+
+        return DocumentPage(
+            page_number=page_number,
+            content=[],
+            raw_extracted_text="",
+            raw_llm_response="",
+            token_usage=LlmUsage(),
+            error=True,
+            error_type=ErrorType.UNKNOWN,
+        )
+
+    def _finish(self, job: _DocumentJob) -> ParsedDocument:
+        parsed = job.to_parsed_document()
+        self._document_parser.save(job.path, parsed)
+
+        tracer = get_tracer()
+        if tracer is not None:
+            # pages of a document are parsed by several threads
+            tracer.add_async_span(
+                "document",
+                "document",
+                job.start_ns,
+                time.perf_counter_ns(),
+                {"path": str(job.path), "n_pages": job.n_pages},
+            )
+
+        return parsed
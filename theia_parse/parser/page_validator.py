@@ -0,0 +1,151 @@
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from pydantic import ValidationError
+
+from theia_parse.model import (
+    ContentType,
+    HeadingElement,
+    PageQuality,
+    RawContentElement,
+)
+from theia_parse.parser.__spi__ import PostImproveConfig
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class PageValidator:
+    """
+    Scores a parsed LLM response to decide whether a post improvement call is needed.
+    All partial scores are in [0, 1], higher is better.
+    """
+
+    def __init__(self, config: PostImproveConfig) -> None:
+        self._config = config
+
+    def score(
+        self,
+        parsed_response: dict[str, Any] | None,
+        raw_extracted_text: str,
+        previous_headings: Iterable[HeadingElement] = (),
+        image_numbers: Iterable[int] = (),
+    ) -> PageQuality:
+        blocks = self._get_blocks(parsed_response)
+        elements = self._get_valid_elements(blocks)
+
+        json_validity = 0.0
+        if blocks is not None:
+            json_validity = len(elements) / len(blocks) if blocks else 1.0
+
+        text_coverage = self._text_coverage(elements, raw_extracted_text)
+        heading_consistency = self._heading_consistency(elements, previous_headings)
+        image_references = self._image_references(elements, set(image_numbers))
+
+        weights = (
+            self._config.json_validity_weight,
+            self._config.text_coverage_weight,
+            self._config.heading_consistency_weight,
+            self._config.image_references_weight,
+        )
+        scores = (json_validity, text_coverage, heading_consistency, image_references)
+        total_weight = sum(weights)
+        score = (
+            sum(w * s for w, s in zip(weights, scores, strict=True)) / total_weight
+            if total_weight > 0
+            else 1.0
+        )
+
+        return PageQuality(
+            score=score,
+            json_validity=json_validity,
+            text_coverage=text_coverage,
+            heading_consistency=heading_consistency,
+            image_references=image_references,
+        )
+
+    def needs_improvement(self, quality: PageQuality) -> bool:
+        if self._config.quality_threshold is None:
+            return True
+
+        return quality.score < self._config.quality_threshold
+
+    @staticmethod
+    def _get_blocks(parsed_response: dict[str, Any] | None) -> list[Any] | None:
+        if parsed_response is None:
+            return
+
+        blocks = parsed_response.get("page_content_blocks")
+        if not isinstance(blocks, list):
+            return
+
+        return blocks
+
+    @staticmethod
+    def _get_valid_elements(blocks: list[Any] | None) -> list[RawContentElement]:
+        elements: list[RawContentElement] = []
+        for block in blocks or []:
+            if not isinstance(block, dict):
+                continue
+            try:
+                element = RawContentElement(**block)
+            except ValidationError:
+                continue
+            if element.type == ContentType.HEADING and element.heading_level is None:
+                continue
+            elements.append(element)
+
+        return elements
+
+    @staticmethod
+    def _text_coverage(elements: list[RawContentElement], raw_text: str) -> float:
+        raw_words = set(_WORD_PATTERN.findall(raw_text.lower()))
+        if not raw_words:
+            return 1.0
+
+        parsed_words: set[str] = set()
+        for element in elements:
+            parsed_words.update(_WORD_PATTERN.findall(element.content.lower()))
+
+        return len(raw_words & parsed_words) / len(raw_words)
+
+    @staticmethod
+    def _heading_consistency(
+        elements: list[RawContentElement],
+        previous_headings: Iterable[HeadingElement],
+    ) -> float:
+        last_level = None
+        for heading in previous_headings:
+            last_level = heading.heading_level
+
+        n_headings = 0
+        n_consistent = 0
+        for element in elements:
+            if element.type != ContentType.HEADING or element.heading_level is None:
+                continue
+            n_headings += 1
+            level = element.heading_level
+            if level >= 1 and (last_level is None or level <= last_level + 1):
+                n_consistent += 1
+            last_level = level
+
+        return n_consistent / n_headings if n_headings else 1.0
+
+    @staticmethod
+    def _image_references(
+        elements: list[RawContentElement],
+        image_numbers: set[int],
+    ) -> float:
+        image_elements = [e for e in elements if e.type == ContentType.IMAGE]
+        if not image_elements:
+            return 1.0
+
+        n_resolved = sum(
+            1
+            for e in image_elements
+            if e.image_number in image_numbers
+            or (e.image_number is None and not image_numbers)
+        )
+
+        return n_resolved / len(image_elements)
@@ -0,0 +1,107 @@
+"""
+Dry run of parsing: estimates the LLM usage of documents in parallel processes
+without calling the LLM and projects the duration of the LLM calls.
+"""
+
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from theia_parse.llm.__spi__ import LlmApiSettings
+from theia_parse.model import LlmUsage, ParsedDocument
+from theia_parse.parser.__spi__ import DocumentParserConfig, PlanConfig
+from theia_parse.parser.file_parser import DEFAULT_PARSER_POOL
+from theia_parse.types import PlanLimit
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+_MIN_DOCUMENTS_PER_WORKER = 4
+
+
+class DocumentPlanner:
+    """Plans documents with the warm file parsers of the process."""
+
+    def __init__(
+        self,
+        llm_api_settings: LlmApiSettings,
+        config: DocumentParserConfig,
+    ) -> None:
+        self._llm_api_settings = llm_api_settings
+        self._config = config
+
+    def plan(self, path: Path, md5_sum: str | None = None) -> ParsedDocument | None:
+        # no spend limit, plans do not call the LLM
+        parser = DEFAULT_PARSER_POOL.get(path, self._llm_api_settings, self._config)
+        if parser is None:
+            return
+
+        try:
+            return parser.plan(path, md5_sum)
+        except Exception as e:
+            _log.error("Could not plan document [path='{0}', error='{1}']", path, e)
+
+        return
+
+
+def plan_documents(
+    documents: Sequence[tuple[Path, str | None]],
+    llm_api_settings: LlmApiSettings,
+    config: DocumentParserConfig,
+    max_workers: int | None = None,
+) -> Iterator[ParsedDocument | None]:
+    """
+    Yields the plans of the (path, md5 sum) documents in order, using a process
+    pool for larger numbers of documents. None if a document can not be planned.
+    """
+
+    planner = DocumentPlanner(llm_api_settings, config)
+    if len(documents) < 2 * _MIN_DOCUMENTS_PER_WORKER or max_workers == 1:
+        for path, md5_sum in documents:
+            yield planner.plan(path, md5_sum)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(planner,),
+    ) as executor:
+        yield from executor.map(_plan_in_worker, documents)
+
+
+def project_wall_seconds(
+    usage: LlmUsage,
+    concurrency: int,
+    config: PlanConfig,
+) -> tuple[float, PlanLimit]:
+    """
+    Projects the duration of the LLM calls as the slowest of the summed call
+    latencies spread over the concurrent calls and the rate limits.
+    """
+
+    bounds: dict[PlanLimit, float] = {
+        "latency": (usage.latency_seconds or 0) / max(1, concurrency)
+    }
+    if config.requests_per_minute:
+        bounds["requests"] = (usage.n_calls or 0) / config.requests_per_minute * 60
+    if config.tokens_per_minute:
+        bounds["tokens"] = (usage.total_tokens or 0) / config.tokens_per_minute * 60
+
+    limited_by = max(bounds, key=lambda k: bounds[k])
+
+    return bounds[limited_by], limited_by
+
+
+_worker_planner: DocumentPlanner | None = None
+
+
+def _init_worker(planner: DocumentPlanner) -> None:
+    global _worker_planner
+    _worker_planner = planner
+
+
+def _plan_in_worker(document: tuple[Path, str | None]) -> ParsedDocument | None:
+    assert _worker_planner is not None
+
+    return _worker_planner.plan(*document)
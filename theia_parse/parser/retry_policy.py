@@ -0,0 +1,31 @@
+import random
+
+from theia_parse.llm.__spi__ import LlmError
+from theia_parse.parser.__spi__ import RetryConfig
+
+
+class RetryPolicy:
+    def __init__(self, config: RetryConfig) -> None:
+        self._config = config
+
+    def get_delay(self, error: LlmError, attempt: int) -> float | None:
+        """
+        Returns the delay in seconds before the next attempt or None if no
+        further attempt should be made after `attempt` (1-based) failed attempts
+        with the error type of the given error.
+        """
+
+        max_attempts = self._config.max_attempts.get(error.error_type, 1)
+        if attempt >= max_attempts:
+            return
+
+        delay = min(
+            self._config.backoff_base_seconds * 2 ** (attempt - 1),
+            self._config.backoff_max_seconds,
+        )
+        if self._config.jitter:
+            delay *= random.uniform(0.5, 1.0)  # noqa: S311
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+
+        return delay
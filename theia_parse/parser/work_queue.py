@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from collections.abc import Iterable
+from enum import StrEnum
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from theia_parse.util.log import LogFactory
+
+
+_log = LogFactory.get_logger()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    path TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+CREATE TABLE IF NOT EXISTS hashes (
+    md5_sum TEXT PRIMARY KEY,
+    path TEXT NOT NULL
+);
+"""
+
+
+class TaskStatus(StrEnum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class SharedWorkQueue:
+    """
+    File based work queue for parsing one corpus with several processes or
+    machines on a shared filesystem.
+
+    Workers claim files with a lease, which is renewed by a heartbeat thread as
+    long as the worker is alive. Files of crashed workers are claimed again by
+    others once the lease expired, already parsed pages are resumed from their
+    checkpoint. The md5 sums of claimed files are shared for deduplication.
+
+    Paths are stored relative to root, if given, so machines may mount the
+    shared directory at different paths.
+    """
+
+    def __init__(
+        self,
+        db_path: Path | str,
+        root: Path | str | None = None,
+        worker_id: str | None = None,
+        lease_seconds: float = 300.0,
+        heartbeat_seconds: float = 60.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self._root = Path(root) if root is not None else None
+        self._worker_id = worker_id or _get_default_worker_id()
+        self._lease_seconds = lease_seconds
+        self._heartbeat_seconds = heartbeat_seconds
+        self._max_attempts = max_attempts
+        self._lock = Lock()
+        self._stop = Event()
+        self._heartbeat: Thread | None = None
+        # no WAL, it requires shared memory and does not work on network filesystems
+        self._connection = sqlite3.connect(
+            db_path, timeout=60.0, isolation_level=None, check_same_thread=False
+        )
+        self._connection.executescript(_SCHEMA)
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    def enqueue(
+        self,
+        paths: Iterable[Path],
+        status: TaskStatus = TaskStatus.PENDING,
+    ) -> None:
+        """Adds the paths to the queue, paths already known are ignored."""
+
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (path, status) VALUES (?, ?)",
+                ((self._to_key(p), status) for p in paths),
+            )
+
+    def claim(self) -> Path | None:
+        """
+        Leases the next pending file or a file with an expired lease to this worker.
+        Files whose lease expired after the maximum number of attempts, e.g.
+        because they crash every worker, are marked as failed instead.
+        Returns None if no file is left to claim.
+        """
+
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, owner = NULL, lease_expires = NULL, "
+                "error = ? WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (
+                    TaskStatus.FAILED,
+                    "Lease expired after the maximum number of attempts",
+                    TaskStatus.LEASED,
+                    now,
+                    self._max_attempts,
+                ),
+            )
+            row = connection.execute(
+                "SELECT path FROM tasks "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY rowid LIMIT 1",
+                (TaskStatus.PENDING, TaskStatus.LEASED, now),
+            ).fetchone()
+            if row is None:
+                return
+            connection.execute(
+                "UPDATE tasks SET status = ?, owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE path = ?",
+                (TaskStatus.LEASED, self._worker_id, now + self._lease_seconds, row[0]),
+            )
+
+        return self._to_path(row[0])
+
+    def complete(self, path: Path) -> None:
+        self._finish(path, TaskStatus.DONE)
+
+    def fail(self, path: Path, error: str) -> None:
+        """
+        Releases the file for another attempt or marks it as failed once the
+        maximum number of attempts is reached.
+        """
+
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "owner = NULL, lease_expires = NULL, error = ? "
+                "WHERE path = ? AND owner = ?",
+                (
+                    self._max_attempts,
+                    TaskStatus.FAILED,
+                    TaskStatus.PENDING,
+                    error,
+                    self._to_key(path),
+                    self._worker_id,
+                ),
+            )
+
+    def register_hash(self, md5_sum: str, path: Path) -> Path | None:
+        """
+        Registers the md5 sum of the file and returns the path of an
+        already registered file with the same md5 sum, if any.
+        """
+
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO hashes (md5_sum, path) VALUES (?, ?)",
+                (md5_sum, self._to_key(path)),
+            )
+            row = connection.execute(
+                "SELECT path FROM hashes WHERE md5_sum = ?", (md5_sum,)
+            ).fetchone()
+
+        existing_path = self._to_path(row[0])
+
+        return None if existing_path == path else existing_path
+
+    def get_hash_to_path(self) -> dict[str, Path]:
+        with self._lock:
+            rows = self._connection.execute("SELECT md5_sum, path FROM hashes")
+
+            return {md5_sum: self._to_path(key) for md5_sum, key in rows}
+
+    def get_status_counts(self) -> dict[TaskStatus, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+
+        return {TaskStatus(status): count for status, count in rows}
+
+    def renew_leases(self) -> int:
+        """Extends the leases of all files claimed by this worker."""
+
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE owner = ? AND status = ?",
+                (time.time() + self._lease_seconds, self._worker_id, TaskStatus.LEASED),
+            )
+
+        return cursor.rowcount
+
+    def start_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            return
+
+        self._stop.clear()
+        self._heartbeat = Thread(target=self._run_heartbeat, daemon=True)
+        self._heartbeat.start()
+
+    def stop_heartbeat(self) -> None:
+        if self._heartbeat is None:
+            return
+
+        self._stop.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+
+    def close(self) -> None:
+        self.stop_heartbeat()
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> SharedWorkQueue:
+        self.start_heartbeat()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _finish(self, path: Path, status: TaskStatus) -> None:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = ?, owner = NULL, lease_expires = NULL "
+                "WHERE path = ? AND owner = ?",
+                (status, self._to_key(path), self._worker_id),
+            )
+        if cursor.rowcount == 0:
+            _log.warning(
+                "Lease was lost before finishing [path='{0}', worker_id='{1}']",
+                path,
+                self._worker_id,
+            )
+
+    def _to_key(self, path: Path) -> str:
+        if self._root is None:
+            return str(path)
+
+        return path.relative_to(self._root).as_posix()
+
+    def _to_path(self, key: str) -> Path:
+        return self._root / key if self._root is not None else Path(key)
+
+    def _run_heartbeat(self) -> None:
+        while not self._stop.wait(self._heartbeat_seconds):
+            try:
+                self.renew_leases()
+            except sqlite3.Error as e:
+                _log.error("Could not renew leases [error='{0}']", e)
+
+    def _transaction(self) -> _Transaction:
+        return _Transaction(self._connection, self._lock)
+
+
+class _Transaction:
+    """Serializes writers across processes with BEGIN IMMEDIATE."""
+
+    def __init__(self, connection: sqlite3.Connection, lock: Lock) -> None:
+        self._connection = connection
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+
+        return self._connection
+
+    def __exit__(self, exc_type, *args) -> None:
+        try:
+            self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def _get_default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
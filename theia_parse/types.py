@@ -4,6 +4,14 @@ from typing import Literal
 type ImageFormat = Literal["webp", "png", "jpeg"]
 type RawParserTypeName = Literal["default", "llm"]
 type ImageExtractionMethod = Literal["pymupdf", "yodocus"]
+type OutputFormat = Literal["json", "jsonl", "binary"]
+type DuplicateRestoreMode = Literal["copy", "reference"]
+type Compression = Literal["none", "zlib", "lzma"]
+type UsageStage = Literal["raw-parse", "extraction", "improve"]
+type PlanLimit = Literal["latency", "requests", "tokens"]
+type SchedulingPolicy = Literal[
+    "fifo", "shortest-document-first", "longest-document-first"
+]
 
 type BBox = tuple[float, float, float, float]
 """bbox = x0, top, x1, bottom"""
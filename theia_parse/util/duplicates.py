@@ -1,45 +1,83 @@
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from theia_parse.const import DUPLICATE_SUFFIXES, PARSED_JSON_SUFFIXES
-from theia_parse.model import ParsedDocument
-from theia_parse.util.files import has_suffixes, read_json, with_suffix, write_json
+from theia_parse.const import DUPLICATE_SUFFIXES
+from theia_parse.output import (
+    find_parsed_path,
+    get_output_format,
+    read_parsed,
+    write_parsed,
+    write_reference,
+)
+from theia_parse.parser.__spi__ import ScanConfig
+from theia_parse.parser.directory_scanner import DirectoryScanner
+from theia_parse.types import DuplicateRestoreMode
+from theia_parse.util.files import with_suffix
 from theia_parse.util.log import LogFactory
 
 
 _log = LogFactory.get_logger()
 
 
-def restore_duplicate_parsed_doc(source_path: Path, dest_path: Path) -> bool:
-    parsed_source_path = with_suffix(source_path, PARSED_JSON_SUFFIXES)
-    parsed_dest_path = with_suffix(dest_path, PARSED_JSON_SUFFIXES)
+def restore_duplicate_parsed_doc(
+    source_path: Path,
+    dest_path: Path,
+    mode: DuplicateRestoreMode = "copy",
+) -> bool:
+    """
+    Restores the parsed file of a duplicate document either as a copy of the
+    parsed source file or as a small reference file, which loaders resolve.
+    """
+
+    parsed_source_path = find_parsed_path(source_path)
+    if parsed_source_path is None:
+        _log.warning("No parsed file of the source [source_path='{0}']", source_path)
+        return False
 
     try:
-        shutil.copy(parsed_source_path, parsed_dest_path)
-        parsed = ParsedDocument(**read_json(parsed_dest_path))
-        parsed.path = str(dest_path)
-        write_json(parsed_dest_path, parsed)
+        if mode == "reference":
+            write_reference(dest_path, source_path)
+        else:
+            parsed = read_parsed(parsed_source_path)
+            parsed.path = str(dest_path)
+            write_parsed(
+                dest_path, parsed, get_output_format(parsed_source_path) or "json"
+            )
     except Exception:
         _log.warning(
-            "Could not restore duplicates source_path='{0}', dest_path='{1}']",
+            "Could not restore duplicates [source_path='{0}', dest_path='{1}']",
             parsed_source_path,
-            parsed_dest_path,
+            dest_path,
         )
+        return False
 
     return True
 
 
-def restore_duplicates(dir: Path) -> int:
-    counter = 0
-    for root, _, file_names in os.walk(dir):
-        for file_name in file_names:
-            curr_path = Path(root) / file_name
-            if has_suffixes(curr_path, DUPLICATE_SUFFIXES):
-                source_path = Path(curr_path.read_text())
-                dest_path = with_suffix(curr_path, replace_suffixes=DUPLICATE_SUFFIXES)
-                if restore_duplicate_parsed_doc(source_path, dest_path):
-                    counter += 1
-                    os.remove(curr_path)
+def restore_duplicates(
+    dir: Path,
+    mode: DuplicateRestoreMode = "copy",
+    max_workers: int = 8,
+) -> int:
+    duplicate_paths = [
+        f.path
+        for f in DirectoryScanner(
+            ScanConfig(), extensions=[s.strip(".") for s in DUPLICATE_SUFFIXES]
+        ).scan(dir)
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        restored = executor.map(lambda p: _restore_duplicate(p, mode), duplicate_paths)
+
+        return sum(restored)
+
 
-    return counter
+def _restore_duplicate(duplicate_path: Path, mode: DuplicateRestoreMode) -> bool:
+    source_path = Path(duplicate_path.read_text())
+    dest_path = with_suffix(duplicate_path, replace_suffixes=DUPLICATE_SUFFIXES)
+    if not restore_duplicate_parsed_doc(source_path, dest_path, mode):
+        return False
+
+    os.remove(duplicate_path)
+
+    return True
@@ -8,9 +8,8 @@ from pydantic import BaseModel
 from theia_parse.const import SUPPORTED_EXTENSIONS
 
 
-def get_md5_sum(path: Path):
+def get_md5_sum(path: Path, chunk_size: int = 1024 * 1024) -> str:
     with open(path, "rb") as f:
-        chunk_size = 4096
         md5_hash = md5()
         while chunk := f.read(chunk_size):
             md5_hash.update(chunk)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+from theia_parse.const import CACHE_DIR_NAME, HASH_INDEX_FILE_PREFIX
+from theia_parse.util.files import get_md5_sum
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    md5_sum TEXT,
+    n_pages INTEGER
+)
+"""
+
+
+class FileHashIndex:
+    """
+    Persistent cache of md5 sums and page counts keyed by path.
+    Entries are only valid as long as size, mtime and inode of the file are unchanged.
+    WAL requires shared memory and must be disabled for indexes on network filesystems.
+    """
+
+    def __init__(
+        self,
+        db_path: Path | str = ":memory:",
+        max_workers: int = 8,
+        wal: bool = True,
+    ) -> None:
+        self._max_workers = max_workers
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            db_path, timeout=60.0, check_same_thread=False
+        )
+        if wal:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+    def get_md5_sum(self, path: Path, stat: os.stat_result | None = None) -> str:
+        return self.get_md5_sums([path], {path: stat} if stat else None)[path]
+
+    def get_md5_sums(
+        self,
+        paths: Iterable[Path],
+        stats: dict[Path, os.stat_result] | None = None,
+    ) -> dict[Path, str]:
+        """
+        Returns the md5 sums of all paths, hashing cache misses in parallel.
+        Stats of the files may be passed to avoid additional stat calls.
+        """
+
+        stats = stats or {}
+        result: dict[Path, str] = {}
+        misses: list[tuple[Path, os.stat_result]] = []
+        for path in paths:
+            stat = stats.get(path) or path.stat()
+            md5_sum = self._get_cached(path, stat, "md5_sum")
+            if md5_sum is not None:
+                result[path] = md5_sum
+            else:
+                misses.append((path, stat))
+
+        if len(misses) > 1 and self._max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                md5_sums = list(executor.map(get_md5_sum, (p for p, _ in misses)))
+        else:
+            md5_sums = [get_md5_sum(p) for p, _ in misses]
+
+        for (path, stat), md5_sum in zip(misses, md5_sums, strict=True):
+            self._set_cached(path, stat, "md5_sum", md5_sum)
+            result[path] = md5_sum
+        self._commit()
+
+        return result
+
+    def get_number_of_pages(
+        self,
+        path: Path,
+        stat: os.stat_result | None = None,
+    ) -> int | None:
+        return self._get_cached(path, stat or path.stat(), "n_pages")
+
+    def set_number_of_pages(
+        self,
+        path: Path,
+        n_pages: int,
+        stat: os.stat_result | None = None,
+    ) -> None:
+        self.set_numbers_of_pages({path: n_pages}, {path: stat} if stat else None)
+
+    def set_numbers_of_pages(
+        self,
+        path_to_n_pages: dict[Path, int],
+        stats: dict[Path, os.stat_result] | None = None,
+    ) -> None:
+        stats = stats or {}
+        for path, n_pages in path_to_n_pages.items():
+            self._set_cached(path, stats.get(path) or path.stat(), "n_pages", n_pages)
+        self._commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> FileHashIndex:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_cached(self, path: Path, stat: os.stat_result, column: str):
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT size, mtime_ns, inode, {column} FROM files WHERE path = ?",  # noqa: S608
+                (str(path),),
+            ).fetchone()
+
+        if row is None or tuple(row[:3]) != _stat_key(stat):
+            return
+
+        return row[3]
+
+    def _set_cached(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        column: str,
+        value: str | int,
+    ) -> None:
+        size, mtime_ns, inode = _stat_key(stat)
+        with self._lock:
+            # reset all cached values if the file changed
+            self._connection.execute(
+                "INSERT INTO files (path, size, mtime_ns, inode) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET "
+                "md5_sum = NULL, n_pages = NULL, "
+                "size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "inode = excluded.inode "
+                "WHERE size != excluded.size OR mtime_ns != excluded.mtime_ns "
+                "OR inode != excluded.inode",
+                (str(path), size, mtime_ns, inode),
+            )
+            self._connection.execute(
+                f"UPDATE files SET {column} = ? WHERE path = ?",  # noqa: S608
+                (value, str(path)),
+            )
+
+    def _commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+
+def get_default_index_path(directory: Path) -> Path:
+    """
+    Returns the path of the index of the directory in the user cache directory
+    ($XDG_CACHE_HOME or ~/.cache), which keeps the index out of the corpus.
+    """
+
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    digest = hashlib.sha256(str(directory.resolve()).encode("utf-8")).hexdigest()
+
+    return (
+        Path(cache_dir)
+        / CACHE_DIR_NAME
+        / f"{HASH_INDEX_FILE_PREFIX}{digest[:16]}.sqlite"
+    )
+
+
+def _stat_key(stat: os.stat_result) -> tuple[int, int, int]:
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
@@ -0,0 +1,398 @@
+"""
+Timing instrumentation of the parsing pipeline.
+
+Stages are timed with `stage`, e.g. `with stage("render"): ...`. Durations are
+recorded as histograms after `enable_metrics` was called and as spans of a
+Chrome trace after `enable_tracing` was called. The memory of stages and pages
+is recorded after `enable_memory_profiling` was called. If nothing is enabled
+`stage` returns a shared no-op context manager, so instrumented code has next
+to no overhead.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from pydantic import BaseModel
+
+from theia_parse.util.memory_profiler import DocumentMemory, MemoryProfiler
+
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+"""Upper bounds of the histogram buckets in seconds"""
+
+PROMETHEUS_METRIC_NAME = "theia_parse_stage_seconds"
+
+
+class HistogramSnapshot(BaseModel):
+    count: int
+    sum: float
+    min: float | None
+    max: float | None
+    buckets: list[tuple[float, int]]
+    """Cumulative counts by upper bound, the last bound is infinity"""
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._bounds = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._min: float | None = None
+        self._max: float | None = None
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._count += 1
+        self._sum += value
+        self._min = value if self._min is None else min(self._min, value)
+        self._max = value if self._max is None else max(self._max, value)
+
+    def snapshot(self) -> HistogramSnapshot:
+        buckets: list[tuple[float, int]] = []
+        cumulative = 0
+        for bound, count in zip((*self._bounds, math.inf), self._counts, strict=True):
+            cumulative += count
+            buckets.append((bound, cumulative))
+
+        return HistogramSnapshot(
+            count=self._count,
+            sum=self._sum,
+            min=self._min,
+            max=self._max,
+            buckets=buckets,
+        )
+
+
+class Metrics:
+    """Thread-safe histograms of the stage durations keyed by stage name."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._buckets = buckets
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def snapshot(self) -> dict[str, HistogramSnapshot]:
+        with self._lock:
+            return {
+                name: histogram.snapshot()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                name: snapshot.model_dump(mode="json")
+                for name, snapshot in self.snapshot().items()
+            },
+            indent=2,
+        )
+
+    def to_prometheus(self) -> str:
+        """Returns the histograms in the Prometheus text exposition format."""
+
+        lines = [
+            f"# HELP {PROMETHEUS_METRIC_NAME} Duration of parsing stages in seconds.",
+            f"# TYPE {PROMETHEUS_METRIC_NAME} histogram",
+        ]
+        for name, snapshot in self.snapshot().items():
+            label = f'stage="{_escape_label(name)}"'
+            for bound, count in snapshot.buckets:
+                le = "+Inf" if math.isinf(bound) else repr(bound)
+                lines.append(
+                    f'{PROMETHEUS_METRIC_NAME}_bucket{{{label},le="{le}"}} {count}'
+                )
+            lines.append(f"{PROMETHEUS_METRIC_NAME}_sum{{{label}}} {snapshot.sum!r}")
+            lines.append(f"{PROMETHEUS_METRIC_NAME}_count{{{label}}} {snapshot.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path | str) -> None:
+        """Writes a JSON snapshot for .json files, Prometheus text otherwise."""
+
+        path = Path(path)
+        if path.suffix == ".json":
+            path.write_text(self.to_json())
+        else:
+            path.write_text(self.to_prometheus())
+
+
+class Tracer:
+    """
+    Records spans as Chrome trace events, which can be viewed in Perfetto or
+    chrome://tracing. Timestamps are taken from the monotonic clock, so traces
+    of several processes on the same machine can be merged.
+    """
+
+    def __init__(self) -> None:
+        self._events: list[dict[str, Any]] = []
+        self._thread_ids: set[int] = set()
+        self._async_ids = itertools.count(1)
+        self._lock = Lock()
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        start_ns: int,
+        end_ns: int,
+        args: dict[str, Any] | None = None,
+    ) -> None:
+        """Adds a span, which must be nested in the spans of its thread."""
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+        }
+        if args:
+            event["args"] = args
+        self._add_events(event)
+
+    def add_async_span(
+        self,
+        name: str,
+        category: str,
+        start_ns: int,
+        end_ns: int,
+        args: dict[str, Any] | None = None,
+    ) -> None:
+        """Adds a span, which may overlap with other spans, e.g. of documents."""
+
+        async_id = next(self._async_ids)
+        begin = {
+            "name": name,
+            "cat": category,
+            "ph": "b",
+            "id": async_id,
+            "ts": start_ns / 1000,
+        }
+        if args:
+            begin["args"] = args
+        end = {**begin, "ph": "e", "ts": end_ns / 1000}
+        end.pop("args", None)
+        self._add_events(begin, end)
+
+    def get_events(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+
+    def write(self, path: Path | str) -> None:
+        Path(path).write_text(
+            json.dumps({"traceEvents": self.get_events(), "displayTimeUnit": "ms"})
+        )
+
+    def _add_events(self, *events: dict[str, Any]) -> None:
+        pid, tid = os.getpid(), threading.get_ident()
+        with self._lock:
+            if tid not in self._thread_ids:
+                self._thread_ids.add(tid)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": tid,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            for event in events:
+                event["pid"], event["tid"] = pid, tid
+                self._events.append(event)
+
+
+class _Span:
+    __slots__ = (
+        "_args",
+        "_category",
+        "_memory_frame",
+        "_memory_profiler",
+        "_metrics",
+        "_name",
+        "_start",
+        "_tracer",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        category: str,
+        args: dict[str, Any],
+        metrics: Metrics | None,
+        tracer: Tracer | None,
+        memory_profiler: MemoryProfiler | None = None,
+    ) -> None:
+        self._name = name
+        self._category = category
+        self._args = args
+        self._metrics = metrics
+        self._tracer = tracer
+        self._memory_profiler = memory_profiler
+        self._memory_frame = None
+        self._start = 0
+
+    def __enter__(self) -> None:
+        if self._memory_profiler is not None:
+            self._memory_frame = self._memory_profiler.enter(self._name)
+        self._start = time.perf_counter_ns()
+
+    def __exit__(self, *args) -> None:
+        end = time.perf_counter_ns()
+        if self._metrics is not None:
+            self._metrics.observe(self._name, (end - self._start) / 1e9)
+        if self._tracer is not None:
+            self._tracer.add_span(
+                self._name, self._category, self._start, end, self._args
+            )
+        if self._memory_profiler is not None and self._memory_frame is not None:
+            self._memory_profiler.exit(self._name, self._args, self._memory_frame)
+
+
+_NOOP = nullcontext()
+
+_metrics: Metrics | None = None
+_tracer: Tracer | None = None
+_memory_profiler: MemoryProfiler | None = None
+
+
+def enable_metrics(buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Metrics:
+    """Starts recording stage durations, returns the (new) metrics."""
+
+    global _metrics
+    _metrics = Metrics(buckets)
+
+    return _metrics
+
+
+def disable_metrics() -> None:
+    global _metrics
+    _metrics = None
+
+
+def get_metrics() -> Metrics | None:
+    return _metrics
+
+
+def enable_tracing() -> Tracer:
+    """Starts recording spans, returns the (new) tracer."""
+
+    global _tracer
+    _tracer = Tracer()
+
+    return _tracer
+
+
+def disable_tracing() -> None:
+    global _tracer
+    _tracer = None
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def enable_memory_profiling(
+    threshold_mb: float = 500.0,
+    trace_allocations: bool = True,
+    output_dir: Path | str | None = None,
+) -> MemoryProfiler:
+    """
+    Starts recording the memory of stages and pages, returns the (new)
+    profiler. A summary is written per document, see MemoryProfiler.
+    """
+
+    global _memory_profiler
+    disable_memory_profiling()
+    _memory_profiler = MemoryProfiler(threshold_mb, trace_allocations, output_dir)
+    _memory_profiler.start()
+
+    return _memory_profiler
+
+
+def disable_memory_profiling() -> None:
+    global _memory_profiler
+    if _memory_profiler is not None:
+        _memory_profiler.stop()
+    _memory_profiler = None
+
+
+def get_memory_profiler() -> MemoryProfiler | None:
+    return _memory_profiler
+
+
+def finish_document(path: Path | str) -> DocumentMemory | None:
+    """Writes the memory summary of the document, if memory profiling is enabled."""
+
+    memory_profiler = _memory_profiler
+    if memory_profiler is None:
+        return
+
+    return memory_profiler.finish_document(path)
+
+
+def stage(name: str, **args: Any) -> AbstractContextManager[None]:
+    """
+    Times the enclosed block as the given stage, if metrics or tracing are
+    enabled, and records its memory, if memory profiling is enabled. The
+    arguments are added to the span of the trace.
+    """
+
+    metrics, tracer, memory_profiler = _metrics, _tracer, _memory_profiler
+    if metrics is None and tracer is None and memory_profiler is None:
+        return _NOOP
+
+    return _Span(name, "stage", args, metrics, tracer, memory_profiler)
+
+
+def span(name: str, category: str, **args: Any) -> AbstractContextManager[None]:
+    """Records the enclosed block as span of the trace, if tracing is enabled."""
+
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+
+    return _Span(name, category, args, None, tracer)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
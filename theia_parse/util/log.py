@@ -1,8 +1,8 @@
 import os
+import sys
 
 from dotenv import load_dotenv
 from loguru import logger
-from tqdm import tqdm
 
 
 load_dotenv()
@@ -15,8 +15,18 @@ try:
 except ValueError:
     pass
 
+
+def _write(message: str) -> None:
+    # progress bars can only exist if tqdm was imported, which is slow to import
+    tqdm = sys.modules.get("tqdm")
+    if tqdm is None:
+        sys.stdout.write(message)
+    else:
+        tqdm.tqdm.write(message, end="")
+
+
 logger.add(
-    lambda msg: tqdm.write(msg, end=""),
+    _write,
     colorize=True,
     format=(
         "{time} <light-blue>[theia-parse | {thread.name} | {module}]</light-blue> "
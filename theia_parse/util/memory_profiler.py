@@ -0,0 +1,259 @@
+"""
+Memory profiling of the parsing pipeline per stage and page, enabled with
+`enable_memory_profiling` of the instrumentation.
+
+Every stage records the net change of the memory traced by tracemalloc, the
+peak above its start and the RSS change. A high net change of a page points to
+memory retained after the page (e.g. caches), a high peak with a low net change
+to transient memory (e.g. rendered bitmaps or encoded media). tracemalloc is
+process-wide, so values are only attributable with one page worker.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import tracemalloc
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from pydantic import BaseModel
+
+from theia_parse.const import MEMORY_PROFILE_SUFFIXES
+from theia_parse.util.files import with_suffix, write_json
+from theia_parse.util.log import LogFactory
+
+
+PAGE_STAGE = "page"
+"""Stage of a page, other stages within it are recorded as part of the page"""
+
+_MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_log = LogFactory.get_logger()
+
+
+class StageMemory(BaseModel):
+    count: int = 0
+    traced_delta_mb: float | None = None
+    """Net change of the traced memory, summed over all runs of the stage"""
+    traced_peak_mb: float | None = None
+    """Maximum peak of the traced memory above the start of the stage"""
+    rss_delta_mb: float | None = None
+    """Summed over all runs of the stage"""
+
+    def add(self, other: StageMemory) -> None:
+        self.count += other.count
+        self.traced_delta_mb = _add_optional(
+            self.traced_delta_mb, other.traced_delta_mb
+        )
+        self.traced_peak_mb = _max_optional(self.traced_peak_mb, other.traced_peak_mb)
+        self.rss_delta_mb = _add_optional(self.rss_delta_mb, other.rss_delta_mb)
+
+
+class PageMemory(StageMemory):
+    page_number: int | None = None
+    rss_mb: float | None = None
+    """RSS at the end of the page"""
+    stages: dict[str, StageMemory] = {}
+    exceeds_threshold: bool = False
+
+
+class DocumentMemory(BaseModel):
+    path: str
+    threshold_mb: float
+    pages: list[PageMemory] = []
+    stages: dict[str, StageMemory] = {}
+    """Aggregated over the pages"""
+    max_traced_peak_mb: float | None = None
+    max_rss_mb: float | None = None
+    flagged_page_numbers: list[int | None] = []
+
+
+class MemoryProfiler:
+    """
+    Records the memory of stages, see the module documentation. Pages whose
+    traced peak or RSS change exceeds the threshold are flagged and logged.
+    """
+
+    def __init__(
+        self,
+        threshold_mb: float = 500.0,
+        trace_allocations: bool = True,
+        output_dir: Path | str | None = None,
+    ) -> None:
+        """
+        Summaries are written next to the documents, if no output directory is
+        given. Without tracing allocations only RSS is recorded, which is much
+        faster.
+        """
+
+        self._threshold_mb = threshold_mb
+        self._trace_allocations = trace_allocations
+        self._output_dir = Path(output_dir) if output_dir is not None else None
+        self._started_tracing = False
+        self._local = threading.local()
+        self._pages: dict[str, list[PageMemory]] = {}
+        self._n_flagged_pages = 0
+        self._lock = Lock()
+
+    @property
+    def n_flagged_pages(self) -> int:
+        return self._n_flagged_pages
+
+    def start(self) -> None:
+        if self._trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def enter(self, name: str) -> _Frame:
+        stack: list[_Frame] = self._local.__dict__.setdefault("stack", [])
+        traced = None
+        if self._trace_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # the peak is reset for this stage, keep the one of the parent
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            traced = current
+        frame = _Frame(traced, _get_rss_mb(), stack[-1].page if stack else None)
+        if name == PAGE_STAGE:
+            frame.page = frame
+        stack.append(frame)
+
+        return frame
+
+    def exit(self, name: str, args: dict[str, Any], frame: _Frame) -> None:
+        stack: list[_Frame] = self._local.stack
+        stack.pop()
+
+        memory = StageMemory(count=1)
+        if self._trace_allocations and frame.traced_start is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame.child_peak)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            memory.traced_delta_mb = (current - frame.traced_start) / _MB
+            memory.traced_peak_mb = (peak - frame.traced_start) / _MB
+        rss = _get_rss_mb()
+        if rss is not None and frame.rss_start is not None:
+            memory.rss_delta_mb = rss - frame.rss_start
+
+        if name == PAGE_STAGE:
+            self._add_page(args, memory, rss, frame.stages)
+        elif frame.page is not None:
+            frame.page.stages.setdefault(name, StageMemory()).add(memory)
+
+    def finish_document(self, path: Path | str) -> DocumentMemory | None:
+        """Writes the summary of the pages recorded for the document."""
+
+        with self._lock:
+            pages = self._pages.pop(str(path), None)
+        if pages is None:
+            return
+
+        summary = DocumentMemory(path=str(path), threshold_mb=self._threshold_mb)
+        for page in sorted(pages, key=lambda p: p.page_number or 0):
+            summary.pages.append(page)
+            for name, memory in page.stages.items():
+                summary.stages.setdefault(name, StageMemory()).add(memory)
+            summary.max_traced_peak_mb = _max_optional(
+                summary.max_traced_peak_mb, page.traced_peak_mb
+            )
+            summary.max_rss_mb = _max_optional(summary.max_rss_mb, page.rss_mb)
+            if page.exceeds_threshold:
+                summary.flagged_page_numbers.append(page.page_number)
+
+        write_json(self._get_summary_path(Path(path)), summary)
+
+        return summary
+
+    def _add_page(
+        self,
+        args: dict[str, Any],
+        memory: StageMemory,
+        rss: float | None,
+        stages: dict[str, StageMemory],
+    ) -> None:
+        page = PageMemory(
+            **memory.model_dump(),
+            page_number=args.get("page_number"),
+            rss_mb=rss,
+            stages=stages,
+        )
+        page.exceeds_threshold = any(
+            value is not None and value > self._threshold_mb
+            for value in (page.traced_peak_mb, page.rss_delta_mb)
+        )
+        if page.exceeds_threshold:
+            _log.warning(
+                "Page exceeds memory threshold [path='{0}', page_number={1}, "
+                "traced_peak_mb={2}, rss_delta_mb={3}, threshold_mb={4}]",
+                args.get("path"),
+                page.page_number,
+                page.traced_peak_mb,
+                page.rss_delta_mb,
+                self._threshold_mb,
+            )
+
+        with self._lock:
+            self._pages.setdefault(str(args.get("path")), []).append(page)
+            self._n_flagged_pages += page.exceeds_threshold
+
+    def _get_summary_path(self, path: Path) -> Path:
+        if self._output_dir is None:
+            return with_suffix(path, MEMORY_PROFILE_SUFFIXES)
+
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+
+        return with_suffix(self._output_dir / path.name, MEMORY_PROFILE_SUFFIXES)
+
+
+class _Frame:
+    __slots__ = ("child_peak", "page", "rss_start", "stages", "traced_start")
+
+    def __init__(
+        self,
+        traced_start: int | None,
+        rss_start: float | None,
+        page: _Frame | None,
+    ) -> None:
+        self.traced_start = traced_start
+        self.rss_start = rss_start
+        self.child_peak = traced_start or 0
+        self.stages: dict[str, StageMemory] = {}
+        self.page = page
+        """Frame of the enclosing page, which records the stages within it"""
+
+
+def _get_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / _MB
+    except OSError:
+        # not available on macOS and Windows
+        return
+
+
+def _add_optional(a: float | None, b: float | None) -> float | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+
+    return a + b
+
+
+def _max_optional(a: float | None, b: float | None) -> float | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+
+    return max(a, b)